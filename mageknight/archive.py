@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""On-disk archive of the action logs (see core.actionlog) of many headless matches, e.g. of self-play
+tournaments:
+
+    python3 -m mageknight.tournament --matches 100000 --archive games.mka
+
+An archive consists of two files: The data file (e.g. games.mka) contains the compressed action logs one
+after another. The index file (games.mka.idx) contains one fixed-width record per game: offset and
+length of its log, seed, heroes and result. Both files are read using mmap, so that opening an archive
+is cheap and any game or position can be decoded lazily:
+
+    >>> archive = Archive('games.mka')
+    >>> archive[12345].fame
+    [31, 18, 0, 0]
+    >>> position = archive.match(12345, 200) # the match after the first 200 actions of game 12345
+
+The id of a game is its position in the archive. Games are only appended, never modified.
+"""
+
+import json, mmap, os, struct, zlib
+
+from mageknight.data import Hero
+
+
+MAGIC_DATA = b'MKAD'
+MAGIC_INDEX = b'MKAI'
+VERSION = 1
+MAX_PLAYERS = 4
+
+# magic, version, size of an index record
+_HEADER = struct.Struct('<4sHH')
+# offset and length of the log, seed, number of players, heroes, fame, levels, flags, rounds, turns, actions
+_RECORD = struct.Struct('<QIQB4B4H4BBBHI3x')
+_COMPLETED, _STUCK = 1, 2
+
+
+class ArchiveError(ValueError):
+    """Raised when a file is not a valid archive or a game cannot be stored in an archive."""
+    
+
+class GameInfo:
+    """The index record of a game in an archive: *id*, *seed*, the *heroes* and for each player its
+    *fame* and *level*, whether the match was *completed* or got *stuck* and the number of *rounds*,
+    *turns* and *actions*."""
+    __slots__ = ('id', 'offset', 'length', 'seed', 'heroes', 'fame', 'levels', 'completed', 'stuck',
+                 'rounds', 'turns', 'actions')
+    
+    def __init__(self, id, values):
+        self.id = id
+        self.offset, self.length, self.seed, playerCount = values[:4]
+        self.heroes = [Hero(value) for value in values[4:4+playerCount]]
+        self.fame = list(values[8:8+playerCount])
+        self.levels = list(values[12:12+playerCount])
+        flags = values[16]
+        self.completed = bool(flags & _COMPLETED)
+        self.stuck = bool(flags & _STUCK)
+        self.rounds, self.turns, self.actions = values[17:]
+        
+    @property
+    def winners(self):
+        """Return the indexes of the players with the most fame."""
+        bestFame = max(self.fame)
+        return [i for i, fame in enumerate(self.fame) if fame == bestFame]
+        
+    def __repr__(self):
+        return 'GameInfo({}, seed={}, heroes={}, fame={})'.format(
+                    self.id, self.seed, [hero.name for hero in self.heroes], self.fame)
+    
+
+def encodeGame(log, result):
+    """Encode the ActionLog *log* of a match and its *result* (a dict as returned by
+    batch.BatchRunner.runMatch) for an archive. Return a tuple (data, record values) which can be passed
+    to ArchiveWriter.extend. Encoding (mainly compression) is the expensive part of appending a game,
+    so that tournament workers do it and the main process only writes to the files."""
+    if not isinstance(log.seed, int) or not 0 <= log.seed < 1 << 64:
+        raise ArchiveError("Archives need an integer seed between 0 and 2**64-1, not {!r}".format(log.seed))
+    players = result['players']
+    if len(players) > MAX_PLAYERS:
+        raise ArchiveError("Archives support at most {} players".format(MAX_PLAYERS))
+    padding = [0] * (MAX_PLAYERS - len(players))
+    data = zlib.compress(json.dumps(log.toJson(), separators=(',', ':')).encode('utf-8'))
+    flags = (_COMPLETED if result['completed'] else 0) | (_STUCK if result['stuck'] else 0)
+    values = ((log.seed, len(players))
+              + tuple([hero.value for _, hero in log.players] + padding)
+              + tuple([p['fame'] for p in players] + padding)
+              + tuple([p['level'] for p in players] + padding)
+              + (flags, result['rounds'], result['turns'], len(log)))
+    return data, values
+    
+
+def _indexPath(path):
+    return path + '.idx'
+
+
+class ArchiveWriter:
+    """Append games to the archive at *path*. The archive is created if it does not exist. Use the writer
+    as a context manager or call close, so that buffered games are written to disk.
+    
+    The logs of games are flushed to the data file before their index records are written, so that an
+    interrupted writer leaves at most incomplete records and data without a record, which are removed
+    when the archive is opened again. This does not protect against crashes of the operating system.
+    """
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, 'wb') as file:
+                file.write(_HEADER.pack(MAGIC_DATA, VERSION, _RECORD.size))
+            with open(_indexPath(path), 'wb') as file:
+                file.write(_HEADER.pack(MAGIC_INDEX, VERSION, _RECORD.size))
+        self._data = open(path, 'r+b')
+        self._index = open(_indexPath(path), 'r+b')
+        _checkHeader(self._data.read(_HEADER.size), MAGIC_DATA)
+        _checkHeader(self._index.read(_HEADER.size), MAGIC_INDEX)
+        
+        # Remove incomplete records, records of games whose log has not been written completely (like
+        # Archive does) and data without a record
+        dataSize = os.path.getsize(path)
+        self.count = (os.path.getsize(_indexPath(path)) - _HEADER.size) // _RECORD.size
+        self._offset = _HEADER.size
+        while self.count > 0:
+            self._index.seek(_HEADER.size + (self.count-1) * _RECORD.size)
+            offset, length = _RECORD.unpack(self._index.read(_RECORD.size))[:2]
+            if offset + length <= dataSize:
+                self._offset = offset + length
+                break
+            self.count -= 1
+        self._index.truncate(_HEADER.size + self.count * _RECORD.size)
+        self._data.truncate(self._offset)
+        self._index.seek(0, os.SEEK_END)
+        self._data.seek(0, os.SEEK_END)
+        
+    def append(self, log, result):
+        """Append the game with the ActionLog *log* and the result dict *result* (see encodeGame). Return
+        the id of the game."""
+        return self.extend([encodeGame(log, result)])
+        
+    def extend(self, games):
+        """Append games encoded by encodeGame. Return the id of the last game."""
+        records = []
+        for data, values in games:
+            self._data.write(data)
+            records.append(_RECORD.pack(self._offset, len(data), *values))
+            self._offset += len(data)
+        self._data.flush() # the logs must reach the file before their records
+        self._index.write(b''.join(records))
+        self.count += len(records)
+        return self.count - 1
+            
+    def flush(self):
+        """Write buffered games to disk."""
+        self._data.flush()
+        self._index.flush()
+        
+    def close(self):
+        if not self._data.closed:
+            self.flush()
+            self._data.close()
+            self._index.close()
+            
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        
+class GameBuffer:
+    """Collect encoded games in memory. Tournament workers use a GameBuffer instead of an ArchiveWriter
+    and send the encoded games to the main process, which appends them to the archive."""
+    def __init__(self):
+        self.games = []
+        
+    def append(self, log, result):
+        self.games.append(encodeGame(log, result))
+        
+    def take(self):
+        """Return the collected games and empty the buffer."""
+        games, self.games = self.games, []
+        return games
+        
+
+class Archive:
+    """Read the archive at *path*. Index records and logs are read from memory-mapped files, only when
+    they are needed. Games appended after opening the archive are not visible."""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(_indexPath(path), 'rb') as file:
+            self._index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        _checkHeader(self._data[:_HEADER.size], MAGIC_DATA)
+        _checkHeader(self._index[:_HEADER.size], MAGIC_INDEX)
+        self._count = (len(self._index) - _HEADER.size) // _RECORD.size
+        # Ignore games whose log has not been written completely
+        while self._count > 0 and sum(self._record(self._count-1)[:2]) > len(self._data):
+            self._count -= 1
+        
+    def __len__(self):
+        return self._count
+    
+    def __getitem__(self, id):
+        """Return the GameInfo of the game with the given id."""
+        return GameInfo(id, self._record(id))
+    
+    def __iter__(self):
+        for id in range(self._count):
+            yield GameInfo(id, self._record(id))
+            
+    def _record(self, id):
+        if not 0 <= id < self._count:
+            raise IndexError("Archive has no game {}".format(id))
+        return _RECORD.unpack_from(self._index, _HEADER.size + id * _RECORD.size)
+    
+    def log(self, id):
+        """Decode and return the ActionLog of the game with the given id. The log is not connected to a
+        match."""
+        from mageknight.core import actionlog
+        offset, length = self._record(id)[:2]
+        data = json.loads(zlib.decompress(self._data[offset:offset+length]).decode('utf-8'))
+        return actionlog.ActionLog.fromJson(data)
+    
+    def replay(self, id, snapshotInterval=100):
+        """Return a core.replay.Replay of the game with the given id."""
+        from mageknight.core import replay
+        return replay.Replay(self.log(id), snapshotInterval)
+    
+    def match(self, id, index=None):
+        """Return a new Match in the position after the first *index* actions of the game with the given
+        id (default: all actions). See core.replay.Replay.match."""
+        return self.replay(id).match(index)
+    
+    def close(self):
+        self._data.close()
+        self._index.close()
+        
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        
+def _checkHeader(data, magic):
+    if len(data) < _HEADER.size:
+        raise ArchiveError("Not an archive: file too short")
+    fileMagic, version, recordSize = _HEADER.unpack(data)
+    if fileMagic != magic:
+        raise ArchiveError("Not an archive: wrong magic {!r}".format(fileMagic))
+    if version != VERSION or recordSize != _RECORD.size:
+        raise ArchiveError("Unsupported archive version {}".format(version))
@@ -20,9 +20,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-from PyQt5 import QtCore
-translate = QtCore.QCoreApplication.translate
-
+from mageknight.utils import translated
 from mageknight.core.assets import Artifact
 from mageknight.core import effects
 from mageknight.data import * # @UnusedWildImport
@@ -30,7 +28,7 @@ from mageknight.data import * # @UnusedWildImport
 
 class RubyRing(Artifact):
     name = 'ruby_ring'
-    title = translate('cards', "Ruby Ring")
+    title = translated('cards', "Ruby Ring")
     
     def basicEffect(self, match, player):
         match.effects.add(effects.ManaTokens(Mana.red))
@@ -40,7 +38,7 @@ class RubyRing(Artifact):
         
 class SapphireRing(Artifact):
     name = 'sapphire_ring'
-    title = translate('cards', "Sapphire Ring")
+    title = translated('cards', "Sapphire Ring")
     
     def basicEffect(self, match, player):
         match.effects.add(effects.ManaTokens(Mana.blue))
@@ -50,7 +48,7 @@ class SapphireRing(Artifact):
         
 class DiamondRing(Artifact):
     name = 'diamond_ring'
-    title = translate('cards', "Diamond Ring")
+    title = translated('cards', "Diamond Ring")
     
     def basicEffect(self, match, player):
         match.effects.add(effects.ManaTokens(Mana.white))
@@ -60,7 +58,7 @@ class DiamondRing(Artifact):
         
 class EmeraldRing(Artifact):
     name = 'emerald_ring'
-    title = translate('cards', "Emerald Ring")
+    title = translated('cards', "Emerald Ring")
     
     def basicEffect(self, match, player):
         match.effects.add(effects.ManaTokens(Mana.green))
@@ -22,82 +22,73 @@
 from PyQt5 import QtCore
 translate = QtCore.QCoreApplication.translate
 
+from mageknight.utils import translated
 from mageknight.data import * # @UnusedWildImport
 from mageknight.core import effects
 from mageknight.core.assets import BasicAction, ActionCard, AdvancedAction
-from mageknight.gui import dialogs
 
 
 
 class BattleVersatility(BasicAction):
     name = 'battle_versatility'
-    title = translate('cards', 'Battle Versatility')
+    title = translated('cards', 'Battle Versatility')
     color = Mana.red
     effectType = EffectType.combat
-    
-    def basicEffect(self, match, player):
-        options = [effects.AttackPoints(2),
-                   effects.BlockPoints(2),
-                   effects.AttackPoints(1, range=AttackRange.range)
-                  ]
-        effect = dialogs.choose(options)
-        match.effects.add(effect)
-    
-    def strongEffect(self, match, player):
-        options = [effects.AttackPoints(4),
-                   effects.BlockPoints(4),
-                   effects.AttackPoints(3, element=Element.fire),
-                   effects.BlockPoints(3, element=Element.fire),
-                   effects.AttackPoints(3, range=AttackRange.range),
-                   effects.AttackPoints(2, range=AttackRange.siege)
-                  ]
-        effect = dialogs.choose(options)
-        match.effects.add(effect)
+    basicOptions = (effects.AttackPoints(2),
+                    effects.BlockPoints(2),
+                    effects.AttackPoints(1, range=AttackRange.range)
+                   )
+    strongOptions = (effects.AttackPoints(4),
+                     effects.BlockPoints(4),
+                     effects.AttackPoints(3, element=Element.fire),
+                     effects.BlockPoints(3, element=Element.fire),
+                     effects.AttackPoints(3, range=AttackRange.range),
+                     effects.AttackPoints(2, range=AttackRange.siege)
+                    )
+
+
+# Elements that increase the block of Cold Toughness (see ColdToughness.strongEffect)
+_ICE_OR_FIRE = Element.ice.mask | Element.fire.mask
+_COLD_TOUGHNESS_RESISTANCES = Element.physical.mask | Element.ice.mask | Element.fire.mask
 
 
 class ColdToughness(BasicAction):
     name = 'cold_toughness'
-    title = translate('cards', 'Cold Toughness')
+    title = translated('cards', 'Cold Toughness')
     color = Mana.blue
     effectType = EffectType.combat
-    
-    def basicEffect(self, match, player):
-        options = [effects.AttackPoints(2, element=Element.ice),
-                   effects.BlockPoints(3, element=Element.ice),
-                  ]
-        effect = dialogs.choose(options)
-        match.effects.add(effect)
+    basicOptions = (effects.AttackPoints(2, element=Element.ice),
+                    effects.BlockPoints(3, element=Element.ice),
+                   )
+    # The strong effect depends on the enemy, this is the minimum
+    strongOptions = (effects.BlockPoints(5, element=Element.ice), )
     
     def strongEffect(self, match, player):
-        assert len(match.combat.selectedEnemies()) == 1
+        if len(match.combat.selectedEnemies()) != 1:
+            raise InvalidAction("Select a single enemy first.")
         enemy = match.combat.selectedEnemies()[0] # TODO: redirect for summoners?
         
-        points = 5
-        for ability in 'fortified', 'brutal', 'swift', 'paralyze', 'poison':
-            if getattr(enemy, ability):
-                points += 1
+        points = 5 + bin(enemy.abilities).count('1')
                 
-        if enemy.attack.element in [Element.ice, Element.fire]:
+        if enemy.attack.element.mask & _ICE_OR_FIRE:
             points += 1
-        elif enemy.attack == Element.coldFire:
+        elif enemy.attack.element is Element.coldFire:
             points += 2
             
         # 'points += len(enemy.resistances)' does not work correctly if enemy has cold fire resistance
-        for element in [Element.physical, Element.ice, Element.fire]:
-            if element in enemy.resistances:
-                points += 1
+        points += bin(enemy.resistanceMask & _COLD_TOUGHNESS_RESISTANCES).count('1')
                 
         match.effects.add(effects.BlockPoints(points, element=Element.ice))
         
 
 class Concentration(BasicAction):
     name = 'concentration'
-    title = translate('cards', 'Concentration')
+    title = translated('cards', 'Concentration')
     color = Mana.green
     effectType = EffectType.special
     
     def basicEffect(self, match, player):
-        color = dialogs.chooseManaColor(fromList=[Mana.blue, Mana.white, Mana.red])
+        color = match.decisions(player).chooseManaColor(fromList=[Mana.blue, Mana.white, Mana.red])
         match.effects.add(effects.ManaTokens(color))
         
     def strongEffect(self, match, player):
@@ -107,7 +98,7 @@ class Concentration(BasicAction):
     def _strongEffect(self, match, player, amount):
         concentration = effects.Concentration(amount)
         match.effects.add(concentration)
-        card = dialogs.chooseCard(player, type=ActionCard)
+        card = match.decisions(player).chooseCard(player, type=ActionCard)
         player.handCards.remove(card)
         card.strongEffect(match, player)
         match.effects.remove(concentration)
@@ -115,49 +106,44 @@ class Concentration(BasicAction):
     
 class Crystallize(BasicAction):
     name = 'crystallize'
-    title = translate('cards', 'Crystallize')
+    title = translated('cards', 'Crystallize')
     color = Mana.blue
     effectType = EffectType.special
     
     def basicEffect(self, match, player):
-        color = dialogs.chooseManaColor(match, available=True)
+        color = match.decisions(player).chooseManaColor(match, available=True)
         match.payMana(color)
         player.addCrystal(color)
         
     def strongEffect(self, match, player):
-        color = dialogs.chooseManaColor(match, available=False)
+        color = match.decisions(player).chooseManaColor(match, available=False)
         player.addCrystal(color)
         
     
 class Determination(BasicAction):
     name = 'determination'
-    title = translate('cards', 'Determination')
+    title = translated('cards', 'Determination')
     color = Mana.blue
     effectType = EffectType.combat
-    
-    def basicEffect(self, match, player):
-        options = [effects.AttackPoints(2), effects.BlockPoints(2)]
-        match.effects.add(dialogs.choose(options))
-    
-    def strongEffect(self, match, player):
-        match.effects.add(effects.BlockPoints(5))
+    basicOptions = (effects.AttackPoints(2), effects.BlockPoints(2))
+    strongOptions = (effects.BlockPoints(5), )
     
     
 class Improvisation(BasicAction):
     name = 'improvisation'
-    title = translate('cards', 'Improvisation')
+    title = translated('cards', 'Improvisation')
     color = Mana.red
     effectType = EffectType.unknown
     
     def _effect(self, match, player, amount):
-        card = dialogs.chooseCard(player)
+        card = match.decisions(player).chooseCard(player)
         player.handCards.remove(card)
         options = [effects.MovePoints(amount),
                    effects.InfluencePoints(amount),
                    effects.AttackPoints(amount),
                    effects.BlockPoints(amount)
                   ]
-        match.effects.add(dialogs.choose(options))
+        match.effects.add(match.decisions(player).choose(options))
         
     def basicEffect(self, match, player):
         self._effect(match, player, 3)
@@ -168,7 +154,7 @@ class Improvisation(BasicAction):
 
 class ManaDraw(BasicAction):
     name = 'mana_draw'
-    title = translate('cards', 'Mana Draw')
+    title = translated('cards', 'Mana Draw')
     color = Mana.white
     effectType = EffectType.special
     
@@ -178,38 +164,37 @@ class ManaDraw(BasicAction):
     def strongEffect(self, match, player):
         if len(match.source) == 0:
             raise InvalidAction('No die in source.')
-        oldColor = dialogs.chooseManaColor(fromList=match.source)
-        newColor = dialogs.chooseManaColor(fromList=[Mana.red, Mana.blue, Mana.green, Mana.white, Mana.black])
+        oldColor = match.decisions(player).chooseManaColor(fromList=match.source)
+        newColor = match.decisions(player).chooseManaColor(
+                                    fromList=[Mana.red, Mana.blue, Mana.green, Mana.white, Mana.black])
         match.source.remove(oldColor)
         match.effects.add(effects.ManaTokens({newColor: 2}))
  
     
 class March(BasicAction):
     name = 'march'
-    title = translate('cards', 'March')
+    title = translated('cards', 'March')
     color = Mana.green
     effectType = EffectType.movement
-    
-    def basicEffect(self, match, player):
-        match.effects.add(effects.MovePoints(2))
-        
-    def strongEffect(self, match, player):
-        match.effects.add(effects.MovePoints(4))
+    basicOptions = (effects.MovePoints(2), )
+    strongOptions = (effects.MovePoints(4), )
 
 
 class NobleManners(BasicAction):
     name = 'noble_manners'
-    title = translate('cards', 'Noble Manners')
+    title = translated('cards', 'Noble Manners')
     color = Mana.white
     effectType = EffectType.influence
+    basicOptions = (effects.InfluencePoints(2), )
+    strongOptions = (effects.InfluencePoints(4), )
     
     def basicEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(2))
+        super().basicEffect(match, player)
         if match.state is State.interaction:
             player.fame += 1
     
     def strongEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(4))
+        super().strongEffect(match, player)
         if match.state is State.interaction:
             player.reputation += 1
             player.fame += 1
@@ -217,87 +202,69 @@ class NobleManners(BasicAction):
     
 class Promise(BasicAction):
     name = 'promise'
-    title = translate('cards', 'Promise')
+    title = translated('cards', 'Promise')
     color = Mana.green
     effectType = EffectType.influence
-    
-    def basicEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(2))
-        
-    def strongEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(4))
+    basicOptions = (effects.InfluencePoints(2), )
+    strongOptions = (effects.InfluencePoints(4), )
         
     
 class Rage(BasicAction):
     name = 'rage'
-    title = translate('cards', 'rage')
+    title = translated('cards', 'rage')
     color = Mana.red
     effectType = EffectType.combat
-    
-    def basicEffect(self, match, player):
-        options = [effects.AttackPoints(2), effects.BlockPoints(2)]
-        match.effects.add(dialogs.choose(options))
-    
-    def strongEffect(self, match, player):
-        match.effects.add(effects.AttackPoints(4))
+    basicOptions = (effects.AttackPoints(2), effects.BlockPoints(2))
+    strongOptions = (effects.AttackPoints(4), )
 
 
 class Stamina(BasicAction):
     name = 'stamina'
-    title = translate('cards', 'Stamina')
+    title = translated('cards', 'Stamina')
     color = Mana.blue
     effectType = EffectType.movement
-    
-    def basicEffect(self, match, player):
-        match.effects.add(effects.MovePoints(2))
-        
-    def strongEffect(self, match, player):
-        match.effects.add(effects.MovePoints(4))
+    basicOptions = (effects.MovePoints(2), )
+    strongOptions = (effects.MovePoints(4), )
     
 
 class Swiftness(BasicAction):
     name = 'swiftness'
-    title = translate('cards', 'Swiftness')
+    title = translated('cards', 'Swiftness')
     color = Mana.white
     effectType = EffectType.unknown
-    
-    def basicEffect(self, match, player):
-        match.effects.add(effects.MovePoints(2))
-        
-    def strongEffect(self, match, player):
-        match.effects.add(effects.AttackPoints(3, range=AttackRange.range))
+    basicOptions = (effects.MovePoints(2), )
+    strongOptions = (effects.AttackPoints(3, range=AttackRange.range), )
 
 
 class Threaten(BasicAction):
     name = 'threaten'
-    title = translate('cards', 'Threaten')
+    title = translated('cards', 'Threaten')
     color = Mana.red
     effectType = EffectType.influence
-    
-    def basicEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(2))
+    basicOptions = (effects.InfluencePoints(2), )
+    strongOptions = (effects.InfluencePoints(5), )
         
     def strongEffect(self, match, player):
-        match.effects.add(effects.InfluencePoints(5))
-        player.addReputation(-1)
+        super().strongEffect(match, player)
+        player.reputation -= 1
 
 
 class Tranquility(BasicAction):
     name = 'tranquility'
-    title = translate('cards', 'Tranquility')
+    title = translated('cards', 'Tranquility')
     color = Mana.green
     effectType = EffectType.healing
         
     def basicEffect(self, match, player):
         effect = effects.HealPoints(1)
-        index = dialogs.chooseIndex([effect, translate('cards', "Draw a card")])
+        index = match.decisions(player).chooseIndex([effect, translate('cards', "Draw a card")])
         if index == 0:
             match.effects.add(effects.HealPoints(1))
         else: player.drawCards(1)
         
     def strongEffect(self, match, player):
         effect = effects.HealPoints(2)
-        index = dialogs.chooseIndex([effect, translate('cards', "Draw two cards")])
+        index = match.decisions(player).chooseIndex([effect, translate('cards', "Draw two cards")])
         if index == 0:
             match.effects.add(effects.HealPoints(2))
         else: player.drawCards(2)
@@ -305,12 +272,12 @@ class Tranquility(BasicAction):
         
 class WillFocus(BasicAction):
     name = 'will_focus'
-    title = translate('cards', 'Will Focus')
+    title = translated('cards', 'Will Focus')
     color = Mana.green
     effectType = EffectType.special
      
     def basicEffect(self, match, player):
-        color = dialogs.chooseManaColor()
+        color = match.decisions(player).chooseManaColor()
         if color != Mana.green:
             match.effects.add(effects.ManaTokens(color))
         else: player.addCrystal(Mana.green)
@@ -320,7 +287,7 @@ class WillFocus(BasicAction):
 
 class FrostBridge(AdvancedAction):
     name = 'frost_bridge'
-    title = translate('cards', 'Frost Bridge')
+    title = translated('cards', 'Frost Bridge')
     color = Mana.blue
     effectType = EffectType.movement
     
@@ -335,7 +302,7 @@ class FrostBridge(AdvancedAction):
 
 class PathFinding(AdvancedAction):
     name = 'path_finding'
-    title = translate('cards', 'Path Finding')
+    title = translated('cards', 'Path Finding')
     color = Mana.green
     effectType = EffectType.movement
 
@@ -19,10 +19,7 @@
 # You should have received a copy of the GNU General Public License
 # 
 
-from PyQt5 import QtCore
-translate = QtCore.QCoreApplication.translate
-
-from mageknight.gui import dialogs
+from mageknight.utils import translated
 from mageknight.data import * # @UnusedWildImport
 from mageknight.core import effects
 from mageknight.core.assets import RegularUnit, ability
@@ -30,27 +27,25 @@ from mageknight.core.assets import RegularUnit, ability
 
 class Foresters(RegularUnit):
     name = 'foresters'
-    title = translate('units', "Foresters")
+    title = translated('units', "Foresters")
     count = 2
     cost = 5
     level = 1
     sites = (Site.village, )
     armor = 4
     
-    @ability(None)
+    @ability(None, options=(effects.MovePoints(2), ))
     def ability1(self, match, player):
         match.effects.add(effects.MovePoints(2))
         for terrain in Terrain.forest, Terrain.hills, Terrain.swamp:
             match.map.reduceTerrainCost(terrain, 1, 0)
         
-    @ability(417)
-    def ability2(self, match, player):
-        match.effects.add(effects.BlockPoints(3))
+    ability2 = ability(417, options=(effects.BlockPoints(3), ))
 
     
 class GuardianGolems(RegularUnit):
     name = 'guardian_golems'
-    title = translate('units', "Guardian Golems")
+    title = translated('units', "Guardian Golems")
     count = 2
     cost = 7
     level = 2
@@ -58,46 +53,35 @@ class GuardianGolems(RegularUnit):
     armor = 3
     resistances = (Element.physical, )
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(2), effects.BlockPoints(2)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(2), effects.BlockPoints(2)))
         
-    @ability(356, Mana.red)
-    def ability2(self, match, player):
-        match.effects.add(effects.BlockPoints(4, element=Element.fire))
+    ability2 = ability(356, Mana.red, options=(effects.BlockPoints(4, element=Element.fire), ))
         
-    @ability(420, Mana.blue)
-    def ability3(self, match, player):
-        match.effects.add(effects.BlockPoints(4, element=Element.ice))
+    ability3 = ability(420, Mana.blue, options=(effects.BlockPoints(4, element=Element.ice), ))
     
         
 class Herbalists(RegularUnit):
     name = 'herbalists'
-    title = translate('units', "Herbalists")
+    title = translated('units', "Herbalists")
     count = 2
     cost = 3
     level = 1
     sites = (Site.monastery, Site.village)
     armor = 2
     
-    @ability(None, Mana.green)
-    def ability1(self, match, player):
-        match.effects.add(effects.HealPoints(2))
+    ability1 = ability(None, Mana.green, options=(effects.HealPoints(2), ))
         
-    @ability(356)
+    @ability(356, type=EffectType.special)
     def ability2(self, match, player):
         # TODO: Ready a level I or II Unit
         pass
         
-    @ability(418)
-    def ability3(self, match, player):
-        match.effects.add(effects.ManaTokens(Mana.green))
+    ability3 = ability(418, options=(effects.ManaTokens(Mana.green), ))
     
     
 class Illusionists(RegularUnit):
     name = 'illusionists'
-    title = translate('units', "Illusionists")
+    title = translated('units', "Illusionists")
     count = 2
     cost = 7
     level = 2
@@ -105,67 +89,52 @@ class Illusionists(RegularUnit):
     armor = 2
     resistances = (Element.physical, )
     
-    @ability(None)
-    def ability1(self, match, player):
-        match.effects.add(effects.InfluencePoints(4))
+    ability1 = ability(None, options=(effects.InfluencePoints(4), ))
         
-    @ability(353, Mana.white)
+    @ability(353, Mana.white, type=EffectType.combat)
     def ability2(self, match, player):
         #TODO: Target unfortified enemy does not attack this combat
         pass
     
-    @ability(458)
+    @ability(458, type=EffectType.special)
     def ability3(self, match, player):
         player.addCrystal(Mana.white)
 
 
 class NorthernMonks(RegularUnit):
     name = 'northern_monks'
-    title = translate('units', "Northern Monks")
+    title = translated('units', "Northern Monks")
     count = 1
     cost = 7
     level = 2
     sites = (Site.monastery, )
     armor = 4
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(3), effects.BlockPoints(3)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(3), effects.BlockPoints(3)))
         
-    @ability(387, Mana.blue)
-    def ability2(self, match, player):
-        options = [effects.AttackPoints(4, element=Element.ice),
-                   effects.BlockPoints(4, element=Element.ice)]
-        match.effects.add(dialogs.choose(options))
+    ability2 = ability(387, Mana.blue, options=(effects.AttackPoints(4, element=Element.ice),
+                                                effects.BlockPoints(4, element=Element.ice)))
         
         
 class Peasants(RegularUnit):
     name = 'peasants'
-    title = translate('units', "Peasants")
+    title = translated('units', "Peasants")
     count = 3
     cost = 4
     level = 1
     sites = (Site.village, )
     armor = 3
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(2), effects.BlockPoints(2)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(2), effects.BlockPoints(2)))
         
-    @ability(356)
-    def ability2(self, match, player):
-        match.effects.add(effects.InfluencePoints(2))
+    ability2 = ability(356, options=(effects.InfluencePoints(2), ))
         
-    @ability(420)
-    def ability3(self, match, player):
-        match.effects.add(effects.MovePoints(2))
+    ability3 = ability(420, options=(effects.MovePoints(2), ))
         
 
 class RedCapeMonks(RegularUnit):
     name = 'red_cape_monks'
-    title = translate('units', "Red Cape Monks")
+    title = translated('units', "Red Cape Monks")
     count = 1
     cost = 7
     level = 2
@@ -173,70 +142,52 @@ class RedCapeMonks(RegularUnit):
     armor = 4
 
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(3), effects.BlockPoints(3)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(3), effects.BlockPoints(3)))
         
-    @ability(390, Mana.red)
-    def ability2(self, match, player):
-        options = [effects.AttackPoints(4, element=Element.fire),
-                   effects.BlockPoints(4, element=Element.fire)]
-        match.effects.add(dialogs.choose(options))
+    ability2 = ability(390, Mana.red, options=(effects.AttackPoints(4, element=Element.fire),
+                                               effects.BlockPoints(4, element=Element.fire)))
     
     
 class SavageMonks(RegularUnit):
     name = 'savage_monks'
-    title = translate('units', "Savage Monks")
+    title = translated('units', "Savage Monks")
     count = 1
     cost = 7
     level = 2
     sites = (Site.monastery, )
     armor = 4
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(3), effects.BlockPoints(3)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(3), effects.BlockPoints(3)))
         
-    @ability(386, Mana.green)
-    def ability2(self, match, player):
-        match.effects.add(effects.AttackPoints(4, range=AttackRange.siege))
+    ability2 = ability(386, Mana.green, options=(effects.AttackPoints(4, range=AttackRange.siege), ))
         
     
 class UtemCrossbowmen(RegularUnit):
     name = 'utem_crossbowmen'
-    title = translate('units', "Utem Crossbowmen")
+    title = translated('units', "Utem Crossbowmen")
     count = 2
     cost = 6
     level = 2
     sites = (Site.keep, Site.village, )
     armor = 4
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(3), effects.BlockPoints(3)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(3), effects.BlockPoints(3)))
         
-    @ability(387)
-    def ability2(self, match, player):
-        match.effects.add(effects.AttackPoints(2, range=AttackRange.range))
+    ability2 = ability(387, options=(effects.AttackPoints(2, range=AttackRange.range), ))
         
     
 class UtemGuardsmen(RegularUnit):
     name = 'utem_guardsmen'
-    title = translate('units', "Utem Guardsmen")
+    title = translated('units', "Utem Guardsmen")
     count = 2
     cost = 5
     level = 2
     sites = (Site.keep, Site.village, )
     armor = 5
     
-    @ability(None)
-    def ability1(self, match, player):
-        match.effects.add(effects.AttackPoints(2))
+    ability1 = ability(None, options=(effects.AttackPoints(2), ))
         
-    @ability(367)
+    @ability(367, options=(effects.BlockPoints(4), ))
     def ability2(self, match, player):
         match.effects.add(effects.BlockPoints(4))
         #TODO: lose Swiftness
@@ -244,20 +195,16 @@ class UtemGuardsmen(RegularUnit):
     
 class UtemSwordsmen(RegularUnit):
     name = 'utem_swordsmen'
-    title = translate('units', "Utem Swordsmen")
+    title = translated('units', "Utem Swordsmen")
     count = 2
     cost = 6
     level = 2
     sites = (Site.keep, )
     armor = 4
     
-    @ability(None)
-    def ability1(self, match, player):
-        options = [effects.AttackPoints(3), effects.BlockPoints(3)]
-        match.effects.add(dialogs.choose(options))
+    ability1 = ability(None, options=(effects.AttackPoints(3), effects.BlockPoints(3)))
         
-    @ability(368)
+    @ability(368, options=(effects.AttackPoints(6), effects.BlockPoints(6)))
     def ability2(self, match, player):
-        options = [effects.AttackPoints(6), effects.BlockPoints(6)]
-        match.effects.add(dialogs.choose(options))
+        match.effects.add(match.decisions(player).choose(self.ability2.options))
         player.woundUnit(self)
@@ -43,6 +43,10 @@ Every change to the attributes will then be put on the stack and can consequentl
 Additionally, whenever the attribute value is set, it is checked for the correct type.
 If your class contains properly named signals (e.g. nameChanged, ageChanged), these will be emitted when
 the attribute's value has changed.
+
+Attributes created with hashed=True contribute to the Zobrist hash of the object (see core.zobrist), if
+the object's 'zobrist' attribute is set. The hash is updated by the methods that actually change values,
+so that it stays correct on undo and redo.
 """
 
 import functools
@@ -57,6 +61,8 @@ __all__ = ['AttributeObject', 'Attribute', 'BoolAttribute',
 class AttributeObject(QtCore.QObject):
     """Base class for all class that wish to use attributes. It makes sure that attributes are properly
     initialized."""
+    zobrist = None # a core.zobrist.ZobristHash which is updated when hashed attributes change
+    
     def __init__(self, stack, parent=None):
         super().__init__(parent)
         self.stack = stack
@@ -78,13 +84,15 @@ class Attribute:
             the canonical name (<attribute name>Changed). If this signal does not exist, the attribute won't
             emit a signal. 
         - sendValue: whether the signal associated with this attribute has an argument - the attribute value.
+        - hashed: whether the attribute's value contributes to the Zobrist hash of the object.
     
     """
-    def __init__(self, type, default=None, allowNone=True, sendValue=False, **kwargs):
+    def __init__(self, type, default=None, allowNone=True, sendValue=False, hashed=False, **kwargs):
         self.name = None
         self.type = type
         self.allowNone = allowNone
         self.sendValue = sendValue
+        self.hashed = hashed
         self._default = default
         self._kwargs = kwargs
     
@@ -111,9 +119,15 @@ class Attribute:
         return getattr(instance, self._name)
         
     def _set(self, instance, value):
+        if self.hashed and instance.zobrist is not None:
+            self._updateHash(instance, getattr(instance, self._name), value)
         setattr(instance, self._name, value)
         if self.signal:
             self.emitSignal(instance)
+            
+    def _updateHash(self, instance, oldValue, newValue):
+        instance.zobrist.remove(instance, self.name, oldValue)
+        instance.zobrist.add(instance, self.name, newValue)
         
     def __set__(self, instance, value):
         if not ((self.allowNone and value is None) or isinstance(value, self.type)):
@@ -194,11 +208,16 @@ class ListAttribute(Attribute):
         
     Warning: Direct assignments to item attributes are not undoable (e.g. 'p.persons[0].age = 100').
     The reason is simple: Person is no AttributeObject and Person.age is no attribute.
+    
+    For hashed lists, *itemKey* may be a function returning the value which represents an item in the
+    Zobrist hash (default: the item itself). Values which are shared between objects (e.g. flyweights)
+    keep the key cache of core.zobrist effective for items which are created often.
     """
-    def __init__(self, itemType, itemAttributes=tuple(), **kwargs):
+    def __init__(self, itemType, itemAttributes=tuple(), itemKey=None, **kwargs):
         super().__init__(UndoList, **kwargs)
         self.itemType = itemType
         self.itemAttributes = itemAttributes
+        self.itemKey = itemKey
                 
     def default(self, instance):
         return self._createList(instance, [])
@@ -211,7 +230,14 @@ class ListAttribute(Attribute):
         if self.signal is not None:
             signal = getattr(instance, self.signal)
         else: signal = None
-        return UndoList(instance.stack, self.itemType, signal, items, itemAttributes=self.itemAttributes)
+        return UndoList(instance.stack, self.itemType, signal, items, itemAttributes=self.itemAttributes,
+                        owner=instance if self.hashed else None, name=self.name, itemKey=self.itemKey)
+    
+    def _updateHash(self, instance, oldValue, newValue):
+        for item in oldValue:
+            instance.zobrist.remove(instance, self.name, *oldValue.itemFeature(item))
+        for item in newValue:
+            instance.zobrist.add(instance, self.name, *newValue.itemFeature(item))
     
     def __set__(self, instance, value):
         if not isinstance(value, list):
@@ -260,12 +286,19 @@ class UndoList(list):
     stack.
     For each (name, type)-tuple in *itemAttributes*, this object will contain a set<AttributeName>-method
     that can be used to modify this item attribute in a given item.
+    If *owner* is given, changes update the Zobrist hash of *owner* (see Attribute). *name* is the name of
+    the attribute storing this list, *itemKey* is explained in ListAttribute.
     """
-    def __init__(self, stack, itemType, signal, items=tuple(), itemAttributes=[]):
+    def __init__(self, stack, itemType, signal, items=tuple(), itemAttributes=[], owner=None, name=None,
+                 itemKey=None):
         super().__init__(items)
         self._stack = stack
         self._itemType = itemType
         self._signal = signal
+        self._itemAttributeNames = tuple(attr for attr, _ in itemAttributes)
+        self._owner = owner
+        self._name = name
+        self._itemKey = itemKey
         
         for attr, type in itemAttributes:
             if type is list:
@@ -284,21 +317,41 @@ class UndoList(list):
         if self._signal is not None:
             self._signal.emit()
     
+    def itemFeature(self, item):
+        """Return the feature of *item* for the Zobrist hash: the item and its item attributes."""
+        key = self._itemKey(item) if self._itemKey is not None else item
+        return (key,) + tuple(getattr(item, attr) for attr in self._itemAttributeNames)
+    
+    def _updateHash(self, removed, added):
+        zobrist = self._owner.zobrist if self._owner is not None else None
+        if zobrist is not None:
+            for item in removed:
+                zobrist.remove(self._owner, self._name, *self.itemFeature(item))
+            for item in added:
+                zobrist.add(self._owner, self._name, *self.itemFeature(item))
+    
     def _setItem(self, index, item):
+        removed = self[index] if isinstance(index, slice) else (self[index],)
         super().__setitem__(index, item)
+        self._updateHash(removed, item if isinstance(index, slice) else (item,))
         self._emitSignal()
         
     def _insert(self, index, item):
         super().insert(index, item)
+        self._updateHash((), (item,))
         self._emitSignal()
         
     def _delItem(self, index):
+        removed = self[index] if isinstance(index, slice) else (self[index],)
         super().__delitem__(index)
+        self._updateHash(removed, ())
         self._emitSignal()
         
     def _setAttr(self, item, attr, value):
         if value != getattr(item, attr):
+            self._updateHash((item,), ())
             setattr(item, attr, value)
+            self._updateHash((), (item,))
             self._emitSignal()
 
     def __setitem__(self, index, item):
@@ -311,8 +364,15 @@ class UndoList(list):
     
     def __delitem__(self, index):
         item = self[index]
-        self._stack.push(Call(self._delItem, index),
-                         Call(self._insert, index, item))
+        if isinstance(index, slice):
+            # insert cannot undo the deletion of a slice
+            start, _, step = index.indices(len(self))
+            assert step == 1
+            self._stack.push(Call(self._delItem, index),
+                             Call(self._setItem, slice(start, start), item))
+        else:
+            self._stack.push(Call(self._delItem, index),
+                             Call(self._insert, index, item))
         
     def append(self, item):
         if not isinstance(item, self._itemType):
@@ -326,7 +386,7 @@ class UndoList(list):
         if len(self) > 0:
             copy = self.copy()
             self._stack.push(Call(self._delItem, slice(0, len(self))),
-                             Call(self._setItem, slice(0, len(self), copy)))
+                             Call(self._setItem, slice(0, 0), copy))
         
     def extend(self, items):
         items = list(items)
@@ -338,7 +398,7 @@ class UndoList(list):
             start = len(self)
             end = start + len(items)
             self._stack.push(Call(self._setItem, slice(start, end), items),
-                             Call(self._delItem, slice(start, end), items))
+                             Call(self._delItem, slice(start, end)))
         
     def insert(self, index, item):
         if not isinstance(item, self._itemType):
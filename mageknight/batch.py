@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Run matches without GUI, e.g. for regression and balance tests:
+
+    python3 -m mageknight.batch --players 2 --matches 20 --seed 1 --policy greedy --output results.jsonl
+
+Each player is controlled by a policy (see mageknight.policies). --policy takes a single policy name or a
+comma-separated list with one name per player. Results of each match are written as one JSON object per
+line to the output file and --archive appends the action logs to an archive (see mageknight.archive).
+Finally the throughput (matches/s, actions/s) and the time spent in each phase of the match is printed.
+"""
+
+import argparse, collections, contextlib, json, os, random, sys, time
+
+from mageknight import archive, core, policies
+from mageknight.data import Hero
+
+
+HEROES = (Hero.Norowas, Hero.Tovak, Hero.Arythea, Hero.Goldyx)
+
+
+class PhaseTimer:
+    """Accumulate the number of actions and the time spent per phase (a State name or 'setup')."""
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.seconds = collections.Counter()
+        
+    def add(self, phase, seconds, count=1):
+        self.counts[phase] += count
+        self.seconds[phase] += seconds
+        
+    def update(self, other):
+        self.counts.update(other.counts)
+        self.seconds.update(other.seconds)
+        
+    def report(self, file=sys.stdout):
+        total = sum(self.seconds.values())
+        print("{:<18} {:>9} {:>10} {:>7} {:>10}".format('phase', 'actions', 'seconds', 'share', 'us/action'),
+              file=file)
+        for phase, seconds in self.seconds.most_common():
+            count = self.counts[phase]
+            print("{:<18} {:>9} {:>10.3f} {:>6.1f}% {:>10.1f}"
+                  .format(phase, count, seconds, 100 * seconds / total if total > 0 else 0,
+                          1e6 * seconds / count if count > 0 else 0), file=file)
+    
+
+class BatchRunner:
+    """Run headless matches with *playerCount* players. *policyNames* contains one policy name per player
+    (see policies.POLICIES). Match *i* uses the seed *seed*+i. A match is stopped after *turnLimit*
+    turns. If a policy does not finish a turn within *actionLimit* steps, the PassivePolicy finishes it.
+    """
+    def __init__(self, playerCount, policyNames, seed=0, turnLimit=500, actionLimit=200):
+        if len(policyNames) == 1:
+            policyNames = policyNames * playerCount
+        if len(policyNames) != playerCount:
+            raise ValueError("Need one policy or one policy per player.")
+        for name in policyNames:
+            if name not in policies.POLICIES:
+                raise ValueError("Unknown policy '{}'.".format(name))
+        self.playerCount = playerCount
+        self.policyNames = policyNames
+        self.seed = seed
+        self.turnLimit = turnLimit
+        self.actionLimit = actionLimit
+        self.timer = PhaseTimer()
+        # If set, the action log and result of each match are appended to this ArchiveWriter or
+        # GameBuffer (see mageknight.archive)
+        self.archive = None
+        
+    def runMatch(self, index, heroes=HEROES):
+        """Run the match with the given index and return a dict with its results. Player *i* plays the
+        hero heroes[i % len(heroes)]."""
+        seed = self.seed + index
+        rng = random.Random(seed)
+        matchPolicies = [policies.POLICIES[name](random.Random(rng.random())) for name in self.policyNames]
+        fallback = policies.PassivePolicy(random.Random(rng.random()))
+        players = [core.PlayerData('Player {}'.format(i+1), heroes[i % len(heroes)],
+                                   policy.decisionProvider())
+                   for i, policy in enumerate(matchPolicies)]
+        
+        start = time.perf_counter()
+        match = core.Match(players, seed)
+        self.timer.add('setup', time.perf_counter() - start, 0)
+        policyOf = dict(zip(match.players, matchPolicies))
+        
+        actions = failedActions = 0
+        stuck = False
+        while not match.isOver and match.turnNumber <= self.turnLimit and not stuck:
+            turn = match.turnNumber
+            player = match.currentPlayer
+            steps = 0
+            while match.turnNumber == turn and not match.isOver:
+                policy = policyOf[player] if steps < self.actionLimit else fallback
+                if steps >= 2 * self.actionLimit:
+                    stuck = True
+                    break
+                phase = match.state.name
+                actionStart = time.perf_counter()
+                success = policy.act(match, player)
+                self.timer.add(phase, time.perf_counter() - actionStart)
+                if success:
+                    actions += 1
+                else: failedActions += 1
+                steps += 1
+        
+        result = {
+            'index': index,
+            'seed': seed,
+            'completed': match.isOver,
+            'stuck': stuck,
+            'rounds': match.round.number,
+            'turns': match.turnNumber,
+            'actions': actions,
+            'failedActions': failedActions,
+            'seconds': time.perf_counter() - start,
+            'players': [{'name': p.name,
+                         'hero': p.hero.name,
+                         'policy': policyOf[p].name,
+                         'fame': p.fame,
+                         'level': p.level,
+                         'reputation': p.reputation,
+                         'units': len(p.units),
+                         'cards': len(p.drawPile) + len(p.handCards) + len(p.discardPile)}
+                        for p in match.players],
+        }
+        if self.archive is not None:
+            self.archive.append(match.actionLog, result)
+        return result
+    
+    def run(self, matches):
+        """Run *matches* matches and yield their results."""
+        for index in range(matches):
+            # The engine logs using print
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                result = self.runMatch(index)
+            yield result
+            
+            
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mageknight.batch', description="Run headless matches.")
+    parser.add_argument('--players', type=int, default=1, help="number of players (default: 1)")
+    parser.add_argument('--matches', type=int, default=10, help="number of matches (default: 10)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first match (default: 0)")
+    parser.add_argument('--policy', default='greedy',
+                        help="policy or comma-separated list of policies per player: {} (default: greedy)"
+                             .format(', '.join(sorted(policies.POLICIES))))
+    parser.add_argument('--turn-limit', type=int, default=500, dest='turnLimit',
+                        help="maximum number of turns per match (default: 500)")
+    parser.add_argument('--output', help="write per-match results (JSON lines) to this file")
+    parser.add_argument('--archive', help="append the action logs of all matches to this archive "
+                                          "(see mageknight.archive)")
+    args = parser.parse_args(argv)
+    
+    runner = BatchRunner(args.players, args.policy.split(','), args.seed, args.turnLimit)
+    if args.archive is not None:
+        runner.archive = archive.ArchiveWriter(args.archive)
+    output = open(args.output, 'w') if args.output is not None else None
+    start = time.perf_counter()
+    results = []
+    try:
+        for result in runner.run(args.matches):
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if output is not None:
+            output.close()
+        if runner.archive is not None:
+            runner.archive.close()
+    elapsed = time.perf_counter() - start
+    
+    actions = sum(r['actions'] for r in results)
+    print("{} matches ({} completed, {} stuck) in {:.2f}s: {:.2f} matches/s, {:.0f} actions/s"
+          .format(len(results), sum(r['completed'] for r in results), sum(r['stuck'] for r in results),
+                  elapsed, len(results) / elapsed, actions / elapsed))
+    runner.timer.report()
+    
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Micro-benchmarks for performance critical parts of the engine. Run them with
+
+    python3 -m mageknight.benchmarks [name ...]
+
+Without arguments all benchmarks are run. Each benchmark prints its throughput.
+"""
+
+import contextlib, os, sys, time
+
+
+def _run(function, seconds):
+    """Call *function* repeatedly for roughly *seconds* seconds. Return the number of calls per second.
+    Output of *function* (the engine logs state changes using print) is discarded."""
+    count = 0
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while True:
+            function()
+            count += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= seconds:
+                return count / elapsed
+        
+        
+def combat(seconds=2):
+    """Throughput of combat resolution: A full combat against three enemies with a ranged attack,
+    a block, damage assigned to a resistant unit and a final attack. Every combat is rolled back using
+    the undo stack."""
+    from mageknight import core
+    from mageknight.core import assets, effects
+    from mageknight.data import enemies, Hero, Site, Element, AttackRange, State
+    
+    match = core.Match([core.PlayerData('Benchmark', Hero.Norowas)])
+    player = match.currentPlayer
+    combat = match.combat
+    site = next(site for site in match.map.sites.values() if site.type is Site.maraudingOrcs)
+    fireMages, ironclads, prowlers = (enemies.get(id) for id in ('fire_mages', 'ironclads', 'prowlers'))
+    
+    def select(enemy):
+        combat.setEnemySelected(next(e for e in combat.enemies if e.enemy is enemy), True)
+        
+    def fight():
+        match.stack.beginMacro()
+        unit = assets.Unit.get('guardian_golems')
+        player.units.append(unit)
+        match.map.setEnemies(site, [fireMages, ironclads, prowlers])
+        combat.start(site)
+        # ranged attack: ice is efficient against fire resistance
+        select(fireMages)
+        match.effects.add(effects.AttackPoints(5, element=Element.ice, range=AttackRange.range))
+        combat.next()
+        combat.skip()
+        # block: ironclads are brutal, thus block them
+        select(ironclads)
+        match.effects.add(effects.BlockPoints(3, element=Element.fire)) # inefficient: 1
+        match.effects.add(effects.BlockPoints(3))
+        combat.next()
+        combat.skip()
+        # assign damage: 4 physical damage are absorbed by the resistant golems
+        select(prowlers)
+        combat.assignDamageToUnit(unit)
+        # attack: kill both remaining enemies (ironclads resist physical attacks)
+        for enemy in (ironclads, prowlers):
+            select(enemy)
+        match.effects.add(effects.AttackPoints(6, element=Element.fire))
+        combat.next()
+        assert match.state is State.combatEnd
+        match.stack.abortMacro()
+        
+    rate = _run(fight, seconds)
+    print("combat: {:.0f} combats/s".format(rate))
+    return rate
+
+
+def legalActions(seconds=2):
+    """Throughput of Match.legalActions at the beginning of a turn (movement phase, full hand)."""
+    from mageknight import core
+    from mageknight.data import Hero
+    
+    match = core.Match([core.PlayerData('Benchmark', Hero.Norowas)], seed=0)
+    player = match.currentPlayer
+    count = len(match.legalActions(player))
+    rate = _run(lambda: match.legalActions(player), seconds)
+    print("legalActions: {:.0f} calls/s ({} actions)".format(rate, count))
+    return rate
+
+
+def handPotential(seconds=2):
+    """Throughput of evaluating the hand at the beginning of a turn (see core.handpotential), without and
+    with memoized results."""
+    from mageknight import core
+    from mageknight.core import handpotential as module
+    from mageknight.data import Hero
+    
+    match = core.Match([core.PlayerData('Benchmark', Hero.Norowas)], seed=0)
+    def evaluateCold():
+        module._cache.clear()
+        module.evaluate(match)
+    cold = _run(evaluateCold, seconds / 2)
+    warm = _run(lambda: module.evaluate(match), seconds / 2)
+    print("handPotential: {:.0f} evaluations/s, {:.0f} memoized evaluations/s".format(cold, warm))
+    return cold
+
+
+def saveLoad(seconds=2):
+    """Throughput of saving and loading a match (see core.savegame) after the first turns of a greedy
+    self-play match."""
+    import random
+    from mageknight import core, policies
+    from mageknight.core import savegame
+    from mageknight.data import Hero
+    
+    matchPolicies = [policies.GreedyPolicy(random.Random(i)) for i in range(2)]
+    match = core.Match([core.PlayerData('Benchmark {}'.format(i+1), hero, policy.decisionProvider())
+                        for i, (hero, policy) in enumerate(zip((Hero.Norowas, Hero.Tovak), matchPolicies))],
+                       seed=0)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(100):
+            player = match.currentPlayer
+            matchPolicies[match.players.index(player)].act(match, player)
+    data = savegame.save(match)
+    saveRate = _run(lambda: savegame.save(match), seconds / 2)
+    loadRate = _run(lambda: savegame.load(data), seconds / 2)
+    print("saveLoad: {:.0f} saves/s, {:.0f} loads/s ({} bytes, {} bytes without random state)"
+          .format(saveRate, loadRate, len(data), len(savegame.save(match, randomState=False))))
+    return loadRate
+
+
+def replay(seconds=2):
+    """Throughput of replaying the action log of a greedy self-play match (see core.replay): replaying
+    the whole log from the seed, and seeking to random positions using snapshots. Raise an AssertionError
+    if the log does not replay to the position of the match after undo and redo."""
+    import random
+    from mageknight import core, policies
+    from mageknight.core import replay as replayModule, savegame
+    from mageknight.data import Hero
+    
+    matchPolicies = [policies.GreedyPolicy(random.Random(i)) for i in range(2)]
+    match = core.Match([core.PlayerData('Benchmark {}'.format(i+1), hero, policy.decisionProvider())
+                        for i, (hero, policy) in enumerate(zip((Hero.Norowas, Hero.Tovak), matchPolicies))],
+                       seed=0)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        while not match.isOver and len(match.actionLog) < 500:
+            player = match.currentPlayer
+            matchPolicies[match.players.index(player)].act(match, player)
+        log = match.actionLog
+        for index in (0, match.stack.index()): # undo everything, then redo it
+            match.stack.setIndex(index)
+            assert savegame.save(replayModule.Replay(log).match()) == savegame.save(match), \
+                "The action log does not replay to the position after undo/redo"
+    
+    fullRate = _run(lambda: replayModule.Replay(log).match(), seconds / 2)
+    rng = random.Random(0)
+    replay = replayModule.Replay(log)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        replay.match() # take all snapshots
+    seekRate = _run(lambda: replay.match(rng.randrange(len(log) + 1)), seconds / 2)
+    print("replay: {:.0f} actions/s ({} actions), {:.0f} seeks/s with a snapshot every {} actions"
+          .format(fullRate * len(log), len(log), seekRate, replay.snapshotInterval))
+    return fullRate * len(log)
+
+
+def archive(seconds=2):
+    """Throughput of appending games to an archive (see mageknight.archive) and of randomly reading
+    index records and decoding action logs from it."""
+    import random, tempfile
+    from mageknight import archive as archiveModule, batch
+    
+    runner = batch.BatchRunner(2, ['greedy'], turnLimit=20)
+    runner.archive = archiveModule.GameBuffer()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        runner.runMatch(0)
+    games = runner.archive.take() * 100
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'benchmark.mka')
+        with archiveModule.ArchiveWriter(path) as writer:
+            appendRate = _run(lambda: writer.extend(games), seconds / 3) * len(games)
+        rng = random.Random(0)
+        with archiveModule.Archive(path) as archive:
+            infoRate = _run(lambda: archive[rng.randrange(len(archive))], seconds / 3)
+            logRate = _run(lambda: archive.log(rng.randrange(len(archive))), seconds / 3)
+            print("archive: {:.0f} appends/s, {:.0f} index reads/s, {:.0f} log decodes/s "
+                  "({} games, {} bytes per game)"
+                  .format(appendRate, infoRate, logRate, len(archive), len(games[0][0])))
+    return logRate
+
+
+def mcts(seconds=2):
+    """Throughput of the Monte Carlo tree search (see core.search) at the beginning of the first turn,
+    in actions executed and rolled back per second."""
+    from mageknight import core
+    from mageknight.core import search
+    from mageknight.data import Hero
+    
+    match = core.Match([core.PlayerData('Benchmark', Hero.Norowas)], seed=0)
+    player = match.currentPlayer
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        result = search.search(match, player, seconds=seconds, seed=0)
+    print("mcts: {:.0f} nodes/s, {:.0f} iterations/s"
+          .format(result.nodesPerSecond, result.iterationsPerSecond))
+    return result.nodesPerSecond
+
+
+# Budget for 'import mageknight.core' in a fresh interpreter (see importTime)
+IMPORT_TIME_BUDGET = 0.15
+# Modules which must not be imported by the engine
+GUI_MODULES = ('PyQt5.QtGui', 'PyQt5.QtWidgets', 'mageknight.gui')
+
+
+def importTime(runs=5):
+    """Import time of the engine ('import mageknight.core', measured with -X importtime in fresh
+    interpreters, best of *runs*). Raise an AssertionError if it exceeds IMPORT_TIME_BUDGET or if GUI
+    modules are imported. Worker processes (e.g. in mageknight.tournament) pay this on every start."""
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import mageknight.core'],
+                                env=env, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+        for line in output.splitlines():
+            parts = line.split('|')
+            if len(parts) == 3 and parts[2].strip() == 'mageknight.core':
+                times.append(int(parts[1]) / 1e6)
+    code = 'import sys, mageknight.core; print(*sys.modules)'
+    modules = subprocess.run([sys.executable, '-c', code], env=env, stdout=subprocess.PIPE,
+                             universal_newlines=True, check=True).stdout.split()
+    best = min(times)
+    print("importTime: {:.1f} ms (budget {:.0f} ms), {} modules"
+          .format(best * 1000, IMPORT_TIME_BUDGET * 1000, len(modules)))
+    gui = [name for name in modules if name.startswith(GUI_MODULES)]
+    assert len(gui) == 0, "The engine imports GUI modules: {}".format(', '.join(gui))
+    assert best <= IMPORT_TIME_BUDGET, "Importing the engine exceeds the budget"
+    return best
+
+
+BENCHMARKS = [combat, legalActions, handPotential, saveLoad, replay, archive, mcts, importTime]
+
+
+def main(names):
+    for benchmark in BENCHMARKS:
+        if len(names) == 0 or benchmark.__name__ in names:
+            benchmark()
+            
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
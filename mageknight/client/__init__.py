@@ -84,6 +84,8 @@ class LocalMatchClient(Adapter):
     @action
     def assignDamageToUnit(self, unit): pass
     @action
+    def assignDamagePlan(self, plan): pass
+    @action
     def activateAction(self, actionId): pass
     @action
     def explore(self, coords): pass
@@ -94,7 +96,7 @@ class LocalMatchClient(Adapter):
 
         
 class ManaSourceAdapter(Adapter):
-    _attrs = ['changed', 'count']
+    _attrs = ['changed', 'count', 'countColor']
     
     def __len__(self):
         return len(self._object)
@@ -102,7 +104,7 @@ class ManaSourceAdapter(Adapter):
     def __getitem__(self, index):
         return self._object[index]
     
-    def __contains(self, item):
+    def __contains__(self, item):
         return item in self._object
     
     def __iter__(self):
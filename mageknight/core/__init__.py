@@ -21,10 +21,7 @@
 
 from . import effects
 
-# import these so that all cards/units are registered
-from mageknight.assets import units
-from mageknight.assets import cards
-from mageknight.assets import artifacts
+# Cards and units are registered when they are used for the first time, see assets.MODULES
 
 from .source import ManaSource
 from .player import Player
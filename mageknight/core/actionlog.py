@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Event-sourced action log. Each match records every player action that is executed through an @action
+method (see core.decorators) in match.actionLog: the action's name, the player, the arguments encoded
+as small integer ids and the answers of the decision providers. Together with the seed of the match this
+determines the match completely, so that any position can be rebuilt by executing the log again (see
+core.replay).
+
+Arguments are encoded relative to the state of the match before the action, e.g. a card is encoded as
+its position in the player's hand and an enemy as its position in the combat. Actions that fail are
+logged, too, because they may have used random numbers before failing.
+"""
+
+import base64
+
+from mageknight import stack
+from mageknight.hexcoords import HexCoords
+from mageknight.data import * # @UnusedWildImport
+from . import assets, combat, damageplanner, decisions
+
+# Tags of encoded arguments
+(_VALUE, _COORDS, _HAND_CARD, _CARD, _UNIT, _SHOP_UNIT, _UNIT_NAME, _ABILITY, _ENEMY, _REWARD, _REWARD_ITEM,
+ _MANA, _PLAN) = range(13)
+
+
+class LogEntry:
+    """A single action in an ActionLog: the name of the Match-method, the index of the player, the encoded
+    arguments (a list) and keyword arguments (a dict), the answers of decision providers and whether the
+    action succeeded."""
+    __slots__ = ('action', 'player', 'args', 'kwargs', 'answers', 'result')
+    
+    def __init__(self, action, player, args, kwargs, answers=None, result=None):
+        self.action = action
+        self.player = player
+        self.args = args
+        self.kwargs = kwargs
+        self.answers = answers if answers is not None else []
+        self.result = result
+        
+    def __repr__(self):
+        return 'LogEntry({}, {}, {}, {}, {}, {})'.format(self.action, self.player, self.args, self.kwargs,
+                                                          self.answers, self.result)
+    
+
+class ActionLog:
+    """Log of the actions of *match*. Undoing actions removes them from the log. If the match did not
+    start from its seed (e.g. it was loaded from a save game), *initialState* is the save game it started
+    from."""
+    def __init__(self, match, initialState=None):
+        self.match = match
+        self.seed = match.random.seed
+        self.players = [(player.name, player.hero) for player in match.players]
+        self.initialState = initialState
+        self.entries = []
+        self._current = None # entry of the action that is executed at the moment
+        
+    def __len__(self):
+        return len(self.entries)
+    
+    def __iter__(self):
+        return iter(self.entries)
+    
+    def __getitem__(self, index):
+        return self.entries[index]
+    
+    @property
+    def recording(self):
+        """Whether an action is executed at the moment (i.e. between begin and end)."""
+        return self._current is not None
+    
+    def begin(self, action, player, args, kwargs):
+        """Start logging the action *action* (name of a Match-method) called with the given arguments.
+        Return the new LogEntry or None if another action is already being logged (nested actions are
+        part of the outer action)."""
+        if self._current is not None:
+            return None
+        match = self.match
+        self._current = LogEntry(action, match.players.index(player), encodeArgs(match, player, args),
+                                 {key: encodeArg(match, player, value) for key, value in kwargs.items()})
+        return self._current
+        
+    def end(self, entry, result, undoable=False):
+        """Finish logging *entry* (as returned by begin) and append it to the log. If *undoable* is True,
+        the entry is appended using the match's undo stack, so that undoing the action removes the entry
+        (and all entries logged after it) again."""
+        if entry is not None:
+            entry.result = result
+            self._current = None
+            if undoable:
+                self.match.stack.push(stack.Call(self.entries.append, entry),
+                                      stack.Call(self._truncate, entry))
+            else:
+                self.entries.append(entry)
+    
+    def _truncate(self, entry):
+        """Remove *entry* and all entries after it (failed actions) from the log."""
+        for i in range(len(self.entries)-1, -1, -1):
+            if self.entries[i] is entry:
+                del self.entries[i:]
+                return
+            
+    def recordingProvider(self, provider):
+        """Return a DecisionProvider that records the answers of *provider* into the current entry."""
+        return decisions.RecordingDecisionProvider(provider, self._current.answers)
+    
+    def toJson(self):
+        """Return the log as a JSON-serializable dict (see fromJson)."""
+        return {
+            'seed': self.seed,
+            'players': [[name, hero.name] for name, hero in self.players],
+            'initialState': base64.b64encode(self.initialState).decode('ascii')
+                            if self.initialState is not None else None,
+            'entries': [[e.action, e.player, e.args, e.kwargs, e.answers, e.result] for e in self.entries],
+        }
+        
+    @staticmethod
+    def fromJson(data):
+        """Create a log from a dict returned by toJson. The log is not connected to a match."""
+        log = ActionLog.__new__(ActionLog)
+        log.match = None
+        log.seed = data['seed']
+        log.players = [(name, Hero[hero]) for name, hero in data['players']]
+        log.initialState = base64.b64decode(data['initialState']) \
+                            if data['initialState'] is not None else None
+        log.entries = [LogEntry(*values) for values in data['entries']]
+        log._current = None
+        return log
+        
+
+def encodeArgs(match, player, args):
+    """Encode the arguments *args* of an action of *player*. Arguments may refer to previous arguments
+    (e.g. the ability of a unit)."""
+    result = []
+    previous = None
+    for arg in args:
+        result.append(encodeArg(match, player, arg, previous))
+        previous = arg
+    return result
+
+
+def encodeArg(match, player, value, previous=None):
+    """Encode a single argument *value* as a list of ints (and strings for names). *previous* is the
+    previous argument of the action."""
+    if value is None or isinstance(value, (bool, int, str)):
+        return [_VALUE, value]
+    if isinstance(value, HexCoords):
+        return [_COORDS, value.x, value.y]
+    if isinstance(value, Mana):
+        return [_MANA, value.value]
+    if isinstance(value, assets.Card):
+        if isinstance(previous, CombatReward) and _indexOf(previous.items, value) is not None:
+            return [_REWARD_ITEM, _indexOf(previous.items, value)]
+        index = _indexOf(player.handCards, value)
+        if index is not None:
+            return [_HAND_CARD, index]
+        return [_CARD, value.name if not value.isWound else 'wound']
+    if isinstance(value, assets.Unit):
+        if isinstance(previous, CombatReward) and _indexOf(previous.items, value) is not None:
+            return [_REWARD_ITEM, _indexOf(previous.items, value)]
+        for tag, units in ((_UNIT, player.units), (_SHOP_UNIT, match.shop.units)):
+            index = _indexOf(units, value)
+            if index is not None:
+                return [tag, index]
+        return [_UNIT_NAME, value.name]
+    if isinstance(value, assets.UnitAbility):
+        return [_ABILITY, previous.abilities.index(value)]
+    if isinstance(value, CombatReward):
+        return [_REWARD, _indexOf(match.combat.rewards, value)]
+    if isinstance(value, damageplanner.DamagePlan):
+        return [_PLAN, [[_indexOf(match.combat.enemies, step.enemy),
+                         [_indexOf(player.units, unit) for unit in step.units],
+                         step.toHero] for step in value.steps]]
+    if isinstance(value, combat.EnemyInCombat):
+        return [_ENEMY, _indexOf(match.combat.enemies, value)]
+    raise ValueError("Cannot encode action argument {!r}.".format(value))
+    
+
+def decodeArgs(match, player, args):
+    """Decode arguments encoded by encodeArgs in the current state of *match*."""
+    result = []
+    previous = None
+    for arg in args:
+        previous = decodeArg(match, player, arg, previous)
+        result.append(previous)
+    return result
+    
+    
+def decodeArg(match, player, arg, previous=None):
+    """Decode a single argument encoded by encodeArg."""
+    tag = arg[0]
+    if tag == _VALUE:
+        return arg[1]
+    if tag == _COORDS:
+        return HexCoords(arg[1], arg[2])
+    if tag == _MANA:
+        return Mana(arg[1])
+    if tag == _HAND_CARD:
+        return player.handCards[arg[1]]
+    if tag == _CARD:
+        return assets.get(arg[1])
+    if tag == _UNIT:
+        return player.units[arg[1]]
+    if tag == _SHOP_UNIT:
+        return match.shop.units[arg[1]]
+    if tag == _UNIT_NAME:
+        return assets.Unit.get(arg[1])
+    if tag == _ABILITY:
+        return previous.abilities[arg[1]]
+    if tag == _ENEMY:
+        return match.combat.enemies[arg[1]]
+    if tag == _REWARD:
+        return match.combat.rewards[arg[1]]
+    if tag == _REWARD_ITEM:
+        return previous.items[arg[1]]
+    if tag == _PLAN:
+        steps = [damageplanner.DamageStep(match.combat.enemies[enemy], [player.units[u] for u in units],
+                                          toHero)
+                 for enemy, units, toHero in arg[1]]
+        return damageplanner.DamagePlan(steps, None)
+    raise ValueError("Invalid encoded argument {!r}.".format(arg))
+
+
+def _indexOf(items, value):
+    """Return the index of *value* in *items* (comparing by identity) or None."""
+    for i, item in enumerate(items):
+        if item is value:
+            return i
+    return None
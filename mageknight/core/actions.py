@@ -20,6 +20,8 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import contextlib, functools
+
 from PyQt5 import QtCore
 
 from mageknight import stack
@@ -31,14 +33,22 @@ class Action:
         self.title = title
         self.method = method
         
+    def isEqual(self, other):
+        """Return whether *other* is an action with the same id, title and method."""
+        return self.id == other.id and self.title == other.title and _sameMethod(self.method, other.method)
+        
         
 class ActionList(QtCore.QObject):
+    """The list of actions (e.g. 'End turn', 'Interact') available to the current player, sorted by title.
+    Usually the list is recomputed using update (see Match.updateActions)."""
     changed = QtCore.pyqtSignal()
     
     def __init__(self, match):
         super().__init__()
         self.match = match
         self._list = []
+        self._ids = {} # id -> action, for fast lookup
+        self._pending = None # actions added within update
         
     def __iter__(self):
         return iter(self._list)
@@ -53,16 +63,13 @@ class ActionList(QtCore.QObject):
         return self._list[index]
     
     def find(self, actionId):
-        for action in self._list:
-            if action.id == actionId:
-                return action
-        else: return None
+        return self._ids.get(actionId)
     
     def activate(self, match, player, actionId):
         action = self.find(actionId)
         if action is not None:
             import inspect
-            argCount = len(inspect.getargspec(action.method).args) - 1 # -1 because first arg is self
+            argCount = len(inspect.getfullargspec(action.method).args) - 1 # -1 because first arg is self
             if argCount >= 2:
                 action.method(match, player)
             elif argCount == 1:
@@ -70,7 +77,11 @@ class ActionList(QtCore.QObject):
             else: action.method()
             
     def add(self, id, title, method):
-        if id in (action.id for action in self._list):
+        if self._pending is not None:
+            if id not in self._pending:
+                self._pending[id] = Action(id, title, method)
+            return
+        if id in self._ids:
             return
         i = 0
         while i < len(self._list) and self._list[i].title < title:
@@ -80,18 +91,42 @@ class ActionList(QtCore.QObject):
                               stack.Call(self._remove, action))
     
     def remove(self, actionId):
-        for index, action in enumerate(self._list):
-            if action.id == actionId:
-                self.match.stack.push(stack.Call(self._remove, action),
-                                      stack.Call(self._insert, index, action))
-                break
+        action = self._ids.get(actionId)
+        if action is not None:
+            index = self._list.index(action)
+            self.match.stack.push(stack.Call(self._remove, action),
+                                  stack.Call(self._insert, index, action))
+    
+    @contextlib.contextmanager
+    def update(self):
+        """Replace the list by the actions which are added within the with-block:
+        
+            with match.actions.update():
+                match.actions.add('endturn', "End turn", match.endTurn)
+                
+        Unlike clearing the list and adding the actions again, this changes the list (using a single undo
+        command and a single signal) only if the actions differ from the current ones.
+        """
+        assert self._pending is None
+        self._pending = pending = {}
+        try:
+            yield
+        finally:
+            self._pending = None
+        newList = sorted(pending.values(), key=lambda action: action.title)
+        if len(newList) != len(self._list) or not all(new.isEqual(old)
+                                                      for new, old in zip(newList, self._list)):
+            self.match.stack.push(stack.Call(self._setActions, newList),
+                                  stack.Call(self._setActions, self._list))
         
     def _insert(self, index, action):
         self._list.insert(index, action)
+        self._ids[action.id] = action
         self.changed.emit()
         
     def _remove(self, action):
         self._list.remove(action)
+        del self._ids[action.id]
         self.changed.emit()
         
     def clear(self):
@@ -100,6 +135,12 @@ class ActionList(QtCore.QObject):
         
     def _setActions(self, actionList):
         self._list = actionList
+        self._ids = {action.id: action for action in actionList}
         self.changed.emit()
         
-        
\ No newline at end of file
+
+def _sameMethod(method, other):
+    # Partials are created anew for each update and do not compare equal, bound methods do
+    if isinstance(method, functools.partial) and isinstance(other, functools.partial):
+        return method.func == other.func and method.args == other.args and method.keywords == other.keywords
+    return method == other
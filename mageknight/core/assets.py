@@ -22,44 +22,162 @@
 
 """Abstract base classes and miscellaneous stuff around assets (i.e. cards and units)."""
 
-import functools
+import bisect, importlib
 
 from mageknight import utils
+from mageknight.data import elementMask, AttackRange, EffectType, State
+from mageknight.core import effects
+
+
+# Modules which define the concrete cards and units, in the order in which they are registered. They are
+# imported when the registry is used for the first time (see _load) and not when the engine is imported.
+MODULES = ('mageknight.assets.cards', 'mageknight.assets.artifacts', 'mageknight.assets.units')
+
+# Registry of all concrete cards and units (classes which define a 'name'). It is filled when the classes
+# are defined (see _register), so that lookups do not need to scan subclasses.
+_classesByName = {}
+_classesById = []
+_flyweights = {} # id -> shared card instance, see flyweight
+_loaded = False
+
+
+def _load():
+    """Import the modules in MODULES, unless this has been done before."""
+    global _loaded
+    if not _loaded:
+        _loaded = True
+        for module in MODULES:
+            importlib.import_module(module)
+
+
+def loadAll():
+    """Fill the registry now instead of when it is used for the first time, e.g. to prepare a worker
+    process before it runs matches."""
+    _load()
+
+
+def _register(cls):
+    """Called for each subclass of Card and Unit: Abstract classes get their own list of concrete classes
+    (see classes), concrete classes get an integer id and are added to the registry and to the lists of all
+    their abstract base classes."""
+    if 'name' not in cls.__dict__:
+        cls._concreteClasses = []
+        return
+    if cls.name in _classesByName:
+        raise ValueError("There is already an asset with name '{}'.".format(cls.name))
+    cls.id = len(_classesById)
+    _classesByName[cls.name] = cls
+    _classesById.append(cls)
+    for base in cls.__mro__[1:]:
+        if '_concreteClasses' in base.__dict__:
+            base._concreteClasses.append(cls)
 
 
 def get(name):
-    """Return the card or unit of the given name."""
-    classes = [BasicAction, AdvancedAction, Artifact, RegularUnit, EliteUnit]
-    for cls in classes:
-        for subclass in cls.__subclasses__():
-            if subclass.name == name:
-                return subclass()
-    if name == 'wound':
-        return Wound()
-    raise ValueError("There is no asset with name '{}'.".format(name))
+    """Return the card or unit of the given name. Cards are shared instances (see Card), units are new
+    instances."""
+    return getClass(name)()
+
+
+def getClass(name):
+    """Return the class of the card or unit of the given name."""
+    _load()
+    try:
+        return _classesByName[name]
+    except KeyError:
+        raise ValueError("There is no asset with name '{}'.".format(name)) from None
+    
+    
+def getById(id):
+    """Return the class of the card or unit with the given integer id (see Card.id and Unit.id). Ids are
+    assigned in the order in which classes are defined."""
+    _load()
+    return _classesById[id]
+
+
+def flyweight(id):
+    """Return the shared instance of the card with the given id (see Card). This is a fast path for piles
+    which store card ids (see core.deck)."""
+    try:
+        return _flyweights[id]
+    except KeyError:
+        card = _flyweights[id] = getById(id)()
+        return card
+
+
+def allClasses():
+    """Return a list of all card and unit classes, ordered by id."""
+    _load()
+    return list(_classesById)
 
 
 class Card:
-    """Abstract base class for all cards. Note that two instances are always considered different."""
+    """Abstract base class for all cards. Cards are immutable definitions: Each card class has a single
+    shared instance, which is returned whenever the class is instantiated. Copies of a card (e.g. the two
+    'march' cards of a starting deck, or wounds) are only distinguished by their positions in piles (see
+    core.deck)."""
+    _concreteClasses = []
+    isWound = False
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        _register(cls)
+        
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super().__new__(cls)
+            cls._instance = instance
+        return instance
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards are shared and cannot be modified.")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Cards are shared and cannot be modified.")
+        
     def __str__(self):
         return self.title
     
     def __repr__(self):
         return type(self).__name__
     
-    @property
-    def isWound(self):
-        return isinstance(self, Wound)
+    @classmethod
+    def classes(cls):
+        """Return the list of all concrete card classes derived from this abstract class."""
+        _load()
+        return cls._concreteClasses
     
     @classmethod
     def all(cls):
-        result = []
-        for cardClass in cls.__subclasses__():
-            result.append(cardClass())
-        return result
+        """Return the instance of each card derived from this abstract class."""
+        return [cardClass() for cardClass in cls.classes()]
     
     
 class ActionCard(Card):
+    """Abstract base class for basic and advanced actions. Many actions simply let the player choose one of
+    several effects. Such cards only need to specify *basicOptions* and *strongOptions*, the default
+    implementations of basicEffect and strongEffect will ask the user to choose one of them.
+    The options are also used to evaluate cards without playing them (e.g. in core.simulation). Cards with
+    more complicated effects reimplement the effect methods and may still specify options which describe
+    (a lower bound of) their effects.
+    """
+    basicOptions = tuple()
+    strongOptions = tuple()
+    
+    def basicEffect(self, match, player):
+        match.effects.add(self._chooseOption(match, player, self.basicOptions))
+        
+    def strongEffect(self, match, player):
+        match.effects.add(self._chooseOption(match, player, self.strongOptions))
+        
+    @staticmethod
+    def _chooseOption(match, player, options):
+        assert len(options) > 0
+        if len(options) == 1:
+            return options[0]
+        return match.decisions(player).choose(options)
+    
     def pixmap(self):
         return utils.getPixmap('mk/cards/{}/{}.jpg'
                             .format('advanced_actions' if self.isAdvanced else 'basic_actions', self.name))
@@ -84,34 +202,89 @@ class Artifact(Card):
 
 
 class Wound(Card):
+    name = 'wound'
+    isWound = True
+    
     def pixmap(self):
         return utils.getPixmap('mk/cards/wound.jpg')
 
 
 class UnitAbility:
-    """This method represents a single ability of a unit. Besides the method that is invoked, when the
-    ability is activated, it stores the position (y-coordinate) on the card (to map clicks to abilities)
-    and the cost (None or a mana color).
+    """A single ability of a unit. Abilities are data, so that they can be inspected without activating
+    them (e.g. to find the legal actions):
+        - pos: the position (y-coordinate) on the card (to map clicks to abilities, see Unit.abilityAt),
+        - cost: None or a mana color,
+        - type: the EffectType of the ability,
+        - options: effects which the player may choose from (see below),
+        - states: the states in which the ability can be used or None if this is not restricted.
+    If *method* is None, activating the ability will let the player choose one of the options. Otherwise
+    *method* is invoked and the options (if any) describe its effects, like the options of ActionCards.
     """
-    def __init__(self, pos, cost, method):
+    __slots__ = ('pos', 'cost', 'type', 'options', 'states', 'method')
+    
+    def __init__(self, pos, cost, type, options, states, method=None):
         self.pos = pos
         self.cost = cost
+        self.type = type
+        self.options = options
+        self.states = states
         self.method = method
         
+    def __call__(self, method):
+        """Return a copy of this ability which invokes *method*. This allows to use 'ability' as
+        decorator."""
+        return UnitAbility(self.pos, self.cost, self.type, self.options, self.states, method)
+        
     def activate(self, unit, match, player):
-        self.method(unit, match, player)
+        if self.method is not None:
+            self.method(unit, match, player)
+        else: match.effects.add(ActionCard._chooseOption(match, player, self.options))
         
     def __repr__(self):
-        return self.method
+        if self.method is not None:
+            return 'UnitAbility({})'.format(self.method.__name__)
+        return 'UnitAbility({})'.format(self.pos)
     
 
-def ability(pos, cost=None):
-    """Decorator to transform methods to UnitAbilities. *pos* is the y-coordinate of the ability on the 
-    card (None for the first ability). *cost* is either None or a mana color.
+def ability(pos, cost=None, type=None, options=(), states=None):
+    """Create a UnitAbility. *pos* is the y-coordinate of the ability on the card (None for the first
+    ability). *cost* is either None or a mana color. Abilities which simply add one of several *options*
+    (effects) can be assigned to a class attribute directly:
+    
+        ability2 = ability(417, options=(effects.BlockPoints(3), ))
+    
+    Other abilities decorate a method (which gets the unit, the match and the player). *type* defaults to
+    the common EffectType of all options, *states* to the states in which the options can be played.
     """
     if pos is None:
         pos = 294 # y-coordinate of the top of the first ability
-    return functools.partial(UnitAbility, pos, cost)
+    options = tuple(options)
+    if type is None:
+        types = set(option.type for option in options)
+        type = types.pop() if len(types) == 1 else EffectType.unknown
+    if states is None and len(options) > 0:
+        optionStates = [_optionStates(option) for option in options]
+        if None not in optionStates:
+            states = frozenset(state for s in optionStates for state in s)
+    elif states is not None:
+        states = frozenset(states)
+    return UnitAbility(pos, cost, type, options, states)
+
+
+def _optionStates(option):
+    """Return the states in which *option* (an effect) may be played or None if this is not restricted.
+    The result is only a fast preselection, effectError in Match/Combat has the final word."""
+    if option.type is EffectType.movement:
+        return (State.movement, )
+    elif option.type is EffectType.influence:
+        return (State.interaction, )
+    elif isinstance(option, effects.BlockPoints):
+        return (State.block, )
+    elif isinstance(option, effects.AttackPoints):
+        if option.range is AttackRange.normal:
+            return (State.attack, )
+        else: return (State.rangeAttack, State.attack)
+    return None
 
 
 class Unit:
@@ -133,7 +306,25 @@ class Unit:
     wounds = 0          # number of wounds ∈ {0,1,2},  see isWounded
     isReady = True      
     isProtected = False # true if no damage can be assigned to this unit
+    abilities = ()      # tuple of all UnitAbilities, sorted by position (see __init_subclass__)
+    _abilityPositions = ()
+    _concreteClasses = []
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Collect abilities once per class and not whenever they are needed
+        abilities = {}
+        for base in reversed(cls.__mro__):
+            for name, value in base.__dict__.items():
+                if isinstance(value, UnitAbility):
+                    abilities[name] = value
+        cls.abilities = tuple(sorted(abilities.values(), key=lambda ability: ability.pos))
+        cls._abilityPositions = tuple(ability.pos for ability in cls.abilities)
+        _register(cls)
+    
+    def __init__(self):
+        self.resistanceMask = elementMask(self.resistances) # for fast checks, see Element.mask
+        
     def __str__(self):
         return self.title
     
@@ -149,28 +340,31 @@ class Unit:
     def isWounded(self):
         return self.wounds > 0
     
-    @property
-    def abilities(self):
-        """A sorted list of all abilities."""
-        abilities = [x for x in type(self).__dict__.values() if isinstance(x, UnitAbility)]
-        abilities.sort(key=lambda ability: ability.pos)
-        return abilities
+    def abilityAt(self, pos):
+        """Return the ability at the given y-coordinate on the card (unscaled) or None if there is no
+        ability at this position."""
+        index = bisect.bisect_right(self._abilityPositions, pos) - 1
+        return self.abilities[index] if index >= 0 else None
+    
+    @classmethod
+    def classes(cls):
+        """Return the list of all concrete unit classes derived from this abstract class."""
+        _load()
+        return cls._concreteClasses
     
     @classmethod
     def all(cls):
-        result = []
-        for unitClass in cls.__subclasses__():
-            for _ in range(unitClass.count):
-                result.append(unitClass())
-        return result
+        """Return all unit cards derived from this abstract class (*count* instances of each unit)."""
+        return [unitClass() for unitClass in cls.classes() for _ in range(unitClass.count)]
     
     @staticmethod
     def get(name):
         """Return a unit from its name."""
-        for subclass in RegularUnit.__subclasses__() + EliteUnit.__subclasses__():
-            if subclass.name == name:
-                return subclass()
-        raise ValueError("There is no unit with name '{}'.".format(name))
+        _load()
+        cls = _classesByName.get(name)
+        if cls is None or not issubclass(cls, Unit):
+            raise ValueError("There is no unit with name '{}'.".format(name))
+        return cls()
     
 
 class RegularUnit(Unit):
@@ -43,7 +43,15 @@ class EffectList(QtCore.QObject):
                               stack.Call(self._add, effect))
     
     def clear(self):
-        self._list = []
+        self.match.stack.push(stack.Call(self._setList, []),
+                              stack.Call(self._setList, list(self._list)))
+        
+    def _setList(self, effects):
+        for effect in self._list:
+            self.match.zobrist.remove('effect', effect)
+        self._list = list(effects)
+        for effect in self._list:
+            self.match.zobrist.add('effect', effect)
         self.changed.emit()
         
     def _add(self, effect):
@@ -52,9 +60,7 @@ class EffectList(QtCore.QObject):
             new = e.add(effect)
             if new is False:
                 continue
-            elif new is not None:
-                self._list[i] = new
-            else: del self._list[i]
+            self._replace(i, new)
             self.changed.emit()
             return
         else:
@@ -63,6 +69,7 @@ class EffectList(QtCore.QObject):
             while i < len(self._list) and self._list[i] < effect:
                 i += 1
             self._list.insert(i, effect)
+            self.match.zobrist.add('effect', effect)
             self.changed.emit()
         
     def _remove(self, effect):
@@ -70,13 +77,19 @@ class EffectList(QtCore.QObject):
             new = e.remove(effect)
             if new is False:
                 continue
-            elif new is not None:
-                self._list[i] = new
-            else: del self._list[i]
+            self._replace(i, new)
             self.changed.emit()
             return True
         else: False
         
+    def _replace(self, i, new):
+        """Replace the effect at index *i* by *new* (which may be None to delete the effect)."""
+        self.match.zobrist.remove('effect', self._list[i])
+        if new is not None:
+            self._list[i] = new
+            self.match.zobrist.add('effect', new)
+        else: del self._list[i]
+        
     def __iter__(self):
         return iter(self._list)
     
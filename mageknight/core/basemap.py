@@ -25,7 +25,7 @@ from PyQt5 import QtCore
 from mageknight import stack
 from mageknight.hexcoords import HexCoords
 from mageknight.data import * # @UnusedWildImport
-from . import player
+from . import player, zobrist
     
     
 class Map(QtCore.QObject):
@@ -41,6 +41,7 @@ class Map(QtCore.QObject):
     
     """
     tileAdded = QtCore.pyqtSignal(HexCoords)
+    tileRemoved = QtCore.pyqtSignal(HexCoords)
     siteChanged = QtCore.pyqtSignal(HexCoords)
     personChanged = QtCore.pyqtSignal(player.Player)
     terrainCostsChanged = QtCore.pyqtSignal()
@@ -62,8 +63,15 @@ class Map(QtCore.QObject):
         assert isTileCenter(coords)
         assert coords not in self.tiles
         self.tiles[coords] = tile
+        self.match.zobrist.add('tile', coords, tile.id)
         self.tileAdded.emit(coords)
         
+    def _removeTile(self, coords):
+        """Remove the tile at *coords* (to undo exploring it)."""
+        self.match.zobrist.remove('tile', coords, self.tiles[coords].id)
+        del self.tiles[coords]
+        self.tileRemoved.emit(coords)
+        
     def tileAt(self, coords):
         """Return the tile at the given hex (contrary to self.tiles[coords] this works even if *coords* does
         not point to the center of the tile)."""
@@ -100,9 +108,13 @@ class Map(QtCore.QObject):
         # note: this is only executed when new tiles are revealed => no undo/redo necessary
         assert site.coords not in self.sites 
         self.sites[site.coords] = site
+        for feature in zobrist.siteFeatures(site):
+            self.match.zobrist.add(*feature)
         self.siteChanged.emit(site.coords)
         
     def _removeSite(self, site):
+        for feature in zobrist.siteFeatures(site):
+            self.match.zobrist.remove(*feature)
         del self.sites[site.coords]
         self.siteChanged.emit(site.coords)
     
@@ -120,10 +132,12 @@ class Map(QtCore.QObject):
         """Add the given person to the specified hex."""
         assert person not in self.persons
         self.persons[person] = coords
+        self.match.zobrist.add('person', person, coords)
         self.personChanged.emit(person)
     
     def _removePerson(self, person):
         """Remove the given person from the map."""
+        self.match.zobrist.remove('person', person, self.persons[person])
         del self.persons[person]
         self.personChanged.emit(person)
     
@@ -134,7 +148,9 @@ class Map(QtCore.QObject):
         
     def _movePerson(self, person, coords):
         """Move the given person to the specified hex."""
+        self.match.zobrist.remove('person', person, self.persons[person])
         self.persons[person] = coords
+        self.match.zobrist.add('person', person, coords)
         self.personChanged.emit(person)
 
     def setEnemies(self, site, enemies):
@@ -142,10 +158,16 @@ class Map(QtCore.QObject):
                               stack.Call(self._setEnemies, site, site.enemies))
 
     def removeEnemy(self, site, enemy):
-        enemies = [e for e in site.enemies if e != enemy]
+        enemies = list(site.enemies)
+        enemies.remove(enemy) # remove only one token: enemies with count > 1 share the same object
         self.setEnemies(site, enemies)
 
     def _setEnemies(self, site, enemies):
+        if site.coords in self.sites:
+            for enemy in site.enemies:
+                self.match.zobrist.remove('site', site.coords, 'enemy', enemy)
+            for enemy in enemies:
+                self.match.zobrist.add('site', site.coords, 'enemy', enemy)
         site.enemies = enemies
         self.siteChanged.emit(site.coords)
         
@@ -155,6 +177,9 @@ class Map(QtCore.QObject):
                                   stack.Call(self._setOwner, site, site.owner))
     
     def _setOwner(self, site, player):
+        if site.coords in self.sites:
+            self.match.zobrist.remove('site', site.coords, 'owner', site.owner)
+            self.match.zobrist.add('site', site.coords, 'owner', player)
         site.owner = player
         self.siteChanged.emit(site.coords)
         
@@ -179,13 +204,15 @@ def isTileCenter(coords):
     return (3*coords.x - coords.y) % 7 == 0 and (coords.x + 2*coords.y) % 7 == 0
 
 
+# Maps (3*x - y) % 7 to the position of a hex relative to the center of its tile. The value is the same for
+# all hexes with the same position within their tile (it is 0 for tile centers, see isTileCenter).
+_TILE_OFFSETS = {(3*x - y) % 7: (x, y) for x, y in [(0, 0)] + HexCoords._neighbors}
+
+
 def tileCenter(coords):
     """Get the coordinates of the center of the tile at the given coordinates."""
-    if isTileCenter(coords):
+    x, y = _TILE_OFFSETS[(3*coords.x - coords.y) % 7]
+    if x == 0 and y == 0:
         return coords
-    else:
-        for n in coords.neighbors():
-            if isTileCenter(n):
-                return n
-    assert False
+    return HexCoords(coords.x - x, coords.y - y)
     
\ No newline at end of file
@@ -24,28 +24,54 @@ import math
 
 from PyQt5 import QtCore
 
-from mageknight.gui import dialogs
 from mageknight.data import * # @UnusedWildImport
-from . import effects, sites, assets
+from . import effects, sites, assets, damageplanner
 from mageknight.attributes import * # @UnusedWildImport
     
 
 class EnemyInCombat:
-    def __init__(self, enemy, site, isProvokable):
+    """An enemy taking part in a combat. For summoners, *summoned* is the enemy that attacks instead of the
+    summoner: the attributes attack, swift, brutal, poison and paralyze refer to this enemy."""
+    def __init__(self, enemy, site, isProvokable, summoned=None):
         self.enemy = enemy
         self.site = site
+        self.summoned = summoned
         self.effects = []
         self.isProvokable = isProvokable
         self.isAlive = True
         self.isSelected = False
         self.isBlocked = False
-        self.damage = enemy.attack.value
-        if enemy.brutal:
+        self.damage = self.attack.value
+        if self.brutal:
             self.damage *= 2
         
     @property
     def isAttacking(self):
         return self.isAlive and not self.isBlocked # TODO: check self.effects for "enemy does not attack" 
+    
+    @property
+    def attacker(self):
+        return self.summoned if self.summoned is not None else self.enemy
+    
+    @property
+    def attack(self):
+        return self.attacker.attack
+    
+    @property
+    def swift(self):
+        return self.attacker.swift
+    
+    @property
+    def brutal(self):
+        return self.attacker.brutal
+    
+    @property
+    def poison(self):
+        return self.attacker.poison
+    
+    @property
+    def paralyze(self):
+        return self.attacker.paralyze
         
     def __getattr__(self, attr):
         return getattr(self.enemy, attr)
@@ -62,16 +88,18 @@ class Combat(AttributeObject):
                                             ('isBlocked', bool),
                                             ('isProvokable', bool),
                                             ('damage', int)
-                                           ])
+                                           ],
+                            hashed=True, itemKey=lambda e: (e.enemy, e.summoned))
     rewards = ListAttribute(CombatReward,
                             itemAttributes=[('count', int), 
                                             ('items', list)])
-    effectsPlayed = BoolAttribute()
+    effectsPlayed = BoolAttribute(hashed=True)
     currentReward = Attribute(CombatReward)
-    woundsAssignedToHero = IntAttribute() # count wounds received in this combat (for knock out)
+    woundsAssignedToHero = IntAttribute(hashed=True) # count wounds received in this combat (for knock out)
     
     def __init__(self, match):
         super().__init__(match.stack)
+        self.zobrist = match.zobrist
         self.match = match
         
     def hasSelectedEnemy(self):
@@ -107,9 +135,21 @@ class Combat(AttributeObject):
         
     def addEnemies(self, site, provokable=False):
         assert self.match.state is State.initCombat
-        enemies = [EnemyInCombat(enemy, site, provokable) for enemy in site.enemies]
+        enemies = []
+        for enemy in site.enemies:
+            summoned = None
+            if enemy.attack.element is Element.summoner:
+                # TODO: Rules: the summoned enemy is drawn at the beginning of the block phase
+                summoned = self.match.enemyPiles.draw(enemy.attack.value)
+            enemies.append(EnemyInCombat(enemy, site, provokable, summoned))
         self.enemies.extend(enemies)
         
+    def _discardSummoned(self, enemies):
+        """Put the summoned enemies of *enemies* onto the discard piles."""
+        for enemy in enemies:
+            if enemy.summoned is not None:
+                self.match.enemyPiles.discard(enemy.summoned)
+        
     def start(self, site=None, unitsAllowed=True, nightRules=False):
         """Start a combat.
             - site: If given, all enemies from this site will be added to the combat.
@@ -154,9 +194,10 @@ class Combat(AttributeObject):
             if len(activeEnemies) == 1:
                 self.enemies.setIsSelected(activeEnemies[0], True)
         else:
-            sites = set()
+            sites = [] # not a set, so that rewards are added in a reproducible order
             for enemy in self.enemies:
-                sites.add(enemy.site)
+                if enemy.site not in sites:
+                    sites.append(enemy.site)
             for site in sites:
                 # Rewards will be added here
                 site.onCombatEnd(self.match, self.match.currentPlayer)
@@ -165,51 +206,58 @@ class Combat(AttributeObject):
             # Reset various stuff
             for unit in self.match.currentPlayer.units:
                 self.match.currentPlayer.units.setIsProtected(unit, False)
+            self._discardSummoned(self.enemies)
             self.enemies = []
             
     def checkEffectPlayable(self, effect=None, type=EffectType.unknown):
         self.effectsPlayed = True
+        error = self.effectError(effect, type)
+        if error is not None:
+            raise InvalidAction(error)
         
+    def effectError(self, effect=None, type=EffectType.unknown):
+        """Return the reason why the given effect (or an effect of the given type) cannot be played
+        currently, or None if it is playable. Unlike checkEffectPlayable this does not change anything."""
         state = self.match.state
         assert state.inCombat
         
         if state in (State.provokeMarauders, State.assignDamage):
-            raise InvalidAction("Cannot play any effects now.")
+            return "Cannot play any effects now."
         else:
             if not self.hasSelectedEnemy():
-                raise InvalidAction("Must select enemies first.")
+                return "Must select enemies first."
         
         if effect is not None:
             type = effect.type
             
         if type in [EffectType.healing, EffectType.movement, EffectType.influence]:
-            raise InvalidAction("Cannot play healing/movement/influence during combat.")
+            return "Cannot play healing/movement/influence during combat."
         
         if effect is not None: 
             if isinstance(effect, effects.BlockPoints):
                 if state != State.block:
-                    raise InvalidAction("Cannot play block points now")
+                    return "Cannot play block points now"
             elif isinstance(effect, effects.AttackPoints):
                 if state == State.rangeAttack:
                     if effect.range == AttackRange.normal:
-                        raise InvalidAction("Can only play ranged/siege attack now")
+                        return "Can only play ranged/siege attack now"
                     fortificationLevel = 0
                     if any(enemy.fortified for enemy in self.selectedEnemies()):
                         fortificationLevel += 1
                     # Rules: marauding enemies are not fortified when fighting in a fortified site
                     if any(isinstance(enemy.site, sites.FortifiedSite) for enemy in self.selectedEnemies()):
                         fortificationLevel += 1
-                        print([(e.site, e) for e in self.selectedEnemies()])
                     
                     if fortificationLevel == 2:
                         # Note: We cannot skip this combat state even if enemies are twice fortified,
                         # because the user might play an "Enemy loses fortifications" effect.
-                        raise InvalidAction("Enemies are twice fortified.")
+                        return "Enemies are twice fortified."
                     elif fortificationLevel == 1 and effect.range != AttackRange.siege:
-                            raise InvalidAction("Enemies are fortified. Must play siege attack.")
+                        return "Enemies are fortified. Must play siege attack."
 
                 elif state != State.attack:
-                    raise InvalidAction("Cannot play attack points now")
+                    return "Cannot play attack points now"
+        return None
     
     def isEnemyActive(self, enemy):
         """Return whether the given enemy can be targeted in the current phase
@@ -246,6 +294,7 @@ class Combat(AttributeObject):
         if not self.hasSelectedEnemy():
             raise InvalidAction("Must select an enemy first.")
         if state == State.provokeMarauders:
+            self._discardSummoned(e for e in self.enemies if not e.isSelected)
             self.enemies = [e for e in self.enemies if e.isSelected]
             self.setState(State.rangeAttack)
             return
@@ -273,10 +322,10 @@ class Combat(AttributeObject):
         
     def resolveAttack(self, ranged=False):
         armor = 0
-        resistances = set()
+        resistances = 0
         for enemy in self.selectedEnemies():
             # Rules: cold fire block is only inefficient if a single enemy has both fire and ice resistance
-            resistances.update(enemy.resistances)
+            resistances |= enemy.resistanceMask
             armor += enemy.armor
         
         efficientPoints = 0
@@ -284,7 +333,7 @@ class Combat(AttributeObject):
         attacks = self.match.effects.findEffects(effects.AttackPoints)
         for effect in attacks:
             # note: in checkEffectPlayable we made sure only ranged/siege attacks were played
-            if effect.element in resistances:
+            if effect.element.mask & resistances:
                 inefficientPoints += effect.points
             else: efficientPoints += effect.points
             self.match.effects.remove(effect)
@@ -294,28 +343,21 @@ class Combat(AttributeObject):
             self.killEnemies(self.selectedEnemies())
             
     def killEnemies(self, enemies):
+        self._discardSummoned(enemies)
         for enemy in enemies:
             self.enemies.remove(enemy)
             enemy.site.onEnemyKilled(self.match, self.match.currentPlayer, enemy.enemy)
             
     def resolveBlock(self):
-        # TODO: Handle summoners
         assert len(self.selectedEnemies()) == 1
         enemy = self.selectedEnemies()[0]
-        if enemy.attack.element == Element.physical:
-            effectiveBlocks = list(Element)
-        elif enemy.attack.element == Element.fire:
-            effectiveBlocks = [Element.ice, Element.coldFire]
-        elif enemy.attack.element == Element.ice:
-            effectiveBlocks = [Element.fire, Element.coldFire]
-        else:
-            effectiveBlocks = [Element.coldFire]
+        effectiveBlocks = enemy.attack.element.efficientBlocks
         
         efficientPoints = 0
         inefficientPoints = 0
         blocks = self.match.effects.findEffects(effects.BlockPoints)
         for effect in blocks:
-            if effect.element in effectiveBlocks:
+            if effect.element.mask & effectiveBlocks:
                 efficientPoints += effect.points
             else: inefficientPoints += effect.points
             self.match.effects.remove(effect)
@@ -356,18 +398,39 @@ class Combat(AttributeObject):
         enemy = self.selectedEnemies()[0]
         damage = enemy.damage
         assert damage > 0
-        if enemy.attack.element in unit.resistances:
+        if enemy.attack.element.mask & unit.resistanceMask:
             damage = max(0, damage - unit.armor)
         if damage > 0:
             if not enemy.paralyze:
                 self.match.currentPlayer.woundUnit(unit, wounds=1 if not enemy.poison else 2)
-            else: self.match.currentPlayer.removeUnit(unit)
+            else: self.match.currentPlayer.units.remove(unit)
             damage = max(0, damage - unit.armor)
         self.enemies.setDamage(enemy, damage)
         self.match.currentPlayer.units.setIsProtected(unit, True) # cannot assign damage to this unit again
         
         if damage == 0: # otherwise let the user assign damage to another unit or press "next"
             self.next()
+
+    def planDamage(self, cost=damageplanner.defaultCost):
+        """Return a DamagePlan that assigns the damage of all attacking enemies to units and the hero.
+        By default the plan minimizes wounds in the hand, *cost* may be used to specify another cost
+        function (see damageplanner.DamagePlanner.plan)."""
+        if self.match.state != State.assignDamage:
+            raise InvalidAction("Cannot assign damage in this state.")
+        return damageplanner.DamagePlanner.fromCombat(self).plan(cost)
+    
+    def assignDamagePlan(self, plan):
+        """Assign damage according to the given DamagePlan (see planDamage)."""
+        for step in plan.steps:
+            if not step.enemy.isAttacking or step.enemy.damage == 0:
+                continue # e.g. the user has assigned this damage in the meantime
+            if self.match.state != State.assignDamage:
+                raise InvalidAction("Damage plan does not match the combat.")
+            self.setEnemySelected(step.enemy, True)
+            for unit in step.units:
+                self.assignDamageToUnit(unit)
+            if step.toHero:
+                self.next()
             
     def chooseRewardType(self, reward):
         assert reward in self.rewards
@@ -376,13 +439,13 @@ class Combat(AttributeObject):
         
         if reward.type is CombatRewardType.crystal:
             for _ in range(reward.count):
-                color = Mana.random()
+                color = Mana.random(self.match.random.rewards)
                 self.rewards.addItems(reward, [color])
                 if color is Mana.black:
-                    self.match.currentPlayer.addFame(1)
+                    self.match.currentPlayer.fame += 1
                     continue
-                while color is Mana.gold:
-                    color = dialogs.chooseManaColor(default=Mana.gold) # query as long as necessary...
+                while color is Mana.gold: # query as long as necessary...
+                    color = self.match.decisions().chooseManaColor(default=Mana.gold)
                 self.match.currentPlayer.addCrystal(color)
             self.rewards.remove(reward)
             if len(self.rewards) == 0:
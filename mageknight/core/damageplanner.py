@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Planner for the assign damage phase of a combat. Given the unblocked enemies, the units of the player
+and the hero's armor, the planner computes how damage should be assigned, e.g. to receive as few wounds
+in the hand as possible. Use it like this:
+
+    >>> plan = match.combat.planDamage()
+    >>> plan.outcome.handWounds
+    2
+    >>> match.assignDamagePlan(plan)
+
+The search is exact: It enumerates all ways to assign damage (which enemy damages which units in which
+order, and whether the rest goes to the hero) and memoizes the results of subproblems.
+"""
+
+import math
+
+
+class DamageOutcome:
+    """The consequences of assigning damage in a certain way:
+        - handWounds: wounds the hero receives into his hand,
+        - discardWounds: additional wounds into the discard pile (poison),
+        - unitWounds: total number of wounds received by units,
+        - unitsDestroyed: number of units that are destroyed (paralyze),
+        - knockedOut: whether the hero is knocked out.
+    """
+    __slots__ = ('handWounds', 'discardWounds', 'unitWounds', 'unitsDestroyed', 'knockedOut')
+
+    def __init__(self, handWounds=0, discardWounds=0, unitWounds=0, unitsDestroyed=0, knockedOut=False):
+        self.handWounds = handWounds
+        self.discardWounds = discardWounds
+        self.unitWounds = unitWounds
+        self.unitsDestroyed = unitsDestroyed
+        self.knockedOut = knockedOut
+
+    def _tuple(self):
+        return (self.handWounds, self.discardWounds, self.unitWounds, self.unitsDestroyed,
+                int(self.knockedOut))
+
+    def __add__(self, other):
+        return DamageOutcome(self.handWounds + other.handWounds,
+                             self.discardWounds + other.discardWounds,
+                             self.unitWounds + other.unitWounds,
+                             self.unitsDestroyed + other.unitsDestroyed,
+                             self.knockedOut or other.knockedOut)
+
+    def dominates(self, other):
+        """Return whether this outcome is at least as good as *other* in every respect."""
+        return all(a <= b for a, b in zip(self._tuple(), other._tuple()))
+
+    def __eq__(self, other):
+        return isinstance(other, DamageOutcome) and self._tuple() == other._tuple()
+
+    def __hash__(self):
+        return hash(self._tuple())
+
+    def __repr__(self):
+        return ('DamageOutcome(handWounds={}, discardWounds={}, unitWounds={}, unitsDestroyed={}, '
+                'knockedOut={})'.format(*self._tuple()))
+
+
+def defaultCost(outcome):
+    """Default cost function: Minimize wounds in the hand. Ties are broken by avoiding knock out,
+    destroyed units, unit wounds and wounds in the discard pile (in this order)."""
+    return (outcome.handWounds, outcome.knockedOut, outcome.unitsDestroyed,
+            outcome.unitWounds, outcome.discardWounds)
+
+
+class DamageStep:
+    """One step of a DamagePlan: Damage of *enemy* (an EnemyInCombat) is assigned to the units in *units*
+    (in this order). If *toHero* is True, the remaining damage is finally assigned to the hero."""
+    __slots__ = ('enemy', 'units', 'toHero')
+
+    def __init__(self, enemy, units, toHero):
+        self.enemy = enemy
+        self.units = units
+        self.toHero = toHero
+
+    def __repr__(self):
+        return 'DamageStep({}, {}, toHero={})'.format(self.enemy.name, self.units, self.toHero)
+
+
+class DamagePlan:
+    """Result of the DamagePlanner: A list of DamageSteps and the resulting DamageOutcome."""
+    def __init__(self, steps, outcome):
+        self.steps = steps
+        self.outcome = outcome
+
+    def __repr__(self):
+        return 'DamagePlan({}, {})'.format(self.steps, self.outcome)
+
+
+class DamagePlanner:
+    """Compute the best assignment of the damage of *enemies* (EnemyInCombats) to *units* and the hero.
+    Only units that may still receive damage should be given. *armor* is the hero's armor,
+    *woundsAssignedToHero* the number of wounds the hero received in this combat so far and *cardLimit*
+    the number of wounds which will knock out the hero.
+
+    The planner computes the set of all Pareto-optimal outcomes, so that it works with any cost function
+    that is monotone in each component of DamageOutcome (more wounds never decrease the cost).
+    """
+    def __init__(self, enemies, units, armor, woundsAssignedToHero=0, cardLimit=5):
+        self.enemies = [e for e in enemies if e.damage > 0]
+        self.units = list(units)
+        self.armor = armor
+        self.woundsAssignedToHero = woundsAssignedToHero
+        self.cardLimit = cardLimit
+        self._memo = {}
+
+    @staticmethod
+    def fromCombat(combat):
+        """Create a planner for the current state of *combat*."""
+        player = combat.match.currentPlayer
+        enemies = [e for e in combat.enemies if e.isAttacking and e.damage > 0]
+        units = [u for u in player.units if not u.isWounded and not u.isProtected]
+        return DamagePlanner(enemies, units, player.armor, combat.woundsAssignedToHero, player.cardLimit)
+
+    def plan(self, cost=defaultCost):
+        """Return the DamagePlan which minimizes *cost*. The cost function gets a DamageOutcome and must
+        return something comparable."""
+        allUnits = (1 << len(self.units)) - 1
+        front = self._solve(0, allUnits, self.woundsAssignedToHero, False)
+        outcome, steps = min(front, key=lambda t: cost(t[0]))
+        return DamagePlan([DamageStep(self.enemies[i], [self.units[u] for u in units], toHero)
+                           for i, units, toHero in steps],
+                          outcome)
+
+    def outcomes(self):
+        """Return the list of all Pareto-optimal DamageOutcomes."""
+        allUnits = (1 << len(self.units)) - 1
+        return [outcome for outcome, _ in self._solve(0, allUnits, self.woundsAssignedToHero, False)]
+
+    def _solve(self, index, unitMask, heroWounds, knockedOut):
+        """Return the Pareto front of (outcome, steps)-tuples for assigning the damage of all enemies
+        starting with *index*. Units in *unitMask* are still available. Because units can receive damage
+        only once per combat and the knock out rule only depends on the total number of wounds, the order
+        in which enemies are processed does not matter."""
+        if index == len(self.enemies):
+            return [(DamageOutcome(knockedOut=knockedOut), ())]
+        key = (index, unitMask, min(heroWounds, self.cardLimit), knockedOut)
+        if key in self._memo:
+            return self._memo[key]
+
+        front = []
+        for outcome, units, remainingMask, damage in self._unitSequences(self.enemies[index], unitMask):
+            toHero = damage > 0
+            newHeroWounds, newKnockedOut = heroWounds, knockedOut
+            if toHero:
+                enemy = self.enemies[index]
+                wounds = math.ceil(damage / self.armor)
+                outcome = outcome + DamageOutcome(handWounds=wounds,
+                                                  discardWounds=wounds if enemy.poison else 0)
+                newHeroWounds += wounds
+                newKnockedOut = knockedOut or enemy.paralyze or newHeroWounds >= self.cardLimit
+            step = (index, units, toHero)
+            for rest, steps in self._solve(index+1, remainingMask, newHeroWounds, newKnockedOut):
+                _addToFront(front, outcome + rest, (step,) + steps)
+        self._memo[key] = front
+        return front
+
+    def _unitSequences(self, enemy, unitMask):
+        """Yield all ways to assign the damage of *enemy* to a sequence of units from *unitMask*. Yield
+        tuples (outcome, unit indices, remaining unit mask, remaining damage). This mirrors
+        Combat.assignDamageToUnit."""
+        stack = [(DamageOutcome(), (), unitMask, enemy.damage)]
+        while len(stack) > 0:
+            outcome, units, mask, damage = stack.pop()
+            yield outcome, units, mask, damage
+            if damage == 0:
+                continue
+            for i, unit in enumerate(self.units):
+                if not mask & (1 << i):
+                    continue
+                newDamage = damage
+                if enemy.attack.element.mask & unit.resistanceMask:
+                    newDamage = max(0, newDamage - unit.armor)
+                delta = DamageOutcome()
+                if newDamage > 0:
+                    if not enemy.paralyze:
+                        delta = DamageOutcome(unitWounds=1 if not enemy.poison else 2)
+                    else: delta = DamageOutcome(unitsDestroyed=1)
+                    newDamage = max(0, newDamage - unit.armor)
+                stack.append((outcome + delta, units + (i,), mask & ~(1 << i), newDamage))
+
+
+def _addToFront(front, outcome, steps):
+    """Add (outcome, steps) to the Pareto front *front* unless it is dominated by an existing outcome.
+    Remove existing outcomes which are dominated by the new one."""
+    for other, _ in front:
+        if other.dominates(outcome):
+            return
+    front[:] = [(o, s) for o, s in front if not outcome.dominates(o)]
+    front.append((outcome, steps))
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Decision providers answer the questions the engine asks a player while an action is executed (which
+effect of a card, which mana color, which card, yes or no). Each player has its own provider, see
+Match.setDecisionProvider and Match.decisions. The GUI uses dialogs (gui.dialogs.DialogDecisionProvider),
+simulations use one of the providers in this module.
+
+Subclasses must implement choose and ask. Providers may raise CancelAction to abort the current action.
+"""
+
+import random
+
+from mageknight.data import * # @UnusedWildImport
+from mageknight.core import effects
+
+
+class DecisionError(RuntimeError):
+    """Raised when a decision provider cannot answer a question (e.g. a scripted provider has run out of
+    answers)."""
+
+
+class DecisionProvider:
+    """Abstract base class for decision providers. *match* and *player* are set when the provider is
+    assigned to a player (Match.setDecisionProvider)."""
+    match = None
+    player = None
+    
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        """Return one of *options*. *labelFunc*, *title* and *text* are used to display the question,
+        *default* is the option that is used when the player does not make a choice."""
+        raise NotImplementedError()
+    
+    def chooseIndex(self, options, **kwargs):
+        """Like choose, but return the index of the chosen option."""
+        labelFunc = kwargs.pop('labelFunc', str)
+        return self.choose(list(range(len(options))), labelFunc=lambda i: labelFunc(options[i]), **kwargs)
+    
+    def ask(self, question, title=''):
+        """Ask a yes/no question and return a bool."""
+        raise NotImplementedError()
+    
+    def chooseManaColor(self, match=None, available=False, basic=True, fromList=None, default=None):
+        """Choose a mana color. If *fromList* is given, choose from this list. Otherwise choose from the
+        colors the current player can pay if *available* is True, or from all colors. Unless *basic* is
+        False, only basic colors are offered in both cases."""
+        if fromList is not None:
+            colors = fromList
+        else:
+            if available:
+                assert match is not None
+                colors = [color for color in Mana if match.hasMana(color) and (color.isBasic or not basic)]
+                if len(colors) == 0:
+                    raise InvalidAction("You don't have mana")
+            else:
+                colors = Mana.basicColors() if basic else list(Mana)
+            
+        # remove duplicates
+        colorOptions = []
+        for color in colors:
+            if color not in colorOptions:
+                colorOptions.append(color)
+        return self.choose(colorOptions, default=default)
+    
+    def chooseCard(self, player, type=None, allowWounds=False):
+        """Choose a card from the hand of *player*. Only cards of the given *type* are allowed and wounds
+        only if *allowWounds* is True."""
+        cards = [card for card in player.handCards
+                 if (type is None or isinstance(card, type)) and (allowWounds or not card.isWound)]
+        if len(cards) > 0:
+            return self.choose(cards)
+        else: raise InvalidAction("You don't have a suitable card")
+        
+        
+class ScriptedDecisionProvider(DecisionProvider):
+    """Answer questions with the given *answers* in the given order. For choose, an answer must be one of
+    the options (or a function that gets the options and returns one of them), for ask it must be a
+    bool. Raise a DecisionError if there are no more answers or an answer is not a valid option."""
+    def __init__(self, answers):
+        self.answers = list(answers)
+        
+    def _next(self):
+        if len(self.answers) == 0:
+            raise DecisionError("No more scripted answers.")
+        return self.answers.pop(0)
+    
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        answer = self._next()
+        if callable(answer):
+            answer = answer(options)
+        if answer not in options:
+            raise DecisionError("Scripted answer {} is not a valid option.".format(answer))
+        return answer
+    
+    def ask(self, question, title=''):
+        answer = self._next()
+        if not isinstance(answer, bool):
+            raise DecisionError("Scripted answer {} is not a bool.".format(answer))
+        return answer
+    
+    
+class RecordingDecisionProvider(DecisionProvider):
+    """Wrap *provider* and append each answer to the list *answers*: the index of the chosen option for
+    choose and chooseIndex, a bool for ask and None if the action was canceled. Used by core.actionlog.
+    """
+    def __init__(self, provider, answers):
+        self.provider = provider
+        self.answers = answers
+        self.match = provider.match
+        self.player = provider.player
+        
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        options = list(options)
+        try:
+            answer = self.provider.choose(options, labelFunc=labelFunc, title=title, text=text,
+                                          default=default)
+        except CancelAction:
+            self.answers.append(None)
+            raise
+        for i, option in enumerate(options):
+            if option is answer:
+                break
+        else: i = options.index(answer)
+        self.answers.append(i)
+        return answer
+    
+    def chooseIndex(self, options, **kwargs):
+        try:
+            index = self.provider.chooseIndex(options, **kwargs)
+        except CancelAction:
+            self.answers.append(None)
+            raise
+        self.answers.append(index)
+        return index
+    
+    def ask(self, question, title=''):
+        try:
+            answer = self.provider.ask(question, title)
+        except CancelAction:
+            self.answers.append(None)
+            raise
+        self.answers.append(answer)
+        return answer
+    
+    
+class ReplayDecisionProvider(DecisionProvider):
+    """Answer questions with answers recorded by RecordingDecisionProvider. Set *answers* to the list of
+    answers of an action before it is replayed. Raise a DecisionError if the questions do not match the
+    recorded answers."""
+    def __init__(self):
+        self.answers = []
+        
+    def _next(self):
+        if len(self.answers) == 0:
+            raise DecisionError("No more recorded answers.")
+        answer = self.answers.pop(0)
+        if answer is None:
+            raise CancelAction()
+        return answer
+        
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        options = list(options)
+        index = self._next()
+        if isinstance(index, bool) or not 0 <= index < len(options):
+            raise DecisionError("Recorded answer {} does not match the options.".format(index))
+        return options[index]
+    
+    def chooseIndex(self, options, **kwargs):
+        index = self._next()
+        if isinstance(index, bool) or not 0 <= index < len(options):
+            raise DecisionError("Recorded answer {} does not match the options.".format(index))
+        return index
+    
+    def ask(self, question, title=''):
+        answer = self._next()
+        if not isinstance(answer, bool):
+            raise DecisionError("Recorded answer {} is not a bool.".format(answer))
+        return answer
+    
+    
+class RandomDecisionProvider(DecisionProvider):
+    """Make uniformly random decisions using *rng* (defaults to the random module)."""
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random
+        
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        if len(options) == 0:
+            raise CancelAction()
+        return self.rng.choice(list(options))
+    
+    def ask(self, question, title=''):
+        return self.rng.random() < 0.5
+    
+    
+class BotDecisionProvider(DecisionProvider):
+    """A simple greedy bot: From effects it chooses the one with the most points that is useful in the
+    current state of the match (e.g. block points in the block phase). Mana colors are chosen to power
+    the strong effects of hand cards. Otherwise the default (or the first option) is chosen. Yes/no
+    questions are answered with 'no'.
+    """
+    def choose(self, options, labelFunc=str, title=None, text=None, default=None):
+        if len(options) == 0:
+            raise CancelAction()
+        # max returns the first of several best options
+        return max(options, key=lambda option: self._score(option, default))
+    
+    def ask(self, question, title=''):
+        return False
+    
+    def _score(self, option, default):
+        if isinstance(option, effects.PointsEffect):
+            return option.points * self._effectWeight(option)
+        if isinstance(option, Mana) and self.player is not None:
+            return sum(1 for card in self.player.handCards if getattr(card, 'color', None) is option)
+        return 1 if option == default else 0
+        
+    def _effectWeight(self, effect):
+        """Return a factor indicating how useful *effect* is in the current state."""
+        if self.match is None:
+            return 1
+        state = self.match.state
+        if state is State.movement and isinstance(effect, effects.MovePoints):
+            return 2
+        if state is State.interaction and isinstance(effect, effects.InfluencePoints):
+            return 2
+        if state is State.block and isinstance(effect, effects.BlockPoints):
+            return 2
+        if isinstance(effect, effects.AttackPoints):
+            if state is State.attack:
+                return 2
+            if state is State.rangeAttack and effect.range is not AttackRange.normal:
+                return 2
+        if isinstance(effect, effects.HealPoints) and self.player is not None \
+                and self.player.handCards.countWounds() > 0:
+            return 2
+        return 1
+    
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Compact card piles. A Deck stores the ids of its cards (see assets.Card.id) in an array('H'). Because cards
+are stateless, items are returned as the shared instance of their class (see assets.flyweight), so that card
+objects are never created for drawing, shuffling or discarding.
+
+Like attributes.UndoList, all modifications are put onto the undo stack. Undo commands only record index
+ranges and card ids: E.g. drawing cards moves a range from the end of the draw pile to the end of the hand
+and is undone by moving the same number of cards back.
+"""
+
+import array
+
+from mageknight.stack import Call
+from . import assets
+
+
+class Deck:
+    """An undoable pile of cards. *signal* is emitted whenever the pile changes. If *owner* is given,
+    changes update the Zobrist hash of *owner* (see core.zobrist); *name* is the attribute of *owner* which
+    stores this pile. The last card is the top card of the pile (e.g. the next card to draw)."""
+    def __init__(self, stack, signal=None, cards=(), owner=None, name=None):
+        self._stack = stack
+        self._signal = signal
+        self._owner = owner
+        self._name = name
+        self._ids = array.array('H', (_id(card) for card in cards))
+        
+    @property
+    def ids(self):
+        """The array of card ids. Do not modify it."""
+        return self._ids
+    
+    def __len__(self):
+        return len(self._ids)
+    
+    def __iter__(self):
+        return map(assets.flyweight, self._ids)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [assets.flyweight(id) for id in self._ids[index]]
+        return assets.flyweight(self._ids[index])
+    
+    def __contains__(self, card):
+        return _id(card) in self._ids
+    
+    def __repr__(self):
+        return 'Deck({})'.format(list(self))
+    
+    def index(self, card):
+        """Return the position of the first card of the same class as *card*."""
+        return self._ids.index(_id(card))
+    
+    def countWounds(self):
+        """Return the number of wounds in this pile."""
+        return self._ids.count(assets.Wound.id)
+    
+    def itemFeature(self, item):
+        """Return the feature of *item* for the Zobrist hash (see attributes.UndoList.itemFeature)."""
+        return (item,)
+    
+    def append(self, card):
+        self.extend((card,))
+        
+    def extend(self, cards):
+        ids = array.array('H', (_id(card) for card in cards))
+        if len(ids) > 0:
+            end = len(self._ids)
+            self._stack.push(Call(self._replace, end, end, ids),
+                             Call(self._replace, end, end + len(ids), array.array('H')))
+        
+    def remove(self, card):
+        """Remove the first card of the same class as *card*."""
+        index = self.index(card)
+        self._stack.push(Call(self._replace, index, index + 1, array.array('H')),
+                         Call(self._replace, index, index, self._ids[index:index+1]))
+        
+    def clear(self):
+        if len(self._ids) > 0:
+            self._stack.push(Call(self._replace, 0, len(self._ids), array.array('H')),
+                             Call(self._replace, 0, 0, array.array('H', self._ids)))
+            
+    def moveTo(self, other, count=None):
+        """Move the top *count* cards (default: all) of this pile onto *other* (another Deck), keeping
+        their order."""
+        if count is None:
+            count = len(self._ids)
+        if count > 0:
+            self._stack.push(Call(self._move, other, count),
+                             Call(other._move, self, count))
+    
+    def shuffle(self, rng):
+        """Shuffle the pile using the random number generator *rng*."""
+        ids = array.array('H', self._ids)
+        rng.shuffle(ids)
+        self._stack.push(Call(self._permute, ids),
+                         Call(self._permute, array.array('H', self._ids)))
+        
+    def _replace(self, start, end, ids):
+        self._updateHash(self._ids[start:end], ids)
+        self._ids[start:end] = ids
+        self._emitSignal()
+        
+    def _move(self, other, count):
+        ids = self._ids[-count:]
+        del self._ids[-count:]
+        other._ids.extend(ids)
+        self._updateHash(ids, ())
+        other._updateHash((), ids)
+        self._emitSignal()
+        other._emitSignal()
+        
+    def _permute(self, ids):
+        # The multiset of cards does not change, neither does the hash
+        self._ids[:] = ids
+        self._emitSignal()
+            
+    def _updateHash(self, removed, added):
+        zobrist = self._owner.zobrist if self._owner is not None else None
+        if zobrist is not None:
+            for id in removed:
+                zobrist.remove(self._owner, self._name, assets.flyweight(id))
+            for id in added:
+                zobrist.add(self._owner, self._name, assets.flyweight(id))
+            
+    def _emitSignal(self):
+        if self._signal is not None:
+            self._signal.emit()
+    
+
+def _id(card):
+    if not isinstance(card, assets.Card):
+        raise TypeError("Decks may only contain cards, not {}.".format(card))
+    return card.id
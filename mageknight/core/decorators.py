@@ -20,7 +20,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import types
+import functools, types
 
 from mageknight.data import State, CancelAction, InvalidAction
 
@@ -55,23 +55,41 @@ def action(f, *states):
           the macro will be aborted. In particular, all steps taken so far will be undone.
         - If a list of states is specified, it will check whether the current state is contained in the list
           and abort if not.
+        - The action is recorded in the match's action log (see core.actionlog). Undoing the action
+          removes it from the log again. Actions which reveal new information cannot be undone.
+    The wrapped action returns True if it was performed and False if it was aborted.
     """
-    def wrapper(self, *args, **kwargs):
+    @functools.wraps(f)
+    def wrapper(self, player, *args, **kwargs):
         nonlocal states
         if len(states) == 1 and not isinstance(states[0], State): # a single list of states
             states = states[0]
         if len(states) > 0 and self.state not in states:
             print("Cannot perform this action in state '{}'.".format(self.state.name))
-            return
-        self.stack.beginMacro()
+            return False
+        entry = self.actionLog.begin(f.__name__, player, args, kwargs)
+        result = False
+        macro = self.stack.beginMacro()
         try:
-            f(self, *args, **kwargs)
+            f(self, player, *args, **kwargs)
+            # The log entry of an undoable action is added within the macro, so that undo/redo keep the log
+            # in sync with the match. An action that revealed new information (and ended the macro) must
+            # not be undone partially.
+            undoable = self.stack.isBuilding(macro)
+            self.actionLog.end(entry, True, undoable=undoable and not macro.isEmpty())
+            entry = None
             self.stack.endMacro(abortIfEmpty=True) # the macro is often empty, when new info was revealed
+            if not undoable:
+                self.revealNewInformation()
+            result = True
         except CancelAction: # action was aborted e.g. by canceling a dialog
             self.stack.abortMacro()
         except InvalidAction as e:
             print(e)
             self.stack.abortMacro()
+        finally:
+            self.actionLog.end(entry, result)
+        return result
             
     return wrapper
     
\ No newline at end of file
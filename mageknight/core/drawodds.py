@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Exact probabilities for the next draw of a player. The composition of the draw pile is known (only its
+order is hidden), so the drawn cards follow a multivariate hypergeometric distribution. For example:
+
+    >>> odds = drawodds.nextDraw(match, player)
+    >>> odds.count
+    5
+    >>> odds.expectedWounds()
+    0.7142857142857143
+    >>> odds.atLeast(handpotential.MOVE, 4)
+    0.4175824175824176
+
+Point distributions use the points a card produces without mana (see handpotential.cardPoints): Mana of
+the next turn is not known in advance. Cards are grouped by their points, and the number of ways to draw
+each sum is counted with a dynamic program over these groups, so the cost depends on the number of
+distinct point values (usually less than five), not on the number of possible hands. Distributions are
+memoized by the composition of the pile (per category) and the number of drawn cards.
+"""
+
+import collections, math
+
+from . import assets, handpotential
+
+# Memoized results of _distribution. Cleared when it becomes too large.
+_cache = {}
+_MAX_CACHE = 100000
+
+
+def hypergeometric(population, successes, draws):
+    """Return the distribution of the number of successes when drawing *draws* items without replacement
+    from *population* items of which *successes* are successes."""
+    return _distribution(((1, successes), (0, population - successes)), draws)
+
+
+class DrawOdds:
+    """Probabilities for drawing *count* cards from the pile *cards* (any iterable of cards, e.g. a Deck).
+    *sideways* is the list of effects that can be achieved by playing a card sideways (see
+    Match.sidewaysEffects). Distributions are dicts mapping values to probabilities, sorted by value."""
+    def __init__(self, cards, count, sideways=()):
+        self._counts = collections.Counter(card.id for card in cards)
+        self.size = sum(self._counts.values())
+        self.count = max(0, min(count, self.size))
+        self.sideways = list(sideways)
+        
+    def wounds(self):
+        """Return the distribution of the number of wounds among the drawn cards."""
+        return self.copies(assets.Wound())
+    
+    def expectedWounds(self):
+        return self.count * self._counts[assets.Wound.id] / self.size if self.size > 0 else 0
+    
+    def copies(self, card):
+        """Return the distribution of the number of cards of the same class as *card* among the drawn
+        cards."""
+        return hypergeometric(self.size, self._counts[card.id], self.count)
+    
+    def distribution(self, category):
+        """Return the distribution of the sum of points of *category* (see handpotential) of the drawn
+        cards."""
+        groups = collections.Counter()
+        for id, n in self._counts.items():
+            groups[handpotential.cardPoints(assets.flyweight(id), category, self.sideways)] += n
+        return _distribution(tuple(sorted(groups.items())), self.count)
+    
+    def atLeast(self, category, points):
+        """Return the probability to draw at least *points* points of *category*."""
+        return sum(p for value, p in self.distribution(category).items() if value >= points)
+    
+    def expected(self, category):
+        """Return the expected number of points of *category* of the drawn cards."""
+        return sum(value * p for value, p in self.distribution(category).items())
+
+
+def nextDraw(match, player=None, count=None):
+    """Return the DrawOdds for the next draw of *player* (default: the current player). By default
+    *count* is the number of cards which refill the current hand to the card limit (see
+    Player.drawCards)."""
+    if player is None:
+        player = match.currentPlayer
+    if count is None:
+        count = player.modifiedCardLimit() - len(player.handCards)
+    return DrawOdds(player.drawPile, count, match.sidewaysEffects())
+
+
+def _distribution(groups, count):
+    """Return the distribution of the sum of values when drawing *count* items without replacement from
+    *groups*, a tuple of (value, number of items)-tuples."""
+    key = (groups, count)
+    if key in _cache:
+        return _cache[key]
+    size = sum(n for _, n in groups)
+    count = max(0, min(count, size))
+    # ways[j, s]: number of ways to draw j items with sum s from the groups processed so far
+    ways = {(0, 0): 1}
+    for value, n in groups:
+        if n == 0:
+            continue
+        newWays = collections.defaultdict(int)
+        for (j, s), w in ways.items():
+            for c in range(min(n, count - j) + 1):
+                newWays[j + c, s + c*value] += w * math.comb(n, c)
+        ways = newWays
+    total = math.comb(size, count)
+    result = {s: w / total for (j, s), w in sorted(ways.items(), key=lambda item: item[0][1]) if j == count}
+    if len(_cache) >= _MAX_CACHE:
+        _cache.clear()
+    _cache[key] = result
+    return result
@@ -19,6 +19,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
+import copy
+
 from . import baseeffectlist
 
 from .effects import * # @UnusedWildImport
@@ -31,5 +33,7 @@ class EffectList(baseeffectlist.EffectList):
         if isinstance(effect, PointsEffect):
             if not isinstance(effect, HealPoints) and self.find(Concentration) is not None:
                 # if several Concentration effects are active, only the last one counts
+                # (copy the effect because effects are shared, e.g. in ActionCard.basicOptions)
+                effect = copy.copy(effect)
                 effect.points += self.find(Concentration, reverse=True).extra
         super().add(effect)
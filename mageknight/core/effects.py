@@ -25,6 +25,7 @@ import functools
 from PyQt5 import QtCore
 translate = QtCore.QCoreApplication.translate
 
+from mageknight.utils import translated
 from mageknight.data import * # @UnusedWildImport
 
 
@@ -104,7 +105,7 @@ class PointsEffect(Effect):
     
     
 class MovePoints(PointsEffect):
-    title = translate("Effects", "Move")
+    title = translated("Effects", "Move")
     type = EffectType.movement
     
     def __init__(self, points):
@@ -115,7 +116,7 @@ class MovePoints(PointsEffect):
         
         
 class InfluencePoints(PointsEffect):
-    title = translate("Effects", "Influence")
+    title = translated("Effects", "Influence")
     type = EffectType.influence
     # note: influence points can be negative due to reputation
 
@@ -166,7 +167,7 @@ class AttackPoints(PointsEffect):
     
 
 class HealPoints(PointsEffect):
-    title = translate("Effects", "Heal")
+    title = translated("Effects", "Heal")
 
     def __init__(self, points):
         super().__init__(points)
@@ -190,8 +191,11 @@ class TerrainCostsOverwrite(Effect):
         raise NotImplementedError() # TODO
 
     def _change(self, other):
-        from copy import copy
-        result = copy(self)
+        # Do not modify self: it may still be in the effect list (or on the undo stack)
+        result = TerrainCostsOverwrite()
+        result.newBaseCosts.update(self.newBaseCosts)
+        for terrain, tpl in self.costReductions.items():
+            result.costReductions[terrain].extend(tpl)
         for terrain, baseCosts in other.newBaseCosts.items():
             result._overwriteBaseCosts(terrain, baseCosts)
         for terrain, tpl in other.costReductions.items():
@@ -221,7 +225,7 @@ class TerrainCostsOverwrite(Effect):
         baseCosts = self.newBaseCosts.get(terrain, baseCosts)
         # sort all reductions according to their z-coordinate. Apply
         # them in this order to achieve maximum cost reduction
-        unsorted = self.costReductions[terrain]
+        unsorted = self.costReductions.get(terrain, [])
         sortedReductions = sorted(unsorted,
                                   key=lambda tpl: tpl[1],
                                   reverse=True)
@@ -274,7 +278,7 @@ class ManaTokens(Effect):
 
 
 class LosesResistance(Effect):
-    title = translate("Effects", "Loses resistances")
+    title = translated("Effects", "Loses resistances")
 
 
 class ArmorReduction(Effect):
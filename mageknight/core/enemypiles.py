@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import array
+
+from mageknight import stack
+from mageknight.data import * # @UnusedWildImport
+from mageknight.data import enemies
+
+
+class EnemyPiles:
+    """The draw and discard piles of enemy tokens, one pair for each EnemyCategory. Piles store indexes
+    into the enemy table (see data.enemies.TABLE). A token is drawn by choosing a random position in the
+    draw pile, moving the last token to this position and popping it. Because the position is random,
+    this is equivalent to drawing from a shuffled pile, but needs O(1) time. When a draw pile runs out,
+    the discard pile of the same category is reshuffled into it.
+    
+    All changes are pushed onto the undo stack of the match.
+    """
+    def __init__(self, match):
+        self.match = match
+        self._drawPiles = {category: array.array('H', (e.index for e in enemies.TABLE.tokens(category)))
+                           for category in EnemyCategory}
+        self._discardPiles = {category: array.array('H') for category in EnemyCategory}
+        
+    def drawPileSize(self, category):
+        """Return the number of tokens in the draw pile of *category*."""
+        return len(self._drawPiles[category])
+    
+    def discardPileSize(self, category):
+        """Return the number of tokens in the discard pile of *category*."""
+        return len(self._discardPiles[category])
+    
+    def composition(self, category):
+        """Return the tokens in the draw pile and the tokens in the discard pile of *category* as two lists
+        (in no particular order)."""
+        return ([enemies.TABLE[index] for index in self._drawPiles[category]],
+                [enemies.TABLE[index] for index in self._discardPiles[category]])
+        
+    def draw(self, category):
+        """Draw a random enemy token of *category*. Raise an InvalidAction error if all tokens of this
+        category are in use (so that the action which needs the token fails)."""
+        pile = self._drawPiles[category]
+        if len(pile) == 0:
+            if len(self._discardPiles[category]) == 0:
+                raise InvalidAction("All enemy tokens of category {} are in use.".format(category.name))
+            self.match.stack.push(stack.Call(self._reshuffle, category),
+                                  stack.Call(self._unreshuffle, category))
+        position = self.match.random.enemies.randrange(len(pile))
+        index = pile[position]
+        self.match.stack.push(stack.Call(self._remove, category, position),
+                              stack.Call(self._insert, category, position, index))
+        self.match.revealNewInformation() # the token is revealed and the random stream has advanced
+        return enemies.TABLE[index]
+    
+    def discard(self, enemy):
+        """Put *enemy* onto the discard pile of its category."""
+        self.match.stack.push(stack.Call(self._discard, enemy.category, enemy.index),
+                              stack.Call(self._undiscard, enemy.category))
+    
+    def _remove(self, category, position):
+        pile = self._drawPiles[category]
+        pile[position] = pile[-1]
+        pile.pop()
+    
+    def _insert(self, category, position, index):
+        pile = self._drawPiles[category]
+        if position == len(pile):
+            pile.append(index)
+        else:
+            pile.append(pile[position])
+            pile[position] = index
+            
+    def _reshuffle(self, category):
+        # only called when the draw pile is empty
+        self._drawPiles[category].extend(self._discardPiles[category])
+        del self._discardPiles[category][:]
+        
+    def _unreshuffle(self, category):
+        self._discardPiles[category].extend(self._drawPiles[category])
+        del self._drawPiles[category][:]
+        
+    def _discard(self, category, index):
+        self._discardPiles[category].append(index)
+        
+    def _undiscard(self, category):
+        self._discardPiles[category].pop()
+        
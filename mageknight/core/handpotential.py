@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Static evaluation of what a hand can produce: the maximum move, influence, attack (per element and range)
+and block points (per element), given the player's hand cards and the mana available to pay for strong
+effects (see core.manaplanner). For example:
+
+    >>> potential = handpotential.evaluate(match, player)
+    >>> potential.move
+    6
+    >>> potential.attack[Element.physical, AttackRange.normal]
+    4
+    >>> [(card.name, mode) for card, mode, effect in potential.plays(handpotential.MOVE)]
+    [('march', 1), ('rage', 2)]
+
+Each category is maximized on its own, i.e. the values are alternatives and cannot be reached at the same
+time. Like core.simulation, the evaluator only knows the effects listed in the options of action cards
+(see assets.ActionCard). Other cards can only be played sideways. Each card is played basic, strong or
+sideways: Without mana the better of basic and sideways is used. Strong effects are chosen by a search
+over subsets of cards (best gains first, pruned by an upper bound), where each subset must be payable
+according to the ManaPlanner.
+
+Results are memoized by the multiset of hand cards and the available mana, so that evaluating the same
+situation again (e.g. after an undo or in another branch of a search) is a dictionary lookup.
+"""
+
+from mageknight.data import * # @UnusedWildImport
+from . import effects, assets
+
+# Categories
+MOVE = ('move', )
+INFLUENCE = ('influence', )
+
+def attackCategory(element=Element.physical, range=AttackRange.normal):
+    """Return the category of attack points of the given element and range."""
+    return ('attack', element, range)
+
+def blockCategory(element=Element.physical):
+    """Return the category of block points of the given element."""
+    return ('block', element)
+
+# How a card is played (the first two are the effectIndex of Match.playCard)
+BASIC, STRONG, SIDEWAYS = range(3)
+
+# Memoized results of evaluateHand. Cleared when it becomes too large.
+_cache = {}
+_MAX_CACHE = 100000
+
+
+class HandPotential:
+    """The result of evaluate: *move* and *influence* are the maximum move and influence points, *attack*
+    maps (element, range)-tuples and *block* maps elements to the maximum points of this kind (missing
+    entries are 0). Use plays and manaPlan to get the card assignment that reaches a value."""
+    def __init__(self, results):
+        self._results = results
+        self.move = self.points(MOVE)
+        self.influence = self.points(INFLUENCE)
+        self.attack = {category[1:]: points for category, (points, _, _) in results.items()
+                       if category[0] == 'attack' and points > 0}
+        self.block = {category[1]: points for category, (points, _, _) in results.items()
+                      if category[0] == 'block' and points > 0}
+        
+    def points(self, category):
+        """Return the maximum number of points of the given category."""
+        return self._results[category][0] if category in self._results else 0
+    
+    def plays(self, category):
+        """Return the card assignment which reaches the maximum of *category*: a list of
+        (card, mode, effect)-tuples, where mode is one of BASIC, STRONG and SIDEWAYS and effect is the
+        option to choose. Cards which do not contribute are omitted."""
+        return list(self._results[category][1]) if category in self._results else []
+    
+    def manaPlan(self, category):
+        """Return the ManaPlan paying the strong effects in plays(category) or None."""
+        return self._results[category][2] if category in self._results else None
+    
+    def __repr__(self):
+        return 'HandPotential(move={}, influence={}, attack={}, block={})'.format(
+                    self.move, self.influence,
+                    {(e.name, r.name): p for (e, r), p in self.attack.items()},
+                    {e.name: p for e, p in self.block.items()})
+
+
+def evaluate(match, player=None):
+    """Return the HandPotential of the hand of *player* (default: the current player) with the mana
+    currently available to him."""
+    if player is None:
+        player = match.currentPlayer
+    return evaluateHand(player.handCards, match.manaPlanner(player), match.sidewaysEffects())
+
+
+def evaluateHand(cards, planner, sideways=()):
+    """Return the HandPotential of *cards*. *planner* is the ManaPlanner used to pay strong effects and
+    *sideways* the list of effects which can be achieved by playing a card sideways."""
+    cards = [card for card in cards if not card.isWound]
+    sideways = [effect for effect in sideways if _category(effect) is not None]
+    key = (tuple(sorted(card.id for card in cards)), planner.key,
+           tuple((_category(effect), effect.points) for effect in sideways))
+    if key in _cache:
+        return _cache[key]
+    
+    categories = {} # used as ordered set
+    for effect in sideways:
+        categories[_category(effect)] = None
+    for card in cards:
+        for options in _options(card):
+            for effect in options:
+                categories[_category(effect)] = None
+    categories.pop(None, None)
+    potential = HandPotential({category: _maximize(cards, planner, sideways, category)
+                               for category in categories})
+    if len(_cache) >= _MAX_CACHE:
+        _cache.clear()
+    _cache[key] = potential
+    return potential
+
+
+def cardPoints(card, category, sideways=()):
+    """Return the points of *category* which *card* produces without mana, i.e. played basic or sideways
+    (using the effects in *sideways*)."""
+    if card.isWound:
+        return 0
+    return max(_best(_options(card)[0], category)[0], _best(sideways, category)[0])
+
+
+def _category(effect):
+    """Return the category which *effect* contributes to or None."""
+    if isinstance(effect, effects.MovePoints):
+        return MOVE
+    elif isinstance(effect, effects.InfluencePoints):
+        return INFLUENCE
+    elif isinstance(effect, effects.AttackPoints):
+        return attackCategory(effect.element, effect.range)
+    elif isinstance(effect, effects.BlockPoints):
+        return blockCategory(effect.element)
+    return None
+
+
+def _options(card):
+    """Return the basic and strong options of *card* (empty unless it is an action card)."""
+    if isinstance(card, assets.ActionCard):
+        return card.basicOptions, card.strongOptions
+    return (), ()
+
+
+def _best(options, category):
+    """Return (points, effect) for the best effect of *options* in *category* (points are 0 if none)."""
+    best = (0, None)
+    for effect in options:
+        if _category(effect) == category and effect.points > best[0]:
+            best = (effect.points, effect)
+    return best
+
+
+def _maximize(cards, planner, sideways, category):
+    """Return (points, plays, manaPlan) for the maximum number of points of *category* (see
+    HandPotential)."""
+    sidewaysPoints, sidewaysEffect = _best(sideways, category)
+    # Without mana every card is played basic or sideways, whatever is better
+    plays = []
+    candidates = [] # (gain, index in plays, strong effect) of cards whose strong effect is better
+    total = 0
+    for card in cards:
+        basic, strong = _options(card)
+        points, effect = _best(basic, category)
+        play = (card, BASIC, effect)
+        if sidewaysPoints > points:
+            points, play = sidewaysPoints, (card, SIDEWAYS, sidewaysEffect)
+        strongPoints, strongEffect = _best(strong, category)
+        if strongPoints > points:
+            candidates.append((strongPoints - points, len(plays), strongEffect))
+        plays.append(play)
+        total += points
+    
+    # Choose the subset of strong effects with the largest gain that can be paid
+    candidates.sort(key=lambda c: -c[0])
+    best = [0, ()]
+    def search(index, gain, chosen):
+        if gain > best[0]:
+            best[:] = [gain, chosen]
+        if index == len(candidates) or gain + sum(c[0] for c in candidates[index:]) <= best[0]:
+            return
+        candidate = candidates[index]
+        colors = tuple(plays[c[1]][0].color for c in chosen + (candidate, ))
+        if planner.canPay(colors):
+            search(index+1, gain + candidate[0], chosen + (candidate, ))
+        search(index+1, gain, chosen)
+    search(0, 0, ())
+    
+    manaPlan = None
+    gain, chosen = best
+    if len(chosen) > 0:
+        for _, index, effect in chosen:
+            plays[index] = (plays[index][0], STRONG, effect)
+        manaPlan = planner.plans(tuple(plays[index][0].color for _, index, _ in chosen))[0]
+    return (total + gain, tuple(play for play in plays if play[2] is not None), manaPlan)
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Planner for paying mana costs. A cost is a sequence of mana colors, one per mana (e.g. a black and a red
+mana for the strong effect of a red spell). Each mana can be paid with a mana token, a die from the source
+or a crystal. The planner computes all feasible ways to pay a cost, ranked by a preference function:
+
+    >>> planner = match.manaPlanner()
+    >>> planner.canPay((Mana.black, Mana.red))
+    True
+    >>> planner.plans((Mana.red, ))
+    [ManaPlan(red token), ManaPlan(gold die), ManaPlan(red crystal)]
+
+The planner applies the rules for mana: During day gold mana may replace any basic color and black mana
+cannot be used. During night gold mana cannot be used. The number of dice is limited by source.limit
+(usually one die per turn) and crystals only exist in basic colors. The planner works on a copy of the
+available mana, so it must be recreated when mana is gained or spent.
+"""
+
+from mageknight.data import Mana
+from . import effects
+
+TOKEN, DIE, CRYSTAL = 'token', 'die', 'crystal'
+
+
+class ManaPlan:
+    """A way to pay a mana cost: *payments* is a tuple of (kind, color)-tuples where kind is one of TOKEN,
+    DIE and CRYSTAL. Payments are sorted, so that equal plans compare equal."""
+    __slots__ = ('payments', )
+    
+    def __init__(self, payments):
+        self.payments = payments
+        
+    def count(self, kind):
+        """Return the number of mana paid with the given kind (TOKEN, DIE or CRYSTAL)."""
+        return sum(1 for k, _ in self.payments if k == kind)
+    
+    def __eq__(self, other):
+        return isinstance(other, ManaPlan) and self.payments == other.payments
+    
+    def __hash__(self):
+        return hash(self.payments)
+    
+    def __str__(self):
+        return ', '.join('{} {}'.format(color.name, kind) for kind, color in self.payments)
+    
+    def __repr__(self):
+        return 'ManaPlan({})'.format(self)
+    
+
+def defaultPreference(plan):
+    """Default preference: Tokens are lost at the end of the turn, so use them first. Prefer dice to
+    crystals, which can be kept for later turns. Ties are broken by avoiding gold mana, which can replace
+    any basic color."""
+    return (plan.count(CRYSTAL), plan.count(DIE), sum(1 for _, color in plan.payments if color is Mana.gold))
+
+
+class ManaPlanner:
+    """Compute the ways to pay mana costs. *tokens*, *dice* and *crystals* map colors to the number of
+    available tokens, dice in the source and crystals, *dieLimit* is the number of dice that may still be
+    taken from the source and *nightRules* whether night rules apply. Results are memoized per cost, so
+    that legal-move generation can query the same planner many times.
+    """
+    def __init__(self, tokens, dice, dieLimit, crystals, nightRules):
+        self._available = {}
+        for kind, counts in ((TOKEN, tokens), (DIE, dice if dieLimit > 0 else {}), (CRYSTAL, crystals)):
+            for color, count in counts.items():
+                if count > 0:
+                    self._available[kind, color] = count
+        self.dieLimit = dieLimit
+        self.nightRules = nightRules
+        # Planners with equal keys give the same results (used e.g. by core.handpotential for memoization)
+        available = sorted((kind, color.value, count) for (kind, color), count in self._available.items())
+        self.key = (tuple(available), dieLimit, nightRules)
+        self._plans = {}
+    
+    @staticmethod
+    def fromMatch(match, player=None):
+        """Create a planner for the mana available to *player* (default: the current player). Tokens and
+        dice are only available to the current player."""
+        if player is None:
+            player = match.currentPlayer
+        tokens, dice, dieLimit = {}, {}, 0
+        if player is match.currentPlayer:
+            effect = match.effects.find(effects.ManaTokens)
+            if effect is not None:
+                tokens = {color: effect[color] for color in Mana}
+            dice = match.source.dice
+            dieLimit = match.source.limit
+        return ManaPlanner(tokens, dice, dieLimit, player.crystals, match.nightRulesApply())
+    
+    def colors(self, color):
+        """Return the colors which can pay a mana of the given color."""
+        if self.nightRules:
+            return (color, ) if color is not Mana.gold else ()
+        elif color is Mana.black:
+            return ()
+        elif color is not Mana.gold:
+            return (color, Mana.gold)
+        else: return (color, )
+    
+    def canPay(self, cost):
+        """Return whether the mana *cost* (a sequence of colors) can be paid."""
+        if len(cost) == 1: # fast path for legal-move generation
+            return any((kind, color) in self._available
+                       for color in self.colors(cost[0]) for kind in (TOKEN, DIE, CRYSTAL))
+        return len(self._solve(cost)) > 0
+    
+    def plans(self, cost, preference=defaultPreference):
+        """Return all ManaPlans which pay *cost* (a sequence of colors), best plans first. *preference*
+        gets a ManaPlan and must return something comparable (smaller is better)."""
+        return sorted(self._solve(cost), key=preference)
+    
+    def _solve(self, cost):
+        # Colors are paid independently of their order, so sort the cost to share memoized results
+        cost = tuple(sorted(cost, key=lambda color: color.value))
+        if cost not in self._plans:
+            options = [[(kind, c) for c in self.colors(color) for kind in (TOKEN, DIE, CRYSTAL)
+                        if (kind, c) in self._available]
+                       for color in cost]
+            results = {} # used as ordered set, so that the order of plans is reproducible
+            self._search(options, 0, {}, 0, (), results)
+            self._plans[cost] = [ManaPlan(payments) for payments in results]
+        return self._plans[cost]
+    
+    def _search(self, options, index, used, diceUsed, payments, results):
+        """Depth first search: Pay the mana *index*, *index*+1... of the cost using the resources that
+        were not *used* so far. Add the sorted payments of each complete plan to *results*."""
+        if index == len(options):
+            results[tuple(sorted(payments, key=lambda p: (p[0], p[1].value)))] = None
+            return
+        for option in options[index]:
+            if used.get(option, 0) >= self._available[option]:
+                continue
+            isDie = option[0] == DIE
+            if isDie and diceUsed >= self.dieLimit:
+                continue
+            used[option] = used.get(option, 0) + 1
+            self._search(options, index+1, used, diceUsed + isDie, payments + (option, ), results)
+            used[option] -= 1
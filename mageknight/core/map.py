@@ -24,7 +24,7 @@ from PyQt5 import QtCore
 
 import random
 
-from mageknight import hexcoords
+from mageknight import hexcoords, stack
 from mageknight.data import *  # @UnusedWildImport
 from . import basemap, sites
 from .effects import TerrainCostsOverwrite
@@ -49,7 +49,7 @@ class Map(basemap.Map):
     @staticmethod
     def create(match, shape):
         map = Map(match, shape)
-        map.tilePile = TilePile(7, 2, 2)
+        map.tilePile = TilePile(7, 2, 2, match.random.tiles)
         if shape is MapShape.wedge:
             map.addTile(Tile('A'), hexcoords.HexCoords(0,0))
 
@@ -107,7 +107,7 @@ class Map(basemap.Map):
         enemies = [e for e in site.enemies if not isinstance(e, UnknownEnemy)]
         unknownEnemies = [e.category for e in site.enemies if isinstance(e, UnknownEnemy)]
         enemies.extend(self.match.chooseEnemies(unknownEnemies))
-        self._setEnemies(site, enemies)
+        self.setEnemies(site, enemies)
         
     def adjacentMarauderSites(self, coords):
         return [site for site in self.adjacentSites(coords)
@@ -168,42 +168,60 @@ class Map(basemap.Map):
         coords = basemap.tileCenter(coords)
         if coords not in self.getExplorableTiles(self.persons[self.match.currentPlayer]):
             raise InvalidAction("Cannot explore")
-        tile = self.tilePile.pop()
-        self.addTile(tile, coords)
+        # Contrary to addTile this is undoable: Exploring reveals information and clears the stack, but
+        # a search (see core.search) must be able to roll it back.
+        tile = self.tilePile.top()
+        self.match.stack.push(stack.Call(self.tilePile.pop), stack.Call(self.tilePile.push, tile))
+        self.match.stack.push(stack.Call(basemap.Map.addTile, self, tile, coords),
+                              stack.Call(self._removeTile, coords))
+        for c, site, data in tile.allSites():
+            site = sites.create(site, self.match, coords + c, data) # may draw enemies
+            if site is not None:
+                self.match.stack.push(stack.Call(self._addSite, site), stack.Call(self._removeSite, site))
+        self.match.revealNewInformation()
         
         
 class TilePile(QtCore.QObject):
     tileCountChanged = QtCore.pyqtSignal(int, int, int)
     
-    def __init__(self, countrySides, nonCities, cities):
+    def __init__(self, countrySides, nonCities, cities, rng=random):
         super().__init__()
         self._pile = []
         
         # Countryside tiles
         tiles = Tile.allTiles(TileType.countrySide)
-        self._pile.extend(random.sample(tiles, countrySides))
+        self._pile.extend(rng.sample(tiles, countrySides))
         
         # Core tiles
         coreTiles = []
         tiles = Tile.allTiles(TileType.core)
-        coreTiles.extend(random.sample(tiles, nonCities))
+        coreTiles.extend(rng.sample(tiles, nonCities))
         tiles = Tile.allTiles(TileType.city)
-        coreTiles.extend(random.sample(tiles, cities))
-        random.shuffle(coreTiles)
+        coreTiles.extend(rng.sample(tiles, cities))
+        rng.shuffle(coreTiles)
         self._pile.extend(coreTiles)
         
         # Remaining countryside tiles
         restTiles = [t for t in Tile.allTiles(TileType.countrySide) if t not in self._pile]
         restTiles.extend(t for t in Tile.allTiles(TileType.core) if t not in self._pile)
-        random.shuffle(restTiles)
+        rng.shuffle(restTiles)
         self._pile.extend(restTiles)
         
         self.counts = [countrySides, nonCities+cities, len(restTiles)]
         
+    def top(self):
+        """Return the tile that will be popped next."""
+        return self._pile[0]
+        
     def pop(self):
         tile = self._pile.pop(0)
         self.tileCountChanged.emit(*self.counts)
         return tile
+    
+    def push(self, tile):
+        """Put *tile* back on top of the pile (undo pop)."""
+        self._pile.insert(0, tile)
+        self.tileCountChanged.emit(*self.counts)
         
     @property
     def state(self):
@@ -19,51 +19,74 @@
 # You should have received a copy of the GNU General Public License
 # 
 
-import random, functools
+import functools
 
 from PyQt5 import QtCore
 
 from mageknight import stack, hexcoords
 from mageknight.data import *  # @UnusedWildImport
-from mageknight.core import effects, cards
+from mageknight.core import effects
 from mageknight.core import source, player, map, effectlist, shop, combat, actions, assets  # @Reimport
-from mageknight.gui import dialogs
+from mageknight.core import enemypiles, decisions, randomstreams, actionlog, zobrist, manaplanner
 from .decorators import action
 
 DISCARD_CARDS = True # TODO: remove this debugging option
+ROUND_COUNT = 6 # number of rounds of a match (3 days and 3 nights)
 
 
 class PlayerData:
-    def __init__(self, name, hero):
+    def __init__(self, name, hero, decisionProvider=None):
         self.name = name
         self.hero = hero
+        self.decisionProvider = decisionProvider # see setDecisionProvider
         
         
 class Match(QtCore.QObject):
-    """This is the central object managing a match."""
+    """This is the central object managing a match. All randomness of the match is derived from *seed*
+    (see core.randomstreams). If *seed* is None, a random seed is chosen.
+    If *setup* is False, the map stays empty and the first round is not started. This is used to restore
+    saved matches (see core.savegame)."""
     stateChanged = QtCore.pyqtSignal(State)
     roundChanged = QtCore.pyqtSignal(Round)
     
-    def __init__(self, players):
+    def __init__(self, players, seed=None, setup=True):
         super().__init__()
         self.stack = stack.UndoStack()
+        self.random = randomstreams.RandomStreams(seed)
+        self.zobrist = zobrist.ZobristHash(self) # hash of the state, see core.zobrist
         
         self.round = Round(1, RoundType.day)
+        self.finalTurns = None # number of turns left in this round after the end of round was announced
+        self.turnNumber = 0 # number of turns started so far (counting all players)
+        self.hasActed = False # whether the current player moved or played cards this turn, see setHasActed
         self.state = None
-        self.players = [player.Player(self, data.name, data.hero) for data in players]
+        self.searching = 0 # number of active rollbacks, see core.search
+        self.players = [player.Player(self, data.name, data.hero, setup) for data in players]
         self.source = source.ManaSource(self, len(self.players)+2)
-        self.map = map.Map.create(self, MapShape.wedge)
+        self.enemyPiles = enemypiles.EnemyPiles(self) # must exist before the map draws enemies
+        if setup:
+            self.map = map.Map.create(self, MapShape.wedge)
+        else: self.map = map.Map(self, MapShape.wedge)
         self.effects = effectlist.EffectList(self)
-        self.shop = shop.Shop.create(self)
+        self.shop = shop.Shop.create(self) if setup else shop.Shop(self)
         self.combat = combat.Combat(self)
         self.actions = actions.ActionList(self)
+        self.actionLog = actionlog.ActionLog(self)
+        
+        self._decisionProviders = {}
+        for pl, data in zip(self.players, players):
+            if data.decisionProvider is not None:
+                self.setDecisionProvider(pl, data.decisionProvider)
         
         self.currentPlayer = self.players[0]
         for pl in self.players:
             pl.match = self
-            self.map.addPerson(pl, hexcoords.HexCoords(0, 0))
+            if setup:
+                self.map.addPerson(pl, hexcoords.HexCoords(0, 0))
 
-        self.beginRound()
+        if setup:
+            self.beginRound()
+        self.zobrist.reset() # default values of attributes were set without updating the hash
     
     def beginRound(self):
         self.source.reset()
@@ -72,16 +95,20 @@ class Match(QtCore.QObject):
         for player in self.players:
             player.initCards()
             player.drawCards()
+            for unit in player.units:
+                player.units.setIsReady(unit, True)
             
         # TODO: tactic selection
         self.beginTurn()
                     
     def beginTurn(self):
+        self.turnNumber += 1
+        self.setHasActed(False)
         self.setState(State.movement)
         site = self.map.siteAtPlayer(self.currentPlayer)
         if site is not None:
             site.onBeginOfTurn(self, self.currentPlayer)
-            site.onEnter(self, self.currentPlayer)
+            # TODO: Rules: a player who stays at an unconquered fortified site may attack it again
         self.revealNewInformation() # clear stack
         
     def endTurn(self):
@@ -100,7 +127,40 @@ class Match(QtCore.QObject):
         else:
             # Really end turn
             self.currentPlayer.drawCards()
+            self.nextTurn()
+            
+    def nextTurn(self):
+        """Pass the turn to the next player or end the round. The end of the round is announced as soon as
+        a player ends a turn with an empty draw pile. Afterwards each other player has one final turn.
+        """
+        if self.finalTurns is None:
+            if len(self.currentPlayer.drawPile) == 0:
+                self.finalTurns = len(self.players) - 1
+        else: self.finalTurns -= 1
+        
+        if self.finalTurns == 0:
+            self.endRound()
+        else:
+            index = self.players.index(self.currentPlayer)
+            self.setCurrentPlayer(self.players[(index+1) % len(self.players)])
             self.beginTurn()
+            
+    def endRound(self):
+        """End the current round and start the next one (or end the match after the last round)."""
+        self.finalTurns = None
+        if self.round.number == ROUND_COUNT:
+            self.setState(State.gameEnd)
+            self.revealNewInformation() # clear stack
+            return
+        type = RoundType.night if self.round.type is RoundType.day else RoundType.day
+        self.setRound(Round(self.round.number+1, type))
+        self.setCurrentPlayer(self.players[0]) # TODO: turn order depends on tactics
+        self.beginRound()
+        
+    @property
+    def isOver(self):
+        """Whether the match has ended."""
+        return self.state is State.gameEnd
         
     def setState(self, state):
         assert isinstance(state, State)
@@ -109,14 +169,73 @@ class Match(QtCore.QObject):
                             stack.Call(self._setState, self.state))
             self.updateActions()
     
+    def setRound(self, round):
+        self.stack.push(stack.Call(self._setRound, round),
+                        stack.Call(self._setRound, self.round))
+        
+    def _setRound(self, round):
+        self.zobrist.remove('round', self.round.number, self.round.type)
+        self.zobrist.add('round', round.number, round.type)
+        self.round = round
+        self.roundChanged.emit(round)
+        
+    def setCurrentPlayer(self, player):
+        if player is not self.currentPlayer:
+            self.stack.push(stack.Call(self._setCurrentPlayer, player),
+                            stack.Call(self._setCurrentPlayer, self.currentPlayer))
+            
+    def _setCurrentPlayer(self, player):
+        self.zobrist.remove('currentPlayer', self.players.index(self.currentPlayer))
+        self.zobrist.add('currentPlayer', self.players.index(player))
+        self.currentPlayer = player
+        
+    def setHasActed(self, hasActed=True):
+        """Set whether the current player has moved, played cards or activated units this turn. Resting
+        is only allowed before."""
+        if hasActed != self.hasActed:
+            self.stack.push(stack.Call(self._setHasActed, hasActed),
+                            stack.Call(self._setHasActed, self.hasActed))
+            self.updateActions()
+            
+    def _setHasActed(self, hasActed):
+        if hasActed:
+            self.zobrist.add('hasActed')
+        else: self.zobrist.remove('hasActed')
+        self.hasActed = hasActed
+    
     def _setState(self, state):
         if state != self.state:
             print("SET STATE", state)
+            if self.state is not None:
+                self.zobrist.remove('state', self.state)
+            self.zobrist.add('state', state)
             self.state = state
             self.stateChanged.emit(state)
                 
+    def setDecisionProvider(self, player, provider):
+        """Set the DecisionProvider (see core.decisions) which answers questions of the engine for
+        *player*."""
+        provider.match = self
+        provider.player = player
+        self._decisionProviders[player] = provider
+        
+    def decisions(self, player=None):
+        """Return the DecisionProvider of *player* (default: the current player)."""
+        if player is None:
+            player = self.currentPlayer
+        try:
+            provider = self._decisionProviders[player]
+        except KeyError:
+            raise decisions.DecisionError("No decision provider for player {}.".format(player.name))
+        if self.actionLog.recording:
+            return self.actionLog.recordingProvider(provider)
+        return provider
+                
     def revealNewInformation(self):
-        """Call this whenever new information is revealed. It will clear the undo stack."""
+        """Call this whenever new information is revealed. It will clear the undo stack (except during a
+        search, which rolls back everything it did, see core.search)."""
+        if self.searching > 0:
+            return
         if self.stack.isComposing():
             self.stack.endMacro()
             self.stack.clear()
@@ -124,13 +243,6 @@ class Match(QtCore.QObject):
         else:
             self.stack.clear()
     
-    def newInformationRevealed(self):
-        if self.stack.isComposing():
-            self.stack.endMacro()
-            self.stack.clear()
-        else:
-            self.stack.clear()
-    
     def checkEffectPlayable(self, effect=None, type=EffectType.unknown):
         """Check whether the given effect is playable in the current state and raise an InvalidAction error
         if not. Instead of specifying an effect it is possible to specify only an EffectType, or give no
@@ -140,77 +252,59 @@ class Match(QtCore.QObject):
         if self.state.inCombat:
             self.combat.checkEffectPlayable(effect, type)
         else:
-            if effect is not None:
-                type = effect.type
-                
-            if type == EffectType.movement and self.state is not State.movement:
-                raise InvalidAction("Cannot play movement effects now.")
-            elif type == EffectType.influence and self.state is not State.interaction:
-                raise InvalidAction("Cannot play influence effects now.")
-            elif type == EffectType.combat:
-                raise InvalidAction("Cannot play combat effects now.")
+            error = self.effectError(effect, type)
+            if error is not None:
+                raise InvalidAction(error)
+            
+    def effectError(self, effect=None, type=EffectType.unknown):
+        """Return the reason why the given effect (or an effect of the given type) cannot be played in
+        the current state, or None if it is playable. Unlike checkEffectPlayable this does not change
+        anything."""
+        if self.state.inCombat:
+            return self.combat.effectError(effect, type)
+        if effect is not None:
+            type = effect.type
+        if type == EffectType.movement and self.state is not State.movement:
+            return "Cannot play movement effects now."
+        elif type == EffectType.influence and self.state is not State.interaction:
+            return "Cannot play influence effects now."
+        elif type == EffectType.combat:
+            return "Cannot play combat effects now."
+        return None
         
     def nightRulesApply(self):
         """Return whether night rules hold currently. This is true during nights, in dungeons, etc."""
         return self.round.type == RoundType.night
             
-    def _manaOptions(self, player, color):
-        colors = [color] # during day we might add Mana.gold, skills might add even more
-        
-        if not self.nightRulesApply():
-            if color is Mana.black:
-                return []
-            elif color is not Mana.gold:
-                colors.append(Mana.gold)
-        else:
-            if color is Mana.gold:
-                return []
-        
-        options = []
-        
-        if player == self.currentPlayer:
-            # Check available tokens
-            effect = self.effects.find(effects.ManaTokens)
-            if effect is not None:
-                for color in colors:
-                    if effect[color] > 0:
-                        options.append(('token', color, '{} token'.format(color.name)))
-        
-            # Check source
-            if self.source.limit > 0:
-                for color in colors:
-                    if color in self.source:
-                        options.append(('die', color, '{} die'.format(color.name)))
-        
-        # Check crystals
-        for color in colors:
-            if color.isBasic and player.crystals[color] > 0:
-                options.append(('crystal', color, '{} crystal'.format(color.name)))
-                
-        return options
-                
-    def hasMana(self, color):
-        """Return whether the player can pay a mana of the given color."""
-        return len(self._manaOptions(self.currentPlayer, color)) > 0
-        
-    def payMana(self, color):
-        """Pay a mana in the given color."""
-        options = self._manaOptions(self.currentPlayer, color)
-        if len(options) == 0:
+    def manaPlanner(self, player=None):
+        """Return a ManaPlanner for the mana currently available to *player* (default: the current
+        player), see core.manaplanner."""
+        return manaplanner.ManaPlanner.fromMatch(self, player)
+    
+    def hasMana(self, *cost):
+        """Return whether the current player can pay a mana of each of the given colors."""
+        return self.manaPlanner().canPay(cost)
+        
+    def payMana(self, *cost):
+        """Pay a mana of each of the given colors. If there are several ways to do this, the player
+        chooses one of them."""
+        plans = self.manaPlanner().plans(cost)
+        if len(plans) == 0:
             if self.source.limit == 0:
                 raise InvalidAction("You don't have mana (cannot use another die).")
             else: raise InvalidAction("You don't have mana.")
         
-        if len(options) == 1 and options[0][0] != 'crystal': # always ask before using crystals
-            type, color, _ = options[0]
-        else:            
-            type, color, _ = dialogs.choose(options, labelFunc=lambda t: t[2], title=self.tr("Pay mana"))
-        if type == 'token':
-            self.effects.remove(effects.ManaTokens(color))
-        elif type == 'die':
-            self.source.take(color)
+        if len(plans) == 1 and plans[0].count(manaplanner.CRYSTAL) == 0: # always ask before using crystals
+            plan = plans[0]
         else:
-            self.currentPlayer.removeCrystal(color)
+            plan = self.decisions().choose(plans, title=self.tr("Pay mana"), default=plans[0])
+        for kind, color in plan.payments:
+            if kind == manaplanner.TOKEN:
+                self.effects.remove(effects.ManaTokens(color))
+            elif kind == manaplanner.DIE:
+                self.source.take(color)
+            else:
+                self.currentPlayer.removeCrystal(color)
     
     def payMovePoints(self, cost):
         if self.effects.movePoints < cost:
@@ -231,28 +325,15 @@ class Match(QtCore.QObject):
             self.effects.remove(effects.HealPoints(cost))
 
     def chooseEnemies(self, categories):
-        all = {}
-        for category in categories:
-            if category not in all:
-                all[category] = category.all()
-                    
-        # draw enemies
-        enemies = []
-        for category in categories:
-            if len(all[category]) > 0:
-                index = random.randint(0, len(all[category])-1)
-                enemies.append(all[category].pop(index))
-            else:
-                # more enemies requested as exist, should not happen
-                enemies.extend(self.chooseEnemies([category])) # use default distribution
-        return enemies
+        """Draw one enemy token for each EnemyCategory in *categories*."""
+        return [self.enemyPiles.draw(category) for category in categories]
         
     @action
     def playCard(self, player, card, effectIndex=0):
         """Play the given card. For cards with several actions, *effectIndex* determines which action
         to play (e.g. 0 for basic effect and 1 for strong effect of action cards).
         """
-        if isinstance(card, cards.ActionCard):
+        if isinstance(card, assets.ActionCard):
             self.checkEffectPlayable(type=card.effectType)
             if effectIndex == 0:
                 if DISCARD_CARDS:
@@ -268,6 +349,7 @@ class Match(QtCore.QObject):
         elif card.isWound:
             self.payHealPoints(1)
             self.currentPlayer.removeCard(card)
+        self.setHasActed()
             
     def sidewaysEffects(self):
         """Return all effects that can be achieved by playing a card sideways (might change due to skills).
@@ -288,6 +370,7 @@ class Match(QtCore.QObject):
             effect = self.sidewaysEffects()[effectIndex]
             player.discard(card)
             self.effects.add(effect)
+            self.setHasActed()
         else:
             raise InvalidAction("Cannot play wounds sideways.")
         
@@ -308,6 +391,7 @@ class Match(QtCore.QObject):
         
         self.payMovePoints(self.map.modifiedTerrainCosts(terrain))
         self.map.movePerson(player, coords)
+        self.setHasActed()
         
         # Site
         site = self.map.siteAt(coords) # returns only active sites
@@ -318,10 +402,11 @@ class Match(QtCore.QObject):
             site.onAdjacent(self, self.currentPlayer)
 
         # Marauding enemies
-        oldMarauderSites = set(self.map.adjacentMarauderSites(pos))
-        newMarauderSites = set(self.map.adjacentMarauderSites(coords))
-        provokedMarauderSites = newMarauderSites.intersection(oldMarauderSites)
-        provokableMarauderSites = newMarauderSites - provokedMarauderSites
+        # (use lists instead of sets, so that the order and thus enemy draws are reproducible)
+        oldMarauderSites = self.map.adjacentMarauderSites(pos)
+        newMarauderSites = self.map.adjacentMarauderSites(coords)
+        provokedMarauderSites = [site for site in newMarauderSites if site in oldMarauderSites]
+        provokableMarauderSites = [site for site in newMarauderSites if site not in oldMarauderSites]
                     
         if len(provokedMarauderSites) > 0:
             if not self.state.inCombat:
@@ -349,21 +434,151 @@ class Match(QtCore.QObject):
         self.combat.start()
     
     def updateActions(self):
-        self.actions.clear()
-        site = self.map.siteAt(self.map.persons[self.currentPlayer]) # TODO: improve this
-        if site is not None:
-            site.updateActions(self, self.currentPlayer)
-        if self.state in [State.movement, State.interaction, State.combatEnd,
-                          State.endOfTurn, State.combatRewards]:
-            self.actions.add('endturn', self.tr("End turn"), self.endTurn)
-        # Explore
-        coords = self.map.persons[self.currentPlayer]
-        if self.state is State.movement and self.map.canExplore(coords):
-            self.actions.add('explore', self.tr("Explore"),
-                             functools.partial(self.setState, State.explore))
+        """Recompute the action list from the current state. The list is only changed if the available
+        actions differ (see ActionList.update)."""
+        with self.actions.update():
+            site = self.map.siteAt(self.map.persons[self.currentPlayer]) # TODO: improve this
+            if site is not None:
+                site.updateActions(self, self.currentPlayer)
+            if self.state in [State.movement, State.interaction, State.combatEnd,
+                              State.endOfTurn, State.combatRewards]:
+                self.actions.add('endturn', self.tr("End turn"), self.endTurn)
+            if self.state is State.movement and not self.hasActed:
+                self.actions.add('rest', self.tr("Rest"), functools.partial(self._rest, self.currentPlayer))
+            # Explore
+            coords = self.map.persons[self.currentPlayer]
+            if self.state is State.movement and self.map.canExplore(coords):
+                self.actions.add('explore', self.tr("Explore"),
+                                 functools.partial(self.setState, State.explore))
     
             
     
+    def legalActions(self, player):
+        """Return the actions *player* can perform in the current state. Each action is a functools.partial
+        of a public action method (e.g. playCard) with all arguments bound; call it to perform the action.
+        The list is computed from the state without trying the actions, so nothing is changed.
+        
+        The check is exact for states, points, mana and selections, but not for the details of card
+        effects that ask questions (those may still fail with InvalidAction). Damage plans (see
+        assignDamagePlan) are not enumerated.
+        """
+        if player is not self.currentPlayer or self.isOver:
+            return []
+        state = self.state
+        result = []
+        def add(method, *args):
+            result.append(functools.partial(method, player, *args))
+            
+        # Results of effectError and hasMana are looked up many times, so remember them
+        typePlayable = {}
+        def isTypePlayable(type):
+            if type not in typePlayable:
+                typePlayable[type] = self.effectError(type=type) is None
+            return typePlayable[type]
+        planner = [] # created when it is needed first, memoizes its results
+        def hasMana(color):
+            if len(planner) == 0:
+                planner.append(self.manaPlanner(player))
+            return planner[0].canPay((color, ))
+        sideways = [i for i, effect in enumerate(self.sidewaysEffects()) if self.effectError(effect) is None]
+            
+        # Cards
+        for card in player.handCards:
+            if card.isWound:
+                if self.effects.healPoints >= 1:
+                    add(self.playCard, card, 0)
+                continue
+            if isinstance(card, assets.ActionCard) and isTypePlayable(card.effectType):
+                if self._optionsPlayable(card, 'basicEffect', card.basicOptions):
+                    add(self.playCard, card, 0)
+                if hasMana(card.color) and self._optionsPlayable(card, 'strongEffect', card.strongOptions):
+                    add(self.playCard, card, 1)
+            for i in sideways:
+                add(self.playSideways, card, i)
+        
+        # Units
+        for unit in player.units:
+            if unit.isWounded:
+                if self.effects.healPoints >= unit.level:
+                    add(self.activateUnit, unit, None)
+            elif unit.isReady and isTypePlayable(EffectType.unknown):
+                for ability in unit.abilities:
+                    if ability.states is not None and state not in ability.states:
+                        continue
+                    if not isTypePlayable(ability.type):
+                        continue
+                    if len(ability.options) > 0 and all(self.effectError(option) is not None
+                                                        for option in ability.options):
+                        continue
+                    if ability.cost is None or hasMana(ability.cost):
+                        add(self.activateUnit, unit, ability)
+                
+        if state is State.movement:
+            coords = self.map.persons[player]
+            movePoints = self.effects.movePoints
+            for neighbor in coords.neighbors():
+                terrain = self.map.terrainAt(neighbor)
+                if terrain is None:
+                    continue
+                cost = self.map.modifiedTerrainCosts(terrain) # None if impassable
+                site = self.map.siteAt(neighbor)
+                if cost is not None and cost <= movePoints \
+                        and (site is None or site.type not in (Site.maraudingOrcs, Site.draconum)):
+                    add(self.movePlayer, neighbor)
+        elif state is State.explore:
+            if self.effects.movePoints >= 2:
+                for coords in self.map.getExplorableTiles(self.map.persons[player]):
+                    add(self.explore, coords)
+        elif state is State.interaction:
+            site = self.map.siteAtPlayer(player)
+            if site is not None:
+                for unit in self.shop.units:
+                    if site.type in unit.sites and unit.cost <= self.effects.influencePoints:
+                        add(self.recruitUnit, unit)
+        elif state is State.combatRewards:
+            if self.combat.currentReward is None:
+                for reward in self.combat.rewards:
+                    add(self.chooseRewardType, reward)
+            else:
+                reward = self.combat.currentReward
+                for item in reward.items:
+                    add(self.chooseRewardItem, reward, item)
+        elif state.inCombat:
+            self._legalCombatActions(add)
+        
+        for entry in self.actions:
+            add(self.activateAction, entry.id)
+        return result
+    
+    def _optionsPlayable(self, card, method, options):
+        # Cards which use the default implementation of an effect method can only be played if one of
+        # their options is playable. Other cards are assumed to be playable.
+        if getattr(type(card), method) is not getattr(assets.ActionCard, method):
+            return True
+        return any(self.effectError(option) is None for option in options)
+    
+    def _legalCombatActions(self, add):
+        # Helper for legalActions: *add* adds an action for the current player
+        state = self.state
+        combat = self.combat
+        if state is State.initCombat:
+            return
+        if not combat.effectsPlayed:
+            for enemy in combat.enemies:
+                if enemy.isSelected:
+                    if state is not State.provokeMarauders or enemy.isProvokable:
+                        add(self.setEnemySelected, enemy, False)
+                elif combat.isEnemyActive(enemy):
+                    add(self.setEnemySelected, enemy, True)
+        if combat.hasSelectedEnemy():
+            add(self.combatNext)
+        if state in (State.rangeAttack, State.block, State.attack):
+            add(self.combatSkip)
+        if state is State.assignDamage and combat.hasSelectedEnemy():
+            for unit in self.currentPlayer.units:
+                if not unit.isWounded and not unit.isProtected:
+                    add(self.assignDamageToUnit, unit)
+            
     def startInteraction(self):
         if self.state is not State.movement:
             raise InvalidAction("Cannot start interaction now.")
@@ -379,7 +594,7 @@ class Match(QtCore.QObject):
         assert isinstance(unit, assets.Unit)
         if not unit.isWounded:
             assert ability in unit.abilities
-            self.checkEffectPlayable() # TODO action type
+            self.checkEffectPlayable(type=ability.type)
             if not unit.isReady:
                 raise InvalidAction("This unit is spent.")
             if ability.cost is not None:
@@ -389,7 +604,34 @@ class Match(QtCore.QObject):
         else:
             self.payHealPoints(unit.level)
             player.healUnit(unit)
+        self.setHasActed()
             
+    @action(State.movement)
+    def rest(self, player):
+        """Rest instead of taking a normal turn: Discard one non-wound card and all wounds from the hand.
+        If the hand contains only wounds, discard a single wound (slow recovery). Afterwards the turn ends.
+        """
+        self._rest(player)
+        
+    def _rest(self, player):
+        # This helper is used in rest and by the 'rest' entry of the action list (which is activated
+        # within the activateAction macro)
+        if self.hasActed:
+            raise InvalidAction("Cannot rest after moving or playing cards.")
+        if len(player.handCards) == 0:
+            raise InvalidAction("Cannot rest without hand cards.")
+        wounds = [card for card in player.handCards if card.isWound]
+        cards = [card for card in player.handCards if not card.isWound]
+        if len(cards) > 0:
+            if len(cards) > 1:
+                card = self.decisions(player).choose(cards, text=self.tr("Rest: Choose a card to discard."))
+            else: card = cards[0]
+            for c in [card] + wounds:
+                player.discard(c)
+        else:
+            player.discard(wounds[0])
+        self.endTurn()
+        
     @action(State.interaction)
     def recruitUnit(self, player, unit):
         if self.state is not State.interaction:
@@ -403,8 +645,8 @@ class Match(QtCore.QObject):
         # This helper function is used in recruitUnit (reward=False)
         # and when a player gets a unit as reward (reward=True)
         if player.unitLimit <= len(player.units): # TODO: special case (reward+level-up)
-            unitToDisband = dialogs.choose(player.units,
-                                           text=self.tr("All slots occupied. Choose a unit to disband."))
+            unitToDisband = self.decisions(player).choose(
+                                player.units, text=self.tr("All slots occupied. Choose a unit to disband."))
             player.units.remove(unitToDisband)
         if not reward:
             self.payInfluencePoints(unit.cost)
@@ -427,6 +669,10 @@ class Match(QtCore.QObject):
     def assignDamageToUnit(self, player, unit):
         self.combat.assignDamageToUnit(unit)
         
+    @action(State.assignDamage)
+    def assignDamagePlan(self, player, plan):
+        self.combat.assignDamagePlan(plan)
+        
     @action
     def activateAction(self, player, actionId):
         self.actions.activate(self, player, actionId)
@@ -434,6 +680,7 @@ class Match(QtCore.QObject):
     @action(State.explore)
     def explore(self, player, coords):
         self.payMovePoints(2)
+        self.setHasActed()
         self.map.explore(coords)
         self.setState(State.movement)
         
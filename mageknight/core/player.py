@@ -20,55 +20,60 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import random
-
 from PyQt5 import QtCore
 
 from mageknight.attributes import * # @UnusedWildImport
 from mageknight.data import * # @UnusedWildImport
 from mageknight import stack
-from . import effects
+from . import deck, effects
 from mageknight.core import assets
 
 
 class Player(AttributeObject):
     levelChanged = QtCore.pyqtSignal(int)
-    level = IntAttribute(default=1, sendValue=True)
+    level = IntAttribute(default=1, sendValue=True, hashed=True)
     
     fameChanged = QtCore.pyqtSignal(int)
-    fame = IntAttribute(sendValue=True)
+    fame = IntAttribute(sendValue=True, hashed=True)
     
     reputationChanged = QtCore.pyqtSignal(int)
-    reputation = IntAttribute(sendValue=True, minimum=MIN_REPUTATION, maximum=MAX_REPUTATION, strict=False)
+    reputation = IntAttribute(sendValue=True, minimum=MIN_REPUTATION, maximum=MAX_REPUTATION, strict=False,
+                              hashed=True)
     
     tacticChanged = QtCore.pyqtSignal(PlayerTactic)
     tactic = Attribute(PlayerTactic, sendValue=True)
     
-    armor = IntAttribute(default=2)
-    cardLimit = IntAttribute(default=5)
+    armor = IntAttribute(default=2, hashed=True)
+    cardLimit = IntAttribute(default=5, hashed=True)
     
     cardCountChanged = QtCore.pyqtSignal()
     handCardsChanged = QtCore.pyqtSignal()
-    drawPile = ListAttribute(assets.Card, signal='cardCountChanged')
-    handCards = ListAttribute(assets.Card, signal='handCardsChanged') # is connected to cardCountChanged in __init__
-    discardPile = ListAttribute(assets.Card, signal='cardCountChanged')
+    # drawPile, handCards and discardPile are core.deck.Decks created in __init__
     
     unitsChanged = QtCore.pyqtSignal()
     units = ListAttribute(assets.Unit,
                           itemAttributes=[('isReady', bool),
                                           ('wounds', int),
-                                          ('isProtected', bool)])
+                                          ('isProtected', bool)],
+                          hashed=True)
     
     crystalsChanged = QtCore.pyqtSignal()
     
-    def __init__(self, match, name, hero):
+    def __init__(self, match, name, hero, setup=True):
         super().__init__(match.stack)
+        self.zobrist = match.zobrist
         self.match = match
         self.name = name
         self.hero = hero
         self.crystals = {color: 0 for color in Mana.basicColors()}
-        self.drawPile = hero.getDeedDeck()
-        self.tactic = PlayerTactic(Tactic.earlyBird)
+        self.drawPile = deck.Deck(self.stack, self.cardCountChanged, owner=self, name='drawPile')
+        # handCardsChanged is connected to cardCountChanged below
+        self.handCards = deck.Deck(self.stack, self.handCardsChanged, owner=self, name='handCards')
+        self.discardPile = deck.Deck(self.stack, self.cardCountChanged, owner=self, name='discardPile')
+        if setup: # otherwise the player is restored from a save game (see core.savegame)
+            self.drawPile.extend(hero.getDeedDeck())
+            self.tactic = PlayerTactic(Tactic.earlyBird)
+        self.handCardsChanged.connect(self.cardCountChanged)
         
         # Debug code: use this to get a unit from the start
         #self.units.append(assets.get("foresters"))
@@ -85,13 +90,9 @@ class Player(AttributeObject):
                                         
     def initCards(self):
         """Initialize cards at the beginning of a round."""
-        self.drawPile.extend(self.handCards)
-        self.drawPile.extend(self.discardPile)
-        self.handCards = []
-        self.discardPile = []
-        random.shuffle(self.drawPile)
-        self.handCardsChanged.connect(self.cardCountChanged)
-        self.handCardsChanged.emit()
+        self.handCards.moveTo(self.drawPile)
+        self.discardPile.moveTo(self.drawPile)
+        self.drawPile.shuffle(self.match.random.decks)
         
     def modifiedCardLimit(self):
         limit = self.cardLimit
@@ -108,11 +109,11 @@ class Player(AttributeObject):
         if count is None:
             count = self.modifiedCardLimit() - len(self.handCards)
         count = min(count, len(self.drawPile))
-        if count > 0:
-            self.handCards.extend(self.drawPile[-count:])
-            del self.drawPile[-count:]
-            self.cardCountChanged.emit()
-            self.handCardsChanged.emit()
+        self.drawPile.moveTo(self.handCards, count)
+        
+    def removeCard(self, card):
+        """Remove *card* from the hand without discarding it (e.g. a healed wound)."""
+        self.handCards.remove(card)
         
     def discard(self, card):
         self.handCards.remove(card)
@@ -129,7 +130,7 @@ class Player(AttributeObject):
         if self.crystals[color] < 3:
             self.match.stack.push(stack.Call(self._addCrystal, color),
                                   stack.Call(self._removeCrystal, color))
-        else: self.addToken(color)
+        else: self.addMana(color)
     
     def removeCrystal(self, color):
         assert color.isBasic and self.crystals[color] > 0
@@ -144,17 +145,15 @@ class Player(AttributeObject):
         
     def addWounds(self, wounds, toDiscardPile=False):
         theList = self.handCards if not toDiscardPile else self.discardPile
-        for _ in range(wounds):
-            theList.append(assets.get('wound'))
+        theList.extend([assets.Wound()] * wounds)
         # Note: whether a player is knocked out depends on the number of wounds received the current combat.
         # Thus this is decided in the combat code.
                 
     def heal(self, fromDiscardPile=False):
         theList = self.handCards if not fromDiscardPile else self.discardPile
-        for card in theList:
-            if card.isWound:
-                self.removeCard(card)
-                break
+        wound = assets.Wound()
+        if wound in theList:
+            theList.remove(wound)
     
     def healUnit(self, unit):
         if unit.wounds > 0:
@@ -165,10 +164,19 @@ class Player(AttributeObject):
     
     def _addCrystal(self, color):
         assert self.crystals[color] < 3
+        self._updateCrystalHash(color, 1)
         self.crystals[color] += 1
         self.crystalsChanged.emit()
         
     def _removeCrystal(self, color):
         assert self.crystals[color] > 0
+        self._updateCrystalHash(color, -1)
         self.crystals[color] -= 1
         self.crystalsChanged.emit()
+        
+    def _updateCrystalHash(self, color, delta):
+        count = self.crystals[color]
+        if count > 0:
+            self.zobrist.remove(self, 'crystals', color, count)
+        if count + delta > 0:
+            self.zobrist.add(self, 'crystals', color, count + delta)
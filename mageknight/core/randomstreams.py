@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Seeded random number generators of a match. Each match owns a RandomStreams-instance (match.random)
+and all random decisions of the engine must use it instead of the global random module:
+
+    >>> match.random.dice.randint(1, 6)
+
+Randomness is split into independent substreams, one for each purpose (see STREAMS). All substreams are
+derived from a single seed, so that a match is reproducible from its seed. Because the streams are
+independent, e.g. drawing an additional enemy does not change the tiles that will be explored.
+"""
+
+import random
+
+STREAMS = ('tiles', 'enemies', 'dice', 'decks', 'rewards')
+
+
+class RandomStreams:
+    """The random streams of a match. Each stream in STREAMS is available as an attribute which is a
+    random.Random-instance. If *seed* is None, a seed is chosen using the global random module."""
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        for name in STREAMS:
+            # Seeding with a str is deterministic across processes (unlike hash-based seeding)
+            setattr(self, name, random.Random('{}:{}'.format(seed, name)))
+            
+    def getState(self):
+        """Return the internal state of all streams (see setState)."""
+        return {name: getattr(self, name).getstate() for name in STREAMS}
+    
+    def setState(self, state):
+        """Restore the internal state of all streams from a value returned by getState."""
+        for name in STREAMS:
+            getattr(self, name).setstate(state[name])
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Deterministic replay of action logs (see core.actionlog). A Replay rebuilds the position after any
+number of actions by executing the log headlessly:
+
+    >>> replay = Replay(match.actionLog)
+    >>> position = replay.match(120) # the match after the first 120 logged actions
+    
+While replaying, a snapshot (see core.savegame) is taken every *snapshotInterval* actions, so that seeking
+to an action later only needs to replay the actions since the nearest snapshot. The engine logs state
+changes using print; redirect stdout to replay quietly.
+"""
+
+import bisect, time
+
+from mageknight.data import * # @UnusedWildImport
+from . import actionlog, decisions, match as matchModule, savegame
+
+
+class ReplayError(RuntimeError):
+    """Raised when replaying an action does not reproduce the logged result."""
+
+
+class Replay:
+    """Replay the ActionLog *log*."""
+    def __init__(self, log, snapshotInterval=100):
+        self.log = log
+        self.snapshotInterval = snapshotInterval
+        self._snapshots = {} # maps number of replayed actions to save games
+        self._snapshotIndexes = [] # sorted keys of _snapshots
+        self.replayedActions = 0 # statistics: number of actions executed
+        self.replaySeconds = 0. # statistics: time used to execute them
+        
+    def match(self, index=None):
+        """Return a new Match in the position after the first *index* actions of the log (default: all
+        actions). The match's decision providers replay the logged answers; replace them using
+        Match.setDecisionProvider to continue the match."""
+        if index is None:
+            index = len(self.log)
+        if not 0 <= index <= len(self.log):
+            raise IndexError("Log has no action {}".format(index))
+        provider = decisions.ReplayDecisionProvider()
+        position = bisect.bisect_right(self._snapshotIndexes, index) - 1
+        if position >= 0:
+            start = self._snapshotIndexes[position]
+            match = savegame.load(self._snapshots[start], [provider] * len(self.log.players))
+        else:
+            start = 0
+            match = self._initialMatch(provider)
+            self._addSnapshot(0, match)
+        
+        timeStart = time.perf_counter()
+        for i in range(start, index):
+            self._execute(match, provider, self.log[i], i)
+            if (i+1) % self.snapshotInterval == 0:
+                self._addSnapshot(i+1, match)
+        self.replaySeconds += time.perf_counter() - timeStart
+        self.replayedActions += index - start
+        return match
+    
+    @property
+    def actionsPerSecond(self):
+        """Replay speed so far in actions per second."""
+        return self.replayedActions / self.replaySeconds if self.replaySeconds > 0 else 0.
+        
+    def _initialMatch(self, provider):
+        log = self.log
+        if log.initialState is not None:
+            return savegame.load(log.initialState, [provider] * len(log.players))
+        players = [matchModule.PlayerData(name, hero, provider) for name, hero in log.players]
+        return matchModule.Match(players, seed=log.seed)
+    
+    def _addSnapshot(self, index, match):
+        if index not in self._snapshots:
+            self._snapshots[index] = savegame.save(match)
+            bisect.insort(self._snapshotIndexes, index)
+        
+    def _execute(self, match, provider, entry, index):
+        player = match.players[entry.player]
+        args = actionlog.decodeArgs(match, player, entry.args)
+        kwargs = {key: actionlog.decodeArg(match, player, value) for key, value in entry.kwargs.items()}
+        provider.answers = list(entry.answers)
+        try:
+            result = getattr(match, entry.action)(player, *args, **kwargs)
+        except decisions.DecisionError as e:
+            raise ReplayError("Action {} ({}) asked other questions than logged: {}"
+                              .format(index, entry.action, e))
+        if result != entry.result or len(provider.answers) > 0:
+            raise ReplayError("Action {} ({}) did not reproduce the logged result."
+                              .format(index, entry.action))
@@ -0,0 +1,542 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+"""Compact binary save games. A save game contains the complete state of a match between two actions:
+map tiles, sites with their owners and enemies, the tile and enemy piles, players (piles, units, crystals),
+the mana source, the shop, active effects, the combat, state and round and the random streams.
+
+    >>> data = savegame.save(match)
+    >>> match = savegame.load(data, decisionProviders=[provider1, provider2])
+
+Cards, units, enemies and tiles are stored as small integer ids. Card and unit ids are indexes into the
+sorted list of all card and unit names; a checksum of this list is stored in the header, so that save games
+are rejected if the assets have changed. Loading writes directly into the model objects: it takes time
+linear in the size of the state, emits no signals and pushes nothing onto the undo stack.
+
+The undo stack itself and the decision providers are not saved. Actions are stored by the name of their
+method and bound to the match or the site again when loading.
+"""
+
+import array, functools, struct, zlib
+
+from mageknight.hexcoords import HexCoords
+from mageknight.data import * # @UnusedWildImport
+from mageknight.data import enemies
+from mageknight.data.map import Tile
+from . import assets, basemap, combat, effects, map, match as matchModule, randomstreams, sites
+
+MAGIC = b'MKSG'
+VERSION = 2
+
+_NONE = 0xFF # encodes None in unsigned byte fields
+_NO_ENEMY = 0xFFFF
+_UNKNOWN_ENEMY = 0xFF00 # UnknownEnemy tokens are stored as _UNKNOWN_ENEMY | category.value
+
+# Tags of effect types
+_EFFECT_TYPES = (effects.MovePoints, effects.InfluencePoints, effects.HealPoints, effects.BlockPoints,
+                 effects.AttackPoints, effects.ManaTokens, effects.TerrainCostsOverwrite,
+                 effects.LosesResistance, effects.ArmorReduction, effects.Concentration)
+
+# Kinds of combat reward items
+_ITEM_MANA, _ITEM_SHOP_UNIT, _ITEM_CARD = range(3)
+
+# Kinds of actions: bound methods of the match or of a site, or actions created by updateActions
+_ACTION_MATCH, _ACTION_SITE, _ACTION_DERIVED = range(3)
+
+_SHOP_LISTS = ('advancedActions', 'spells', 'units', 'monasteryOffer', 'commonSkillOffer',
+               'advancedActionsPile', 'spellsPile', 'artifactsPile', 'regularUnitsPile', 'eliteUnitsPile')
+
+
+class SaveGameError(ValueError):
+    """Raised when data cannot be loaded, e.g. because it is no save game or was written by an
+    incompatible version."""
+
+
+class _Catalog:
+    """Integer ids of cards, units and tiles."""
+    def __init__(self):
+        # Ids are indexes into the sorted names (and not Card.id/Unit.id), so that they do not depend on
+        # the order in which asset modules are imported
+        classes = {cls.name: cls for cls in assets.allClasses()}
+        names = sorted(classes)
+        self.assetClasses = [classes[name] for name in names]
+        self.assetIds = {cls: i for i, cls in enumerate(self.assetClasses)}
+        # Conversion between these ids and the registry ids stored in core.deck.Decks
+        self.deckIds = [0] * len(self.assetClasses)
+        for cls, i in self.assetIds.items():
+            self.deckIds[cls.id] = i
+        self.tileIds = sorted(Tile._terrains)
+        self.tileIndexes = {id: i for i, id in enumerate(self.tileIds)}
+        self.checksum = zlib.crc32('\n'.join(names + self.tileIds).encode())
+
+
+@functools.lru_cache(maxsize=None)
+def _catalog():
+    return _Catalog()
+
+
+@functools.lru_cache(maxsize=None)
+def _struct(format):
+    return struct.Struct('<' + format)
+
+
+class _Writer:
+    def __init__(self):
+        self._parts = []
+        
+    def write(self, format, *values):
+        self._parts.append(_struct(format).pack(*values))
+        
+    def writeString(self, string):
+        data = string.encode()
+        self.write('H', len(data))
+        self._parts.append(data)
+        
+    def writeArray(self, format, values):
+        """Write a list of *values* of the given single-character struct format, prefixed by its length."""
+        self.write('H', len(values))
+        self.write(str(len(values)) + format, *values)
+        
+    def getvalue(self):
+        return b''.join(self._parts)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        
+    def read(self, format):
+        s = _struct(format)
+        values = s.unpack_from(self.data, self.pos)
+        self.pos += s.size
+        return values
+    
+    def readOne(self, format):
+        return self.read(format)[0]
+    
+    def readString(self):
+        length = self.readOne('H')
+        string = bytes(self.data[self.pos:self.pos+length]).decode()
+        self.pos += length
+        return string
+    
+    def readArray(self, format):
+        length = self.readOne('H')
+        return self.read(str(length) + format)
+    
+
+def save(match, randomState=True):
+    """Return the state of *match* as bytes. If *randomState* is False, the state of the random streams is
+    not saved (this saves about 12 KB); the streams of the loaded match will then start from the seed
+    again."""
+    catalog = _catalog()
+    w = _Writer()
+    w.write('4sHI?', MAGIC, VERSION, catalog.checksum, randomState)
+    w.writeString(str(match.random.seed))
+    if randomState:
+        _saveRandom(w, match)
+    
+    playerIndexes = {player: i for i, player in enumerate(match.players)}
+    playerIndexes[None] = _NONE
+    w.write('B', len(match.players))
+    for player in match.players:
+        _savePlayer(w, catalog, player)
+        coords = match.map.persons.get(player)
+        if coords is not None:
+            w.write('?hh', True, coords.x, coords.y)
+        else: w.write('?', False)
+    
+    w.write('BBbHBB?', match.round.number, match.round.type.value,
+            match.finalTurns if match.finalTurns is not None else -1, match.turnNumber,
+            match.state.value if match.state is not None else 0, playerIndexes[match.currentPlayer],
+            match.hasActed)
+    
+    _saveMap(w, catalog, match, playerIndexes)
+    for category in EnemyCategory:
+        w.writeArray('H', match.enemyPiles._drawPiles[category])
+        w.writeArray('H', match.enemyPiles._discardPiles[category])
+    w.write('BB', match.source.count, match.source.limit)
+    w.writeArray('B', [die.value for die in match.source])
+    for name in _SHOP_LISTS:
+        w.writeArray('H', [catalog.assetIds[type(card)] for card in getattr(match.shop, name)])
+    w.write('H', len(match.effects))
+    for effect in match.effects:
+        _saveEffect(w, effect)
+    _saveCombat(w, catalog, match)
+    w.write('B', len(match.actions))
+    for action in match.actions:
+        _saveAction(w, match, action)
+    return w.getvalue()
+
+
+def load(data, decisionProviders=None):
+    """Restore a match from *data* (bytes or a buffer such as a memoryview) as returned by save.
+    *decisionProviders* is an optional list containing a DecisionProvider (or None) for each player."""
+    catalog = _catalog()
+    r = _Reader(data)
+    try:
+        magic, version, checksum, hasRandomState = r.read('4sHI?')
+    except struct.error:
+        raise SaveGameError("Data is too short for a save game.")
+    if magic != MAGIC:
+        raise SaveGameError("Data is not a save game.")
+    if version != VERSION:
+        raise SaveGameError("Unsupported save game version {} (expected {}).".format(version, VERSION))
+    if checksum != catalog.checksum:
+        raise SaveGameError("Save game was written with different cards, units or tiles.")
+    try:
+        return _load(r, catalog, hasRandomState, decisionProviders)
+    except (struct.error, IndexError, KeyError, TypeError, ValueError) as e:
+        raise SaveGameError("Corrupt save game: {}".format(e))
+
+
+def _load(r, catalog, hasRandomState, decisionProviders):
+    seed = r.readString()
+    if seed.lstrip('-').isdigit():
+        seed = int(seed)
+    randomState = _loadRandom(r) if hasRandomState else None
+    
+    playerCount = r.readOne('B')
+    playerStates = []
+    for _ in range(playerCount):
+        playerStates.append(_loadPlayer(r))
+        if r.readOne('?'):
+            playerStates[-1]['coords'] = HexCoords(*r.read('hh'))
+        else: playerStates[-1]['coords'] = None
+    if decisionProviders is None:
+        decisionProviders = [None] * playerCount
+    players = [matchModule.PlayerData(state['name'], Hero(state['hero']), provider)
+               for state, provider in zip(playerStates, decisionProviders)]
+    match = matchModule.Match(players, seed=seed, setup=False)
+    # Model objects are written directly; only the stack and the action list would emit signals
+    for obj in (match.stack, match.actions):
+        obj.blockSignals(True)
+    for player, state in zip(match.players, playerStates):
+        _restorePlayer(catalog, player, state)
+        if state['coords'] is not None:
+            match.map.persons[player] = state['coords']
+    
+    roundNumber, roundType, finalTurns, match.turnNumber, state, currentPlayer, match.hasActed \
+        = r.read('BBbHBB?')
+    match.round = Round(roundNumber, RoundType(roundType))
+    match.finalTurns = finalTurns if finalTurns >= 0 else None
+    match.state = State(state) if state != 0 else None
+    match.currentPlayer = match.players[currentPlayer]
+    
+    _loadMap(r, catalog, match)
+    for category in EnemyCategory:
+        match.enemyPiles._drawPiles[category][:] = array.array('H', r.readArray('H'))
+        match.enemyPiles._discardPiles[category][:] = array.array('H', r.readArray('H'))
+    match.source.count, limit = r.read('BB')
+    _setValue(match.source, 'limit', limit)
+    dice = {color: 0 for color in Mana}
+    for value in r.readArray('B'):
+        dice[Mana(value)] += 1
+    match.source.dice.update(dice)
+    match.source._length = sum(dice.values())
+    for name in _SHOP_LISTS:
+        _setList(match.shop, name, [catalog.assetClasses[id]() for id in r.readArray('H')])
+    match.effects._list = [_loadEffect(r) for _ in range(r.readOne('H'))]
+    _loadCombat(r, catalog, match)
+    actions = [_loadAction(r) for _ in range(r.readOne('B'))]
+    
+    # Sites draw enemies when they are created and updateActions pushes onto the stack. Random streams
+    # and the stack are restored last to undo these side effects.
+    _restoreActions(match, actions)
+    if randomState is not None:
+        match.random.setState(randomState)
+    else: match.random = randomstreams.RandomStreams(seed)
+    match.stack.clear()
+    match.zobrist.reset() # values were restored without updating the hash
+    for obj in (match.stack, match.actions):
+        obj.blockSignals(False)
+    match.actionLog.initialState = bytes(r.data) # the log of the match starts here
+    return match
+
+
+def _setValue(obj, name, value):
+    """Set the value of the Attribute *name* of *obj* without using the stack or emitting signals."""
+    setattr(obj, getattr(type(obj), name)._name, value)
+    
+
+def _setList(obj, name, items):
+    """Set the contents of the ListAttribute *name* of *obj* without using the stack or emitting signals.
+    """
+    list.__setitem__(getattr(obj, name), slice(None), items)
+    
+
+def _saveRandom(w, match):
+    for version, internalState, gauss in match.random.getState().values():
+        w.write('B625I?d', version, *internalState, gauss is not None, gauss or 0.)
+        
+
+def _loadRandom(r):
+    state = {}
+    for name in randomstreams.STREAMS:
+        values = r.read('B625I?d')
+        state[name] = (values[0], values[1:626], values[627] if values[626] else None)
+    return state
+
+
+def _savePlayer(w, catalog, player):
+    w.writeString(player.name)
+    tactic = player.tactic
+    w.write('BBHbBBB?bB', player.hero.value, player.level, player.fame, player.reputation, player.armor,
+            player.cardLimit, tactic.tactic.value, tactic.flipped,
+            tactic.cardCount if tactic.cardCount is not None else -1,
+            tactic.manaDie.value if tactic.manaDie is not None else _NONE)
+    w.write('4B', *(player.crystals[color] for color in Mana.basicColors()))
+    for pile in (player.drawPile, player.handCards, player.discardPile):
+        w.writeArray('H', [catalog.deckIds[id] for id in pile.ids])
+    w.write('B', len(player.units))
+    for unit in player.units:
+        w.write('H??B', catalog.assetIds[type(unit)], unit.isReady, unit.isProtected, unit.wounds)
+        
+        
+def _loadPlayer(r):
+    state = {'name': r.readString()}
+    (state['hero'], state['level'], state['fame'], state['reputation'], state['armor'], state['cardLimit'],
+     tactic, flipped, cardCount, manaDie) = r.read('BBHbBBB?bB')
+    state['tactic'] = PlayerTactic(Tactic(tactic))
+    state['tactic'].flipped = flipped
+    state['tactic'].cardCount = cardCount if cardCount >= 0 else None
+    state['tactic'].manaDie = Mana(manaDie) if manaDie != _NONE else None
+    state['crystals'] = r.read('4B')
+    state['piles'] = [r.readArray('H') for _ in range(3)]
+    state['units'] = [r.read('H??B') for _ in range(r.readOne('B'))]
+    return state
+
+
+def _restorePlayer(catalog, player, state):
+    for name in ('level', 'fame', 'reputation', 'armor', 'cardLimit', 'tactic'):
+        _setValue(player, name, state[name])
+    player.crystals = dict(zip(Mana.basicColors(), state['crystals']))
+    for name, ids in zip(('drawPile', 'handCards', 'discardPile'), state['piles']):
+        getattr(player, name)._ids = array.array('H', (catalog.assetClasses[id].id for id in ids))
+    units = []
+    for id, isReady, isProtected, wounds in state['units']:
+        unit = catalog.assetClasses[id]()
+        unit.isReady = isReady
+        unit.isProtected = isProtected
+        unit.wounds = wounds
+        units.append(unit)
+    _setList(player, 'units', units)
+    
+    
+def _enemyId(enemy):
+    if isinstance(enemy, UnknownEnemy):
+        return _UNKNOWN_ENEMY | enemy.category.value
+    return enemy.index
+
+
+def _enemy(id):
+    if id & _UNKNOWN_ENEMY == _UNKNOWN_ENEMY:
+        return UnknownEnemy(EnemyCategory(id & 0xFF))
+    return enemies.TABLE[id]
+
+
+def _saveMap(w, catalog, match, playerIndexes):
+    mapModel = match.map
+    w.write('B', len(mapModel.tiles))
+    for coords, tile in mapModel.tiles.items():
+        w.write('hhBB', coords.x, coords.y, catalog.tileIndexes[tile.id], tile.orientation)
+    w.write('H', len(mapModel.sites))
+    for coords, site in mapModel.sites.items():
+        w.write('hhB', coords.x, coords.y, playerIndexes[site.owner])
+        w.writeArray('H', [_enemyId(enemy) for enemy in site.enemies])
+    w.write('B', len(mapModel.terrainCosts))
+    for terrain, cost in mapModel.terrainCosts.items():
+        w.write('BB', terrain.value, cost)
+    tilePile = mapModel.tilePile
+    w.writeArray('B', [catalog.tileIndexes[tile.id] for tile in tilePile._pile])
+    w.write('3B', *tilePile.counts)
+    
+    
+def _loadMap(r, catalog, match):
+    mapModel = match.map
+    for _ in range(r.readOne('B')):
+        x, y, id, orientation = r.read('hhBB')
+        mapModel.tiles[HexCoords(x, y)] = Tile(catalog.tileIds[id], orientation)
+    for _ in range(r.readOne('H')):
+        x, y, owner = r.read('hhB')
+        coords = HexCoords(x, y)
+        tileCoords = basemap.tileCenter(coords)
+        tile = mapModel.tiles[tileCoords]
+        site = sites.create(tile.siteAt(coords - tileCoords), match, coords,
+                            tile.siteDataAt(coords - tileCoords))
+        site.owner = match.players[owner] if owner != _NONE else None
+        site.enemies = [_enemy(id) for id in r.readArray('H')]
+        mapModel.sites[coords] = site
+    for _ in range(r.readOne('B')):
+        terrain, cost = r.read('BB')
+        mapModel.terrainCosts[Terrain(terrain)] = cost
+    # Creating a TilePile draws from the random stream, which is restored afterwards
+    tilePile = map.TilePile(0, 0, 0, match.random.tiles)
+    tilePile._pile = [Tile(catalog.tileIds[id]) for id in r.readArray('B')]
+    tilePile.counts = list(r.read('3B'))
+    mapModel.tilePile = tilePile
+    
+
+def _saveEffect(w, effect):
+    tag = _EFFECT_TYPES.index(type(effect))
+    w.write('B', tag)
+    if isinstance(effect, effects.AttackPoints):
+        w.write('hBB', effect.points, effect.element.value, effect.range.value)
+    elif isinstance(effect, effects.BlockPoints):
+        w.write('hB', effect.points, effect.element.value)
+    elif isinstance(effect, effects.PointsEffect):
+        w.write('h', effect.points)
+    elif isinstance(effect, effects.ManaTokens):
+        w.write('6B', *(effect[color] for color in Mana))
+    elif isinstance(effect, effects.TerrainCostsOverwrite):
+        w.write('B', len(effect.newBaseCosts))
+        for terrain, cost in effect.newBaseCosts.items():
+            w.write('BB', terrain.value, cost)
+        reductions = [(terrain, amount, minimum) for terrain, tuples in effect.costReductions.items()
+                      for amount, minimum in tuples]
+        w.write('B', len(reductions))
+        for terrain, amount, minimum in reductions:
+            w.write('BBB', terrain.value, amount, minimum)
+    elif isinstance(effect, effects.ArmorReduction):
+        w.write('B', effect.amount)
+    elif isinstance(effect, effects.Concentration):
+        w.write('B', effect.extra)
+    
+    
+def _loadEffect(r):
+    cls = _EFFECT_TYPES[r.readOne('B')]
+    if cls is effects.AttackPoints:
+        points, element, attackRange = r.read('hBB')
+        return cls(points, Element(element), AttackRange(attackRange))
+    elif cls is effects.BlockPoints:
+        points, element = r.read('hB')
+        return cls(points, Element(element))
+    elif issubclass(cls, effects.PointsEffect):
+        return cls(r.readOne('h'))
+    elif cls is effects.ManaTokens:
+        return cls(dict(zip(Mana, r.read('6B'))))
+    elif cls is effects.TerrainCostsOverwrite:
+        effect = cls()
+        for _ in range(r.readOne('B')):
+            terrain, cost = r.read('BB')
+            effect.newBaseCosts[Terrain(terrain)] = cost
+        for _ in range(r.readOne('B')):
+            terrain, amount, minimum = r.read('BBB')
+            effect.costReductions[Terrain(terrain)].append((amount, minimum))
+        return effect
+    elif cls is effects.ArmorReduction or cls is effects.Concentration:
+        return cls(r.readOne('B'))
+    else: return cls()
+    
+    
+def _saveCombat(w, catalog, match):
+    c = match.combat
+    w.write('?B', c.effectsPlayed, c.woundsAssignedToHero)
+    w.write('B', len(c.enemies))
+    for enemy in c.enemies:
+        w.write('HHhh????B', enemy.enemy.index,
+                enemy.summoned.index if enemy.summoned is not None else _NO_ENEMY,
+                enemy.site.coords.x, enemy.site.coords.y,
+                enemy.isProvokable, enemy.isAlive, enemy.isSelected, enemy.isBlocked, enemy.damage)
+    w.write('B', len(c.rewards))
+    for reward in c.rewards:
+        w.write('BBB', reward.type.value, reward.count, len(reward.items))
+        for item in reward.items:
+            if isinstance(item, Mana):
+                w.write('BH', _ITEM_MANA, item.value)
+            elif any(item is unit for unit in match.shop.units):
+                # unit rewards refer to the units in the shop
+                index = next(i for i, unit in enumerate(match.shop.units) if unit is item)
+                w.write('BH', _ITEM_SHOP_UNIT, index)
+            else: w.write('BH', _ITEM_CARD, catalog.assetIds[type(item)])
+    w.write('B', c.rewards.index(c.currentReward) if c.currentReward is not None else _NONE)
+    
+    
+def _loadCombat(r, catalog, match):
+    c = match.combat
+    effectsPlayed, woundsAssignedToHero = r.read('?B')
+    _setValue(c, 'effectsPlayed', effectsPlayed)
+    _setValue(c, 'woundsAssignedToHero', woundsAssignedToHero)
+    enemyList = []
+    for _ in range(r.readOne('B')):
+        enemy, summoned, x, y, isProvokable, isAlive, isSelected, isBlocked, damage = r.read('HHhh????B')
+        enemy = combat.EnemyInCombat(enemies.TABLE[enemy], match.map.sites[HexCoords(x, y)], isProvokable,
+                                     enemies.TABLE[summoned] if summoned != _NO_ENEMY else None)
+        enemy.isAlive = isAlive
+        enemy.isSelected = isSelected
+        enemy.isBlocked = isBlocked
+        enemy.damage = damage
+        enemyList.append(enemy)
+    _setList(c, 'enemies', enemyList)
+    rewards = []
+    for _ in range(r.readOne('B')):
+        rewardType, count, itemCount = r.read('BBB')
+        reward = CombatReward(CombatRewardType(rewardType), count)
+        items = []
+        for _ in range(itemCount):
+            kind, value = r.read('BH')
+            if kind == _ITEM_MANA:
+                items.append(Mana(value))
+            elif kind == _ITEM_SHOP_UNIT:
+                items.append(match.shop.units[value])
+            else: items.append(catalog.assetClasses[value]())
+        reward.items = tuple(items)
+        rewards.append(reward)
+    _setList(c, 'rewards', rewards)
+    currentReward = r.readOne('B')
+    _setValue(c, 'currentReward', rewards[currentReward] if currentReward != _NONE else None)
+    
+    
+def _saveAction(w, match, action):
+    w.writeString(action.id)
+    w.writeString(action.title)
+    owner = getattr(action.method, '__self__', None)
+    if owner is match:
+        w.write('B', _ACTION_MATCH)
+    elif isinstance(owner, sites.SiteOnMap):
+        w.write('Bhh', _ACTION_SITE, owner.coords.x, owner.coords.y)
+    else:
+        w.write('B', _ACTION_DERIVED)
+        return
+    w.writeString(action.method.__name__)
+    
+
+def _loadAction(r):
+    id, title = r.readString(), r.readString()
+    kind = r.readOne('B')
+    coords = HexCoords(*r.read('hh')) if kind == _ACTION_SITE else None
+    methodName = r.readString() if kind != _ACTION_DERIVED else None
+    return id, title, kind, coords, methodName
+    
+    
+def _restoreActions(match, actions):
+    """Restore the action list. Most actions are derived from the state by updateActions. Actions which
+    were added in other places (e.g. by a site during an interaction) are looked up by method name."""
+    if match.state is None or len(match.map.persons) == 0:
+        return
+    match.updateActions()
+    for id, title, kind, coords, methodName in actions:
+        if match.actions.find(id) is None and kind != _ACTION_DERIVED:
+            owner = match if kind == _ACTION_MATCH else match.map.sites[coords]
+            match.actions.add(id, title, getattr(owner, methodName))
@@ -0,0 +1,296 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Monte Carlo tree search (MCTS) for the actions of a player's turn. The search applies actions to the
+match itself and rolls them back using the undo stack (see rollback), so that no copies of the match are
+necessary:
+
+    >>> result = search.search(match, player, seconds=1)
+    >>> result.nodesPerSecond
+    2345.6
+    >>> result.bestAction(match, player)()
+
+Hidden information is handled by determinization (information set MCTS): Each iteration reshuffles the
+player's draw pile and uses fresh random streams, so that enemies revealed and dice rolled during the
+iteration differ from the actual match. The tree is keyed by moves (action name and encoded arguments, see
+core.actionlog) and each child counts how often it was available. The horizon is the current turn: Ending
+the turn is a terminal move, after which the position is scored by evaluate.
+
+With *workers* > 1 the search runs root-parallel: Each worker process loads a copy of the match (see
+core.savegame), searches with its own seed and the root statistics of all workers are merged.
+"""
+
+import contextlib, math, multiprocessing, os, random, time
+
+from mageknight.data import * # @UnusedWildImport
+from . import actionlog, decisions, randomstreams, savegame
+
+
+@contextlib.contextmanager
+def rollback(match, seed=None, decisionProvider=None):
+    """Context manager: Everything done to *match* inside the with-block is undone when the block is left.
+    The block runs in a macro of the undo stack which is aborted at the end; revealing new information does
+    not clear the stack meanwhile. Actions executed in the block are removed from the action log again.
+    If *seed* is given, the match uses new random streams with this seed during the block. If
+    *decisionProvider* is given, it answers the questions of all players during the block."""
+    stack = match.stack
+    randomStreams = match.random
+    providers = dict(match._decisionProviders)
+    logLength = len(match.actionLog.entries)
+    match.searching += 1
+    macro = stack.beginMacro()
+    try:
+        if seed is not None:
+            match.random = randomstreams.RandomStreams(seed)
+        if decisionProvider is not None:
+            for player in match.players:
+                match.setDecisionProvider(player, decisionProvider)
+        yield
+    finally:
+        stack.abortMacro(macro)
+        match.random = randomStreams
+        match._decisionProviders = providers
+        for player, provider in providers.items():
+            provider.match, provider.player = match, player
+        del match.actionLog.entries[logLength:]
+        match.searching -= 1
+
+
+def evaluate(match, player):
+    """Heuristic value of the current position for *player*: Fame, plus bonuses for reputation, units,
+    crystals, the explored map and cards in the hand, minus penalties for wounds."""
+    wounds = player.handCards.countWounds()
+    return (player.fame + player.reputation / 2 + 4 * len(player.units) + sum(player.crystals.values())
+            + len(match.map.tiles) + (len(player.handCards) - wounds) / 4 - 2 * wounds)
+
+
+def isEndTurn(action):
+    """Return whether *action* (as returned by Match.legalActions) ends the turn."""
+    return action.func.__name__ == 'activateAction' and action.args[1] == 'endturn'
+
+
+def moveKey(match, player, action):
+    """Return a hashable key for *action* (as returned by Match.legalActions) which identifies the move
+    in any determinization of the same position."""
+    return (action.func.__name__,) + tuple(_freeze(arg)
+                                           for arg in actionlog.encodeArgs(match, player, action.args[1:]))
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def moves(match, player):
+    """Return the moves of *player* as list of (key, action)-tuples (see moveKey)."""
+    return [(moveKey(match, player, action), action) for action in match.legalActions(player)
+            # the explore state can only be left by exploring
+            if not (action.func.__name__ == 'activateAction' and action.args[1] == 'explore'
+                    and match.effects.movePoints < 2)]
+
+
+class SearchResult:
+    """Result of a search: *moves* maps the keys of the moves at the root to [visits, total value]. Also
+    stores the number of iterations, the number of nodes (actions executed) and the time used."""
+    def __init__(self):
+        self.moves = {}
+        self.iterations = 0
+        self.nodes = 0
+        self.seconds = 0.
+        
+    @property
+    def nodesPerSecond(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.
+    
+    @property
+    def iterationsPerSecond(self):
+        return self.iterations / self.seconds if self.seconds > 0 else 0.
+    
+    def bestMove(self):
+        """Return the key of the most visited move (ties are broken by the mean value) or None."""
+        if len(self.moves) == 0:
+            return None
+        return max(self.moves, key=lambda key: (self.moves[key][0], self.moves[key][1] / self.moves[key][0]))
+    
+    def bestAction(self, match, player):
+        """Return the action (from Match.legalActions) of the best move, or None."""
+        best = self.bestMove()
+        for key, action in moves(match, player):
+            if key == best:
+                return action
+        return None
+    
+    def merge(self, other):
+        """Add the statistics of *other* (a search of the same position) to this result. The time is the
+        maximum of both (they ran in parallel)."""
+        for key, (visits, value) in other.moves.items():
+            stats = self.moves.setdefault(key, [0, 0.])
+            stats[0] += visits
+            stats[1] += value
+        self.iterations += other.iterations
+        self.nodes += other.nodes
+        self.seconds = max(self.seconds, other.seconds)
+        
+    def __repr__(self):
+        return 'SearchResult({} iterations, {} nodes, {:.0f} nodes/s, best={})'.format(
+                    self.iterations, self.nodes, self.nodesPerSecond, self.bestMove())
+    
+    
+class _Node:
+    """Node of the search tree. *availability* counts the iterations in which the move leading to this
+    node was legal."""
+    __slots__ = ('children', 'visits', 'value', 'availability')
+    
+    def __init__(self):
+        self.children = {}
+        self.visits = 0
+        self.value = 0.
+        self.availability = 1
+        
+        
+class Search:
+    """Information set MCTS for *player*, who must be the current player of *match*. *exploration* is
+    the UCT constant (values are differences of evaluate), *rolloutDepth* limits the number of random
+    actions after a new node has been expanded."""
+    def __init__(self, match, player, rng=None, exploration=2., rolloutDepth=20, evaluate=evaluate):
+        self.match = match
+        self.player = player
+        self.rng = rng if rng is not None else random.Random()
+        self.exploration = exploration
+        self.rolloutDepth = rolloutDepth
+        self.evaluate = evaluate
+        self.root = _Node()
+        self.result = SearchResult()
+        self._rootValue = evaluate(match, player)
+        self._turn = match.turnNumber
+        
+    def run(self, iterations=None, seconds=None):
+        """Run the given number of iterations or until *seconds* have passed (at least one of both must
+        be given) and return the SearchResult."""
+        if iterations is None and seconds is None:
+            raise ValueError("Search needs an iteration or time budget.")
+        start = time.perf_counter()
+        deadline = start + seconds if seconds is not None else None
+        done = 0
+        while (iterations is None or done < iterations) \
+                and (deadline is None or time.perf_counter() < deadline):
+            self.iterate()
+            done += 1
+        self.result.seconds += time.perf_counter() - start
+        self.result.iterations += done
+        self.result.moves = {key: [child.visits, child.value] for key, child in self.root.children.items()}
+        return self.result
+        
+    def iterate(self):
+        """Run a single iteration: select and expand in a new determinization, play a random rollout and
+        backpropagate its value."""
+        match, player = self.match, self.player
+        with rollback(match, self.rng.getrandbits(64), decisions.RandomDecisionProvider(self.rng)):
+            player.drawPile.shuffle(self.rng)
+            node = self.root
+            path = [node]
+            terminal = False
+            while not terminal:
+                available = moves(match, player) if not self._isTerminal() else []
+                if len(available) == 0:
+                    terminal = True
+                    break
+                untried = []
+                for key, action in available:
+                    child = node.children.get(key)
+                    if child is None:
+                        untried.append((key, action))
+                    else: child.availability += 1
+                if len(untried) > 0:
+                    key, action = self.rng.choice(untried)
+                    node.children[key] = child = _Node()
+                    path.append(child)
+                    terminal = not self._apply(action)
+                    break
+                key, action = max(available, key=lambda move: self._uct(node.children[move[0]]))
+                node = node.children[key]
+                path.append(node)
+                terminal = not self._apply(action)
+            if not terminal:
+                self._rollout()
+            value = self.evaluate(match, player) - self._rootValue
+        for node in path:
+            node.visits += 1
+            node.value += value
+            
+    def _uct(self, node):
+        if node.visits == 0:
+            return math.inf
+        return node.value / node.visits \
+                + self.exploration * math.sqrt(math.log(node.availability) / node.visits)
+    
+    def _isTerminal(self):
+        match = self.match
+        return match.turnNumber != self._turn or match.currentPlayer is not self.player \
+                or match.state in (State.endOfTurn, State.gameEnd)
+        
+    def _apply(self, action):
+        """Execute *action* unless it ends the turn. Return whether the search may continue afterwards."""
+        if isEndTurn(action):
+            return False
+        self.result.nodes += 1
+        return action() is not False and not self._isTerminal()
+    
+    def _rollout(self):
+        for _ in range(self.rolloutDepth):
+            available = moves(self.match, self.player)
+            if len(available) == 0 or not self._apply(self.rng.choice(available)[1]):
+                return
+            
+            
+def search(match, player, iterations=None, seconds=None, workers=1, seed=None, pool=None, **options):
+    """Search the best move of *player* (see Search) and return the SearchResult. Budgets are given by
+    *iterations* (total over all workers) and/or *seconds*; by default 100 iterations are run. With
+    *workers* > 1 the search runs in separate processes, using *pool* (a multiprocessing.Pool) if given.
+    Further keyword arguments are passed to Search."""
+    if iterations is None and seconds is None:
+        iterations = 100
+    rng = random.Random(seed)
+    if workers <= 1:
+        return Search(match, player, rng, **options).run(iterations, seconds)
+    
+    data = savegame.save(match)
+    index = match.players.index(player)
+    tasks = [(data, index, iterations // workers + (i < iterations % workers) if iterations is not None
+              else None, seconds, rng.getrandbits(64), options) for i in range(workers)]
+    if pool is None:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_searchWorker, tasks)
+    else: results = pool.map(_searchWorker, tasks)
+    result = SearchResult()
+    for other in results:
+        result.merge(other)
+    return result
+
+
+def _searchWorker(task):
+    """Run a search in a worker process on a copy of the match."""
+    data, index, iterations, seconds, seed, options = task
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        match = savegame.load(data)
+        return Search(match, match.players[index], random.Random(seed), **options).run(iterations, seconds)
@@ -18,7 +18,6 @@
 # 
 # You should have received a copy of the GNU General Public License
 # 
-import random
 
 from PyQt5 import QtCore
 
@@ -67,7 +66,7 @@ class Shop(AttributeObject):
         shop.eliteUnitsPile = assets.EliteUnit.all()
         for pile in [shop.advancedActionsPile, shop.spellsPile, shop.artifactsPile,
                      shop.regularUnitsPile, shop.eliteUnitsPile]:
-            random.shuffle(pile)
+            match.random.decks.shuffle(pile)
         return shop
         
     def refreshUnits(self):
@@ -76,7 +75,7 @@ class Shop(AttributeObject):
         del self.regularUnitsPile[-unitCount:]
     
     def revealAdvancedAction(self):
-        self.stack.revealNewInformation()
+        self.match.revealNewInformation()
         if len(self.advancedActions) >= 3 or len(self.advancedActionsPile) == 0:
             raise InvalidAction("Cannot reveal another advanced action")
         action = self.advancedActionsPile.pop()
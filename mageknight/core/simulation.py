@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Monte Carlo simulation of combats against enemies that have not been revealed yet. For example:
+
+    >>> result = simulation.simulateSite(match, player, site, samples=5000)
+    >>> result.winProbability
+    0.62
+
+The simulator draws random enemy tokens from the remaining enemy piles and evaluates the player's current
+hand, mana and units against each draw. It works on a snapshot of the player's resources (CombatResources)
+and of the piles and does not touch the match.
+Draws are batched: Identical draws are evaluated only once, so the cost of a simulation depends on the
+number of distinct enemy combinations rather than on the number of samples.
+
+The evaluation follows the combat rules in core.combat: For each enemy it considers killing it in the
+ranged attack phase, blocking it, killing it in the attack phase or just taking its damage. It then checks
+with an exact search whether the cards (played basic, strong or sideways) and the available mana suffice.
+Damage is assigned using the damageplanner. Some simplifications apply: Attacks are always directed at a
+single enemy, cards with complicated effects are only considered with the effects listed in their
+options (see assets.ActionCard) and unit abilities are not used (units only absorb damage).
+"""
+
+import collections, itertools, random
+
+from mageknight.data import * # @UnusedWildImport
+from mageknight.data import enemies
+from . import effects, sites, assets, damageplanner
+
+# Fates of an enemy in a combat plan
+RANGED_KILL, BLOCK_KILL, KILL, BLOCK, NOTHING = range(5)
+FATES = (RANGED_KILL, BLOCK_KILL, KILL, BLOCK, NOTHING)
+
+# Bucket types: what a group of card effects is used for
+_RANGED, _BLOCK, _MELEE = range(3)
+
+
+class CombatResources:
+    """Snapshot of everything a player can use in a combat:
+        - cards: list with one entry per hand card. Each entry is a list of (effect, color)-tuples listing
+          the combat effects the card can produce. *color* is the mana that must be paid or None.
+        - mana: list of sets of Mana. Each set represents one mana (token, crystal or die) and contains the
+          colors it can pay.
+        - units: units that can absorb damage,
+        - armor, cardLimit, woundsAssignedToHero: see damageplanner.DamagePlanner.
+    """
+    def __init__(self, cards, mana, units, armor, cardLimit, woundsAssignedToHero=0):
+        self.cards = cards
+        self.mana = mana
+        self.units = units
+        self.armor = armor
+        self.cardLimit = cardLimit
+        self.woundsAssignedToHero = woundsAssignedToHero
+
+    @staticmethod
+    def fromPlayer(match, player, unitsAllowed=True, nightRules=None):
+        """Collect the resources of *player* in *match*. If *nightRules* is None, night rules apply
+        depending on the current round."""
+        if nightRules is None:
+            nightRules = match.nightRulesApply()
+
+        cards = []
+        sideways = [(effect, None) for effect in match.sidewaysEffects()]
+        for card in player.handCards:
+            if card.isWound:
+                continue
+            options = list(sideways)
+            if isinstance(card, assets.ActionCard):
+                options.extend((effect, None) for effect in card.basicOptions)
+                options.extend((effect, card.color) for effect in card.strongOptions)
+            options = [(e, c) for e, c in options
+                       if isinstance(e, (effects.AttackPoints, effects.BlockPoints))]
+            cards.append(options)
+
+        mana = []
+        if player is match.currentPlayer:
+            tokens = match.effects.find(effects.ManaTokens)
+            if tokens is not None:
+                for color in Mana:
+                    mana.extend(_payableColors(color, nightRules) for _ in range(tokens[color]))
+            if match.source.limit > 0:
+                # only a single die may be used
+                die = set()
+                for color, count in match.source.dice.items():
+                    if count > 0:
+                        die.update(_payableColors(color, nightRules))
+                mana.append(frozenset(die))
+        for color in Mana.basicColors():
+            mana.extend(frozenset([color]) for _ in range(player.crystals[color]))
+        mana = [m for m in mana if len(m) > 0]
+
+        units = [unit for unit in player.units if not unit.isWounded] if unitsAllowed else []
+        return CombatResources(cards, mana, units, player.armor, player.cardLimit)
+
+
+def _payableColors(color, nightRules):
+    """Return the basic colors that can be paid using a mana of the given color (strong effects of cards
+    always require basic colors)."""
+    if color.isBasic:
+        return frozenset([color])
+    elif color is Mana.gold and not nightRules:
+        return frozenset(Mana.basicColors())
+    else: return frozenset()
+
+
+class CombatOutcome:
+    """The result of a single simulated combat: the number of enemies and of killed enemies, the fame
+    gained and the DamageOutcome (wounds, knock out...)."""
+    __slots__ = ('enemies', 'killed', 'fame', 'damage')
+
+    def __init__(self, enemies, killed, fame, damage):
+        self.enemies = enemies
+        self.killed = killed
+        self.fame = fame
+        self.damage = damage
+
+    @property
+    def won(self):
+        return self.killed == self.enemies
+
+    def __repr__(self):
+        return 'CombatOutcome(killed={}/{}, fame={}, {})'.format(self.killed, self.enemies, self.fame,
+                                                                 self.damage)
+
+
+def defaultKey(outcome):
+    """Default preference of outcomes (bigger is better): Win the combat, receive few wounds, gain much
+    fame."""
+    damage = outcome.damage
+    return (outcome.won, -damage.handWounds, outcome.fame, -damage.knockedOut, -damage.unitsDestroyed,
+            -damage.unitWounds, -damage.discardWounds)
+
+
+class SimulationResult:
+    """Aggregated outcomes of a simulation. Distributions are dicts mapping values to probabilities."""
+    def __init__(self):
+        self.samples = 0
+        self.wins = 0
+        self.knockOuts = 0
+        self._wounds = collections.Counter()
+        self._fame = collections.Counter()
+
+    def add(self, outcome, count=1):
+        """Add *count* samples with the given CombatOutcome."""
+        self.samples += count
+        if outcome.won:
+            self.wins += count
+        if outcome.damage.knockedOut:
+            self.knockOuts += count
+        self._wounds[outcome.damage.handWounds] += count
+        self._fame[outcome.fame] += count
+
+    def _distribution(self, counter):
+        return {value: count / self.samples for value, count in sorted(counter.items())}
+
+    @property
+    def winProbability(self):
+        return self.wins / self.samples if self.samples > 0 else 0
+
+    @property
+    def knockOutProbability(self):
+        return self.knockOuts / self.samples if self.samples > 0 else 0
+
+    @property
+    def woundDistribution(self):
+        """Distribution of the number of wounds received into the hand."""
+        return self._distribution(self._wounds)
+
+    @property
+    def fameDistribution(self):
+        return self._distribution(self._fame)
+
+    @property
+    def expectedWounds(self):
+        return sum(v * c for v, c in self._wounds.items()) / self.samples if self.samples > 0 else 0
+
+    @property
+    def expectedFame(self):
+        return sum(v * c for v, c in self._fame.items()) / self.samples if self.samples > 0 else 0
+
+    def __repr__(self):
+        return ('SimulationResult(samples={}, win={:.3f}, wounds={:.2f}, fame={:.2f})'
+                .format(self.samples, self.winProbability, self.expectedWounds, self.expectedFame))
+
+
+class _SimulatedEnemy:
+    """Minimal stand-in for EnemyInCombat as required by the damage planner."""
+    __slots__ = ('name', 'attack', 'damage', 'poison', 'paralyze')
+
+    def __init__(self, enemy, attacker):
+        # *attacker* is the enemy whose attack is used (differs from *enemy* for summoners)
+        self.name = enemy.name
+        self.attack = attacker.attack
+        self.damage = attacker.attack.value * (2 if attacker.brutal else 1)
+        self.poison = attacker.poison
+        self.paralyze = attacker.paralyze
+
+
+class CombatSimulator:
+    """Simulate combats of a player with the given CombatResources against random enemies. *key* is used
+    to choose the best plan for each draw (see defaultKey). *rng* is the random number generator used to
+    draw enemies (defaults to the random module). *piles* maps enemy categories to the tokens in the draw
+    pile and in the discard pile (see EnemyPiles.composition). Enemies are drawn like EnemyPiles.draw
+    does: from the draw pile and, when it is exhausted, from the discard pile. Categories missing in
+    *piles* (default: all) are drawn from the complete set of tokens.
+    """
+    def __init__(self, resources, key=defaultKey, rng=None, piles=None):
+        self.resources = resources
+        self.key = key
+        self.rng = rng if rng is not None else random
+        self._pools = {} # category -> (draw pile + discard pile, size of draw pile)
+        if piles is not None:
+            for category, (drawPile, discardPile) in piles.items():
+                self._pools[category] = (drawPile + discardPile, len(drawPile))
+        self._outcomes = {}
+
+    def simulate(self, categories, known=tuple(), fortified=False, samples=1000):
+        """Simulate *samples* combats against enemies drawn from *categories* (one enemy per entry)
+        and the already known enemies in *known*. *fortified* specifies whether the combat takes place at
+        a fortified site. Return a SimulationResult.
+        """
+        draws = collections.Counter(self._draw(categories, known) for _ in range(samples))
+        result = SimulationResult()
+        for draw, count in draws.items():
+            result.add(self.evaluate(draw, fortified), count)
+        return result
+
+    def _draw(self, categories, known):
+        """Draw random enemies. Return a sorted tuple of (enemy, summoned enemy or None)-tuples."""
+        taken = {} # category -> positions in its pool drawn in this sample
+        drawn = list(known)
+        for category in categories:
+            enemy = self._take(category, taken)
+            if enemy is not None:
+                drawn.append(enemy)
+        draw = []
+        for enemy in drawn:
+            if enemy.attack.element is Element.summoner:
+                draw.append((enemy, self._take(enemy.attack.value, taken)))
+            else: draw.append((enemy, None))
+        draw.sort(key=lambda t: (t[0].index, t[1].index if t[1] is not None else -1))
+        return tuple(draw)
+
+    def _take(self, category, taken):
+        """Draw a token of *category* which has not been drawn in this sample (see _draw). Return None if
+        all tokens are in use."""
+        if category not in self._pools:
+            tokens = enemies.TABLE.tokens(category)
+            self._pools[category] = (tokens, len(tokens))
+        pool, drawPileSize = self._pools[category]
+        used = taken.setdefault(category, set())
+        if len(used) == len(pool):
+            return None
+        start, end = (0, drawPileSize) if len(used) < drawPileSize else (drawPileSize, len(pool))
+        while True:
+            position = self.rng.randrange(start, end)
+            if position not in used:
+                used.add(position)
+                return pool[position]
+        
+    def evaluate(self, draw, fortified=False):
+        """Return the best CombatOutcome for the given draw (see _draw)."""
+        # Enemies are flyweights, so draws can be compared directly
+        key = (draw, fortified)
+        if key not in self._outcomes:
+            self._outcomes[key] = self._evaluate(draw, fortified)
+        return self._outcomes[key]
+
+    def _evaluate(self, draw, fortified):
+        candidates = []
+        for fates in itertools.product(FATES, repeat=len(draw)):
+            outcome = self._outcome(draw, fates)
+            if outcome is not None:
+                candidates.append((outcome, fates))
+        candidates.sort(key=lambda t: self.key(t[0]), reverse=True)
+        for outcome, fates in candidates:
+            if self._feasible(draw, fates, fortified):
+                return outcome
+        assert False # the plan doing nothing is always feasible
+
+    def _outcome(self, draw, fates):
+        """Return the CombatOutcome if the enemies in *draw* meet the given fates, or None if this is
+        impossible because the hero is knocked out before the attack phase."""
+        attackers = [_SimulatedEnemy(enemy, summoned if summoned is not None else enemy)
+                     for (enemy, summoned), fate in zip(draw, fates) if fate in (KILL, NOTHING)]
+        melee = any(fate in (KILL, BLOCK_KILL) for fate in fates)
+        res = self.resources
+        planner = damageplanner.DamagePlanner(attackers, res.units, res.armor,
+                                              res.woundsAssignedToHero, res.cardLimit)
+        if melee: # a knocked out hero must discard all cards before the attack phase
+            damage = planner.plan(lambda o: (o.knockedOut, ) + damageplanner.defaultCost(o)).outcome
+            if damage.knockedOut:
+                return None
+        else: damage = planner.plan().outcome
+        killed = [enemy for (enemy, _), fate in zip(draw, fates) if fate in (RANGED_KILL, BLOCK_KILL, KILL)]
+        return CombatOutcome(len(draw), len(killed), sum(enemy.fame for enemy in killed), damage)
+
+    def _buckets(self, draw, fates, fortified):
+        """Return a list of (type, enemy, attacker, halves) buckets which must be filled with card effects
+        to realize *fates*. *halves* is the number of necessary points, doubled so that inefficient
+        points can be counted as a single half. Return None if the fates are impossible."""
+        buckets = []
+        for (enemy, summoned), fate in zip(draw, fates):
+            attacker = summoned if summoned is not None else enemy
+            if fate == RANGED_KILL:
+                if int(fortified) + int(enemy.fortified) >= 2:
+                    return None
+                buckets.append((_RANGED, enemy, attacker, 2*enemy.armor))
+            if fate in (BLOCK_KILL, BLOCK):
+                points = attacker.attack.value * (2 if attacker.swift else 1)
+                buckets.append((_BLOCK, enemy, attacker, 2*points))
+            if fate in (BLOCK_KILL, KILL):
+                buckets.append((_MELEE, enemy, attacker, 2*enemy.armor))
+        return buckets
+
+    @staticmethod
+    def _contribution(effect, bucket, fortified):
+        """Return the number of halves that *effect* contributes to *bucket*."""
+        type, enemy, attacker, _ = bucket
+        if type == _BLOCK:
+            if not isinstance(effect, effects.BlockPoints):
+                return 0
+            efficient = effect.element.mask & attacker.attack.element.efficientBlocks
+        else:
+            if not isinstance(effect, effects.AttackPoints):
+                return 0
+            if type == _RANGED:
+                if effect.range == AttackRange.normal:
+                    return 0
+                if (fortified or enemy.fortified) and effect.range != AttackRange.siege:
+                    return 0
+            efficient = not effect.element.mask & enemy.resistanceMask
+        return 2*effect.points if efficient else effect.points
+
+    def _feasible(self, draw, fates, fortified):
+        """Return whether the player's cards and mana suffice to realize *fates*."""
+        buckets = self._buckets(draw, fates, fortified)
+        if buckets is None:
+            return False
+        if len(buckets) == 0:
+            return True
+        # For each card: list of (bucket index, halves, color)
+        cards = []
+        for options in self.resources.cards:
+            contributions = []
+            for effect, color in options:
+                for i, bucket in enumerate(buckets):
+                    halves = self._contribution(effect, bucket, fortified)
+                    if halves > 0:
+                        contributions.append((i, halves, color))
+            if len(contributions) > 0:
+                cards.append(contributions)
+
+        mana = self.resources.mana
+        memo = {}
+
+        def search(index, needs, manaMask):
+            if not any(needs):
+                return True
+            if index == len(cards):
+                return False
+            key = (index, needs, manaMask)
+            if key in memo:
+                return memo[key]
+            result = search(index+1, needs, manaMask) # don't use this card
+            for i, halves, color in cards[index]:
+                if result:
+                    break
+                if needs[i] == 0:
+                    continue
+                newNeeds = needs[:i] + (max(0, needs[i] - halves), ) + needs[i+1:]
+                if color is None:
+                    result = search(index+1, newNeeds, manaMask)
+                else:
+                    tried = set()
+                    for k, payable in enumerate(mana):
+                        if manaMask & (1 << k) and color in payable and payable not in tried:
+                            tried.add(payable)
+                            if search(index+1, newNeeds, manaMask & ~(1 << k)):
+                                result = True
+                                break
+            memo[key] = result
+            return result
+
+        return search(0, tuple(bucket[3] for bucket in buckets), (1 << len(mana)) - 1)
+
+
+def simulateSite(match, player, site, samples=1000, key=defaultKey, rng=None):
+    """Simulate a combat of *player* at *site* and return a SimulationResult. Enemies which are already
+    revealed are used as they are, unknown enemies are drawn randomly from the enemy piles of the match."""
+    unitsAllowed = True
+    nightRules = None
+    fortified = isinstance(site, sites.FortifiedSite)
+    known = [e for e in site.enemies if not isinstance(e, UnknownEnemy)]
+    categories = [e.category for e in site.enemies if isinstance(e, UnknownEnemy)]
+    if isinstance(site, sites.AdventureSite):
+        unitsAllowed = site.unitsAllowed
+        nightRules = True if site.nightRules else None
+        if len(site.enemies) == 0:
+            categories = site.enemyCategories
+    resources = CombatResources.fromPlayer(match, player, unitsAllowed, nightRules)
+    piles = {category: match.enemyPiles.composition(category) for category in EnemyCategory}
+    simulator = CombatSimulator(resources, key, rng, piles)
+    return simulator.simulate(categories, known, fortified, samples)
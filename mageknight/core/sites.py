@@ -20,14 +20,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
-import random
-
 from PyQt5 import QtCore
 translate = QtCore.QCoreApplication.translate
 
 from mageknight.data import * # @UnusedWildImport
 from mageknight.core import effects 
-from mageknight.gui import dialogs
 
 
 def create(siteType, match, coords, data):
@@ -55,8 +52,15 @@ class SiteOnMap:
     
     def onEnemyKilled(self, match, player, enemy):
         match.map.removeEnemy(self, enemy)
+        match.enemyPiles.discard(enemy)
         player.fame += enemy.fame
         
+    def discardEnemies(self, match):
+        """Remove all enemies from this site and put them onto the discard piles."""
+        for enemy in self.enemies:
+            match.enemyPiles.discard(enemy)
+        match.map.setEnemies(self, [])
+        
 
 class FortifiedSite(SiteOnMap):
     def onEnter(self, match, player):
@@ -81,8 +85,19 @@ class FortifiedSite(SiteOnMap):
     
     
 class AdventureSite(SiteOnMap):
+    """Abstract base class for sites where enemies are drawn when the site is entered. Subclasses specify
+    the categories of these enemies in *enemyCategories* and whether units may take part in the combat and
+    night rules apply."""
+    enemyCategories = tuple()
+    unitsAllowed = True
+    nightRules = False
+    
+    def enter(self, match, player):
+        match.map.setEnemies(self, match.chooseEnemies(self.enemyCategories))
+        match.combat.start(self, unitsAllowed=self.unitsAllowed, nightRules=self.nightRules)
+    
     def updateActions(self, match, player):
-        if self.owner is None or self.canReenter:
+        if match.state is State.movement and (self.owner is None or self.canReenter):
             match.actions.add('enter', translate('sites', "Enter"), self.enter)
             
     def onCombatEnd(self, match, player):
@@ -93,7 +108,7 @@ class AdventureSite(SiteOnMap):
         else:
             # reentered
             # remove enemies so that new enemies are chosen at the next fight
-            match.map.setEnemies(self, [])
+            self.discardEnemies(match)
             
     def addReward(self):
         """Implemented in subclasses to add the reward. This is not called when the site is re-entered."""
@@ -129,13 +144,12 @@ class Draconum(SiteOnMap):
 class Dungeon(AdventureSite):
     type = Site.dungeon
     canReenter = True
-    
-    def enter(self, match, player):
-        match.map.setEnemies(self, match.chooseEnemies([EnemyCategory.dungeon]))
-        match.combat.start(self, unitsAllowed=False, nightRules=True)
+    enemyCategories = (EnemyCategory.dungeon, )
+    unitsAllowed = False
+    nightRules = True
         
     def addReward(self, match):
-        if random.randint(1,3) == 1:
+        if match.random.rewards.randint(1,3) == 1:
             match.combat.addReward(CombatReward(CombatRewardType.spell))
         else: match.combat.addReward(CombatReward(CombatRewardType.artifact))
         match.revealNewInformation()
@@ -172,14 +186,14 @@ class MagicalGlade(SiteOnMap):
         
     def onEndOfTurn(self, match, player):
         options = []
-        if any(card.isWound for card in player.handCards):
+        if player.handCards.countWounds() > 0:
             options.append(('hand', translate('sites', "Yes, from hand")))
-        if any(card.isWound for card in player.discardPile):
+        if player.discardPile.countWounds() > 0:
             options.append(('discardPile', translate('sites', "Yes, from discard pile")))
         
         if len(options) > 0:
             options.append(('no', translate('sites', "No")))
-            option = dialogs.choose(
+            option = match.decisions(player).choose(
                             options,
                             labelFunc = lambda t: t[1],
                             text = translate('sites', "Magical glade: Do you wish to discard a wound?"),
@@ -235,16 +249,13 @@ class Monastery(SiteOnMap):
             match.combat.addReward(CombatReward(CombatRewardType.artifact))
         else:
             # remove enemies so that new enemies are chosen at the next fight
-            match.map.setEnemies(self, [])
+            self.discardEnemies(match)
     
 
 class MonsterDen(AdventureSite):
     type = Site.monsterDen
     canReenter = False
-            
-    def enter(self, match, player):
-        match.map.setEnemies(self, match.chooseEnemies([EnemyCategory.dungeon]))
-        match.combat.start(self)
+    enemyCategories = (EnemyCategory.dungeon, )
         
     def addReward(self, match):
         match.combat.addReward(CombatReward(CombatRewardType.crystal, 2))
@@ -253,10 +264,7 @@ class MonsterDen(AdventureSite):
 class SpawningGrounds(AdventureSite):
     type = Site.spawningGrounds
     canReenter = False
-            
-    def enter(self, match, player):
-        match.map.setEnemies(self, match.chooseEnemies([EnemyCategory.dungeon, EnemyCategory.dungeon]))
-        match.combat.start(self)
+    enemyCategories = (EnemyCategory.dungeon, EnemyCategory.dungeon)
         
     def addReward(self, match):
         match.combat.addReward(CombatReward(CombatRewardType.crystal, 3))
@@ -266,10 +274,9 @@ class SpawningGrounds(AdventureSite):
 class Tomb(AdventureSite):
     type = Site.tomb
     canReenter = True
-    
-    def enter(self, match, player):
-        match.map.setEnemies(self, match.chooseEnemies([EnemyCategory.draconum]))
-        match.combat.start(self, unitsAllowed=False, nightRules=True)   
+    enemyCategories = (EnemyCategory.draconum, )
+    unitsAllowed = False
+    nightRules = True
          
     def addReward(self, match):
         match.combat.addReward(CombatReward(CombatRewardType.spell))
@@ -284,7 +291,7 @@ class Village(SiteOnMap):
         self.plundered = False
     
     def onBeginOfTurn(self, match, player):
-        if dialogs.ask(translate('sites', "Do you wish to plunder the village?")):
+        if match.decisions(player).ask(translate('sites', "Do you wish to plunder the village?")):
             player.drawCards(2)
             player.reputation -= 1
         
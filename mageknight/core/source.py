@@ -20,42 +20,65 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import functools, itertools, math
+
 from PyQt5 import QtCore
 
+from mageknight import stack
 from mageknight.attributes import * # @UnusedWildImport
 from mageknight.data import Mana, InvalidAction
 
 
 class ManaSource(AttributeObject):
-    """The mana source contains the mana dice available to all players. It behaves like a read-only list, so 
-    e.g. 'len(source)' and 'source[2]' work as expected. The additional attribute 'count' stores the initial
+    """The mana source contains the mana dice available to all players. The dice are stored as number of
+    dice per color (see 'dice' and 'countColor'), so that membership tests and taking dice do not depend on
+    the number of dice. Apart from this, the source behaves like a read-only list sorted by color, so e.g.
+    'len(source)' and 'source[2]' work as expected. The additional attribute 'count' stores the initial
     number of dice in the source (typically number of players + 2).
     """ 
     changed = QtCore.pyqtSignal()
-    _dice = ListAttribute(Mana, signal='changed')
-    limit = IntAttribute(default=1)
+    limit = IntAttribute(default=1, hashed=True)
         
     def __init__(self, match, count):
         super().__init__(match.stack)
+        self.zobrist = match.zobrist
         self.match = match
         self.count = count
+        self.dice = {color: 0 for color in Mana} # do not modify
+        self._length = 0
         
-    def shuffle(self):
-        """Shuffle all dice in the source."""
-        self._dice = [Mana.random() for _ in range(self.count)]
-        self.match.newInformationRevealed()
+    def roll(self, minBasic=0):
+        """Reroll all dice in the source, such that at least *minBasic* dice show a basic color. The result
+        is sampled directly from the distribution of rolls which satisfy this condition: First the number
+        of basic dice, then the colors of the basic and of the other dice."""
+        rng = self.match.random.dice
+        weights = _basicWeights(self.count, minBasic)
+        basic = rng.choices(range(minBasic, self.count+1), cum_weights=weights)[0]
+        dice = {color: 0 for color in Mana}
+        for _ in range(basic):
+            dice[rng.choice(Mana.basicColors())] += 1
+        for _ in range(self.count - basic):
+            dice[rng.choice((Mana.gold, Mana.black))] += 1
+        self.stack.push(stack.Call(self._setDice, dice),
+                        stack.Call(self._setDice, dict(self.dice)))
+        self.match.revealNewInformation()
     
     def reset(self):
         """Reset the source at the beginning of a new round."""
-        self.shuffle()
         # Rules: Source must be reshuffled if less than half of the dice show a basic color
-        while sum(1 if die.isBasic else 0 for die in self._dice) < self.count / 2:
-            self.shuffle()
+        self.roll(minBasic=math.ceil(self.count / 2))
         self.limit = 1        
 
+    def countColor(self, color):
+        """Return the number of dice of the given color."""
+        return self.dice[color]
+    
     def remove(self, color):
         """Remove a die from the source."""
-        self._dice.remove(color)
+        if self.dice[color] == 0:
+            raise ValueError("There is no {} die in the source.".format(color.name))
+        self.stack.push(stack.Call(self._addDie, color, -1),
+                        stack.Call(self._addDie, color, 1))
         
     def take(self, color):
         """Take a die from the source to pay a mana for the current player. Contrary to 'remove' this
@@ -68,21 +91,52 @@ class ManaSource(AttributeObject):
         if color == Mana.gold and self.match.nightRulesApply():
             raise InvalidAction("You must not use gold mana during night.")
         self.limit -= 1
-        self._dice.remove(color)
+        self.remove(color)
+        
+    def _addDie(self, color, delta):
+        self._updateHash(color, delta)
+        self.dice[color] += delta
+        self._length += delta
+        self.changed.emit()
+        
+    def _setDice(self, dice):
+        for color in Mana:
+            self._updateHash(color, dice[color] - self.dice[color])
+        self.dice.update(dice)
+        self._length = sum(dice.values())
+        self.changed.emit()
+    
+    def _updateHash(self, color, delta):
+        # Like Player.crystals, the hash contains a feature for the number of dice of each color
+        count = self.dice[color]
+        if delta != 0 and self.zobrist is not None:
+            if count > 0:
+                self.zobrist.remove(self, 'dice', color, count)
+            if count + delta > 0:
+                self.zobrist.add(self, 'dice', color, count + delta)
         
     # Methods required for a read-only list
     def __len__(self):
-        return len(self._dice)
+        return self._length
     
     def __getitem__(self, index):
-        return self._dice[index]
+        return list(self)[index]
     
     def __contains__(self, object):
-        return object in self._dice
+        return self.dice.get(object, 0) > 0
     
     def __iter__(self):
-        return iter(self._dice)
+        return itertools.chain.from_iterable(itertools.repeat(color, count)
+                                             for color, count in self.dice.items())
     
     def __str__(self):
-        return '[{}]'.format(', '.join(color.name for color in self._dice))
-    
\ No newline at end of file
+        return '[{}]'.format(', '.join(color.name for color in self))
+
+
+@functools.lru_cache()
+def _basicWeights(count, minBasic):
+    """Return the cumulative weights of rolling exactly k basic colors with *count* dice, for k from
+    *minBasic* to *count*. Each die shows a basic color with probability 4/6, so the weight of k is
+    binomial(count, k) * 4^k * 2^(count-k)."""
+    return list(itertools.accumulate(math.comb(count, k) * 4**k * 2**(count-k)
+                                     for k in range(minBasic, count+1)))
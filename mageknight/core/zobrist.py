@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Zobrist-style hashing of the rules-relevant state of a match, e.g. to detect transpositions in a
+search or to deduplicate positions:
+
+    >>> match.zobrist.value
+    13815330592386018339
+
+The hash is the sum (modulo 2**64) of a 64-bit key for each feature of the state, e.g. "Tovak has the
+card March in his hand" or "the mana source contains a red die". Because keys are added, not xor-ed,
+features may occur several times (two identical cards) and piles are hashed as multisets: The order of
+cards in a pile does not matter. Keys are derived from the features using a fixed hash function, so that
+hashes are comparable between processes and runs.
+
+The hash covers player positions, the cards in draw piles, hands and discard piles, units (including
+whether they are ready, wounded and protected), crystals, the level, fame, reputation, armor and card
+limit of each player, the round, the current player, the effect list, the dice in the source and how many
+of them may still be used, the enemies in combat (including whether they are alive, selected, blocked and
+provokable and their remaining damage), the wounds assigned to the hero in combat, whether effects have
+been played in the current combat phase, tiles, sites with their owners and enemies, the match state and
+whether the current player has acted. Attributes declared with hashed=True (see mageknight.attributes)
+are included automatically. The hash is updated in O(1) per change by the methods that actually change the
+state (which are the same for do, undo and redo), see e.g. attributes.UndoList and core.deck.Deck. Code
+that bypasses these methods (e.g. core.savegame) must call reset afterwards.
+"""
+
+import enum, functools
+
+from mageknight import attributes
+from mageknight.hexcoords import HexCoords
+from mageknight.data import UnknownEnemy
+from . import effects, player
+
+MASK = (1 << 64) - 1
+
+# Caches of keys by feature and by token
+_featureKeys = {}
+_tokenKeys = {}
+_MAX_FEATURE_KEYS = 1 << 16
+
+
+def token(value):
+    """Return a representation of *value* which is stable between processes: built from None, bools,
+    ints, strings and tuples. Objects are represented by their name (e.g. cards, units, enums) and
+    players by their hero (a hero can only be played by one player of a match)."""
+    try:
+        function = _tokenFunctions[type(value)]
+    except KeyError:
+        function = _tokenFunctions[type(value)] = _tokenFunction(type(value))
+    return function(value)
+
+
+def _tokenFunction(cls):
+    """Return the function computing tokens of instances of *cls*."""
+    if cls in (type(None), bool, int, str):
+        return lambda value: value
+    if issubclass(cls, HexCoords):
+        return lambda value: (value.x, value.y)
+    if issubclass(cls, (tuple, list)):
+        return lambda value: tuple(map(token, value))
+    if issubclass(cls, dict):
+        return lambda value: tuple(sorted((token(k), token(v)) for k, v in value.items()))
+    if issubclass(cls, player.Player):
+        return lambda value: value.hero.name
+    if issubclass(cls, effects.Effect):
+        return lambda value: (cls.__name__,) + token(vars(value))
+    if issubclass(cls, UnknownEnemy):
+        return lambda value: ('unknown', value.category.name)
+    if isinstance(getattr(cls, 'name', None), str): # cards and units
+        return lambda value, name=cls.name: name
+    if issubclass(cls, enum.Enum):
+        return lambda value: value.name
+    def function(value):
+        name = getattr(value, 'name', None)
+        return name if isinstance(name, str) else cls.__name__
+    return function
+
+
+# Maps types to the functions computing tokens of their instances
+_tokenFunctions = {}
+
+
+def key(*feature):
+    """Return the 64-bit key of a feature, given as tuple of values (see token)."""
+    # Computing tokens is the expensive part. Most features consist of immutable values and objects
+    # whose token never changes (cards, units, players), so their keys are cached by the feature itself.
+    try:
+        return _featureKeys[feature]
+    except KeyError:
+        k = _featureKeys[feature] = _tokenKey(token(feature))
+        if len(_featureKeys) > _MAX_FEATURE_KEYS: # do not keep cards of old matches alive forever
+            _featureKeys.clear()
+        return k
+    except TypeError: # unhashable values, e.g. effects
+        return _tokenKey(token(feature))
+    
+    
+def _tokenKey(token):
+    try:
+        return _tokenKeys[token]
+    except KeyError:
+        import hashlib # only needed for unhashable features, which are rare
+        digest = hashlib.blake2b(repr(token).encode('utf-8'), digest_size=8).digest()
+        k = _tokenKeys[token] = int.from_bytes(digest, 'little')
+        return k
+    
+
+class ZobristHash:
+    """The hash of the state of *match*. The current value is available as attribute 'value'."""
+    def __init__(self, match):
+        self.match = match
+        self.value = 0
+        
+    def add(self, *feature):
+        """Add a feature to the state."""
+        self.value = (self.value + key(*feature)) & MASK
+        
+    def remove(self, *feature):
+        """Remove a feature from the state."""
+        self.value = (self.value - key(*feature)) & MASK
+        
+    def reset(self):
+        """Recompute the hash from scratch."""
+        self.value = computeHash(self.match)
+        
+        
+def features(match):
+    """Yield all features of the current state of *match*. These are exactly the features which are added
+    and removed incrementally by the engine."""
+    for player in match.players:
+        yield from attributeFeatures(player)
+        for name in ('drawPile', 'handCards', 'discardPile'):
+            theList = getattr(player, name)
+            for item in theList:
+                yield (player, name) + theList.itemFeature(item)
+        for color, count in player.crystals.items():
+            if count > 0:
+                yield (player, 'crystals', color, count)
+    yield ('round', match.round.number, match.round.type)
+    if match.currentPlayer is not None:
+        yield ('currentPlayer', match.players.index(match.currentPlayer))
+    yield from attributeFeatures(match.source)
+    for color, count in match.source.dice.items():
+        if count > 0:
+            yield (match.source, 'dice', color, count)
+    yield from attributeFeatures(match.combat)
+    for effect in match.effects:
+        yield ('effect', effect)
+    map = match.map
+    for person, coords in map.persons.items():
+        yield ('person', person, coords)
+    for coords, tile in map.tiles.items():
+        yield ('tile', coords, tile.id)
+    for site in map.sites.values():
+        yield from siteFeatures(site)
+    if match.state is not None:
+        yield ('state', match.state)
+    if match.hasActed:
+        yield ('hasActed', )
+    
+    
+def attributeFeatures(obj):
+    """Yield the features of the attributes of *obj* which are declared with hashed=True (see
+    attributes.Attribute)."""
+    for attr in _hashedAttributes(type(obj)):
+        value = getattr(obj, attr.name)
+        if isinstance(attr, attributes.ListAttribute):
+            for item in value:
+                yield (obj, attr.name) + value.itemFeature(item)
+        else: yield (obj, attr.name, value)
+        
+        
+@functools.lru_cache(maxsize=None)
+def _hashedAttributes(cls):
+    return tuple(attr for c in cls.__mro__ for attr in vars(c).values()
+                 if isinstance(attr, attributes.Attribute) and attr.hashed)
+    
+    
+def siteFeatures(site):
+    """Yield the features of a site on the map."""
+    yield ('site', site.coords, site.type)
+    yield ('site', site.coords, 'owner', site.owner)
+    for enemy in site.enemies:
+        yield ('site', site.coords, 'enemy', enemy)
+
+
+def computeHash(match):
+    """Compute the hash of *match* from scratch."""
+    return sum(key(*feature) for feature in features(match)) & MASK
@@ -23,7 +23,7 @@
 import enum, random
 
 __all__ = ['InvalidAction', 'CancelAction', 'State', 'RoundType', 'Round', 'Mana',
-           'AttackRange', 'Element', 'EffectType', 'CombatReward', 'CombatRewardType']
+           'AttackRange', 'Element', 'elementMask', 'EffectType', 'CombatReward', 'CombatRewardType']
 
 
 class InvalidAction(Exception):
@@ -56,6 +56,7 @@ class State(enum.Enum):
     combatRewards = 16
     
     endOfTurn = 20
+    gameEnd = 30     # after the last round
     
     @staticmethod
     def combatStates():
@@ -91,8 +92,9 @@ class Mana(enum.Enum):
     black = 6
     
     @staticmethod
-    def random():
-        return Mana(random.randint(1, 6))
+    def random(rng=random):
+        """Return the color of a randomly rolled mana die. *rng* is the random number generator to use."""
+        return Mana(rng.randint(1, 6))
     
     @property
     def isBasic(self):
@@ -119,13 +121,22 @@ class AttackRange(enum.Enum):
 
 
 class Element(enum.Enum):
-    """The type of a block."""
+    """The type of a block. Sets of elements (e.g. resistances) are often stored as bitmasks (ints), see
+    the attribute *mask* and elementMask."""
     physical = 1
     fire = 2
     ice = 3
     coldFire = 4
     summoner = 5
     
+    def __init__(self, value):
+        self.mask = 1 << value
+        
+    @property
+    def efficientBlocks(self):
+        """The mask of all elements that block an attack of this element efficiently."""
+        return _EFFICIENT_BLOCKS[self]
+    
     @property
     def title(self):
         if self is Element.physical:
@@ -138,6 +149,23 @@ class Element(enum.Enum):
             return 'Cold Fire'
         else: return 'Summoner'
         
+
+def elementMask(elements):
+    """Return the bitmask of the given Elements."""
+    mask = 0
+    for element in elements:
+        mask |= element.mask
+    return mask
+
+
+_EFFICIENT_BLOCKS = {
+    Element.physical: elementMask(Element),
+    Element.fire: Element.ice.mask | Element.coldFire.mask,
+    Element.ice: Element.fire.mask | Element.coldFire.mask,
+    Element.coldFire: Element.coldFire.mask,
+    Element.summoner: Element.coldFire.mask,
+}
+        
         
 class EffectType(enum.Enum):
     """Each card,unit action, skill etc. has a type which determines when it can be played."""
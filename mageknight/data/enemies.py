@@ -20,12 +20,13 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 #
 
+import array
 import enum
 
 from mageknight import utils
-from .core import Element
+from .core import Element, elementMask
 
-__all__ = ['EnemyCategory', 'Attack', 'Enemy', 'UnknownEnemy']
+__all__ = ['EnemyCategory', 'Attack', 'EnemyAbility', 'abilityMask', 'Enemy', 'UnknownEnemy']
 
 
 class EnemyCategory(enum.Enum):
@@ -43,14 +44,8 @@ class EnemyCategory(enum.Enum):
     
     def all(self):
         """Return all enemies from this category. List enemies multiple times according to the 'count'
-        attribute."""
-        enemies = []
-        for id in Enemy._enemyData[self].keys():
-            enemy = Enemy(self, id)
-            enemies.append(enemy)
-            if enemy.count > 1:
-                enemies.extend(Enemy(self, id) for _ in range(enemy.count-1))
-        return enemies
+        attribute. The returned list is new, but the enemies in it are shared flyweights."""
+        return list(TABLE.tokens(self))
    
     
 class Attack:
@@ -67,13 +62,65 @@ class Attack:
         self.value = value
         
     
+class EnemyAbility(enum.Enum):
+    """A boolean ability of an enemy. Sets of abilities are stored as bitmasks (ints), see the attribute
+    *mask* and abilityMask."""
+    fortified = 0
+    swift = 1
+    brutal = 2
+    poison = 3
+    paralyze = 4
+    
+    def __init__(self, value):
+        self.mask = 1 << value
+        
+
+def abilityMask(abilities):
+    """Return the bitmask of the given EnemyAbilities."""
+    mask = 0
+    for ability in abilities:
+        mask |= ability.mask
+    return mask
+    
+
+
+class _Column:
+    """Descriptor which reads an attribute of a flyweight Enemy from the column *name* of the enemy
+    table."""
+    def __init__(self, name):
+        self.name = name
+        
+    def __get__(self, enemy, owner):
+        if enemy is None:
+            return self
+        return getattr(TABLE, self.name)[enemy.index]
+    
+    
+class _AbilityFlag:
+    """Descriptor which reads a boolean EnemyAbility of a flyweight Enemy from the abilities column of
+    the enemy table."""
+    def __init__(self, ability):
+        self.mask = ability.mask
+        
+    def __get__(self, enemy, owner):
+        if enemy is None:
+            return self
+        return bool(TABLE.abilities[enemy.index] & self.mask)
+    
+    
 class Enemy:
-    """An enemy token. It is initialized using its EnemyCategory and its id (e.g. 'altem_mages').
+    """An enemy token. It is obtained using its EnemyCategory and its id (e.g. 'altem_mages').
     It has the attributes
-        type, id, name, armor, attack, fame,
-        fortified, physicalResistance, iceResistance, fireResistance, swift, brutal, poison, paralyze
-    (attributes in the second line are booleans).
+        category, id, name, armor, attack, fame, resistances,
+        fortified, swift, brutal, poison, paralyze
+    (attributes in the second line are booleans). For fast checks the attributes abilities and
+    resistanceMask contain the abilities and resistances as bitmasks (see EnemyAbility and Element).
+    
+    Enemies are flyweights: There is only one instance per id (also if count > 1) and all attributes
+    are read from the compiled EnemyTable (TABLE).
     """
+    __slots__ = ('index',)
+    
     _enemyData = {}
     _enemyData[EnemyCategory.maraudingOrcs] = {
         'prowlers': ('Prowlers', 2, 3, Attack(4), 2),
@@ -117,43 +164,183 @@ class Enemy:
         'high_dragon': ('High Dragon', 2, 9, Attack(6, Element.coldFire), 9, 'fireResistance', 'iceResistance', 'brutal'),
     }
     
-    def __init__(self, category, id):
-        assert isinstance(category, EnemyCategory)
-        
-        # Basic data
-        self.category = category
-        self.id = id
-        data = self._enemyData[category][id]
-        self.name, self.count, self.armor, self.attack, self.fame = data[:5]
-        
-        # Attributes
-        attrs = data[5:]
-        allAttrs = ['fortified', 'swift', 'brutal', 'poison', 'paralyze']
-        for attr in allAttrs:
-            setattr(self, attr, attr in attrs)
-            
-        # Resistances
-        self.resistances = []
-        if 'physicalResistance' in attrs:
-            self.resistances.append(Element.physical)
-        if 'iceResistance' in attrs:
-            self.resistances.append(Element.ice)
-        if 'fireResistance' in attrs:
-            self.resistances.append(Element.fire)
-        if 'iceResistance' in attrs and 'fireResistance' in attrs:
-            self.resistances.append(Element.coldFire)
-        
+    def __new__(cls, category, id):
+        enemy = TABLE.enemy(id)
+        assert enemy.category is category
+        return enemy
+    
+    category = _Column('categories')
+    id = _Column('ids')
+    name = _Column('names')
+    count = _Column('count')
+    armor = _Column('armor')
+    attack = _Column('attacks')
+    fame = _Column('fame')
+    resistances = _Column('resistanceTuples')
+    resistanceMask = _Column('resistances')
+    abilities = _Column('abilities')
+    fortified = _AbilityFlag(EnemyAbility.fortified)
+    swift = _AbilityFlag(EnemyAbility.swift)
+    brutal = _AbilityFlag(EnemyAbility.brutal)
+    poison = _AbilityFlag(EnemyAbility.poison)
+    paralyze = _AbilityFlag(EnemyAbility.paralyze)
+    
     def pixmap(self, gray=False):
         """Return the front side of this enemy token. If *gray* is True, return a grayscale version."""
         dir = 'mk/enemies/' if not gray else 'mk/enemies/gray/'
         return utils.getPixmap('{}{}_{}.png'.format(dir, self.category.name, self.id))
     
+    def __repr__(self):
+        return 'Enemy({})'.format(self.id)
+    
+
+class EnemyTable:
+    """The enemy database compiled into columns: Row *i* of each column contains a value of the enemy
+    with index *i*. Numeric columns are array.arrays:
+        count, armor, attackValue, attackElement, fame, abilities, resistances
+    (attackValue is 0 for summoners, abilities and resistances are bitmasks, see abilityMask and
+    elementMask). Further columns are the lists ids, names, categories, attacks and resistanceTuples.
+    
+    Use select to query enemies, e.g. all enemies with a fire attack of at least 5:
+    
+        >>> TABLE.select(element=Element.fire, minAttack=5)
+    
+    Queries are answered using precomputed bitsets (Python ints whose bit *i* stands for the enemy with
+    index *i*), so that no loop over enemies is necessary.
+    """
+    def __init__(self, enemyData):
+        self.ids = []
+        self.names = []
+        self.categories = []
+        self.attacks = []
+        self.resistanceTuples = []
+        self.count = array.array('B')
+        self.armor = array.array('B')
+        self.attackValue = array.array('B')
+        self.attackElement = array.array('B')
+        self.fame = array.array('B')
+        self.abilities = array.array('B')
+        self.resistances = array.array('B')
+        self.index = {}
+        
+        for category, aDict in enemyData.items():
+            for id, data in aDict.items():
+                name, count, armor, attack, fame = data[:5]
+                attrs = data[5:]
+                resistances = [element for element in (Element.physical, Element.ice, Element.fire)
+                               if element.name+'Resistance' in attrs]
+                if Element.ice in resistances and Element.fire in resistances:
+                    resistances.append(Element.coldFire)
+                self.index[id] = len(self.ids)
+                self.ids.append(id)
+                self.names.append(name)
+                self.categories.append(category)
+                self.attacks.append(attack)
+                self.resistanceTuples.append(tuple(resistances))
+                self.count.append(count)
+                self.armor.append(armor)
+                self.attackValue.append(attack.value if attack.element is not Element.summoner else 0)
+                self.attackElement.append(attack.element.value)
+                self.fame.append(fame)
+                self.abilities.append(abilityMask(a for a in EnemyAbility if a.name in attrs))
+                self.resistances.append(elementMask(resistances))
+        
+        # Bitset indexes
+        self._categoryBits = {category: 0 for category in EnemyCategory}
+        self._elementBits = {element: 0 for element in Element}
+        self._abilityBits = {ability: 0 for ability in EnemyAbility}
+        self._resistanceBits = {element: 0 for element in Element}
+        for i in range(len(self.ids)):
+            bit = 1 << i
+            self._categoryBits[self.categories[i]] |= bit
+            self._elementBits[self.attacks[i].element] |= bit
+            for ability in EnemyAbility:
+                if self.abilities[i] & ability.mask:
+                    self._abilityBits[ability] |= bit
+            for element in self.resistanceTuples[i]:
+                self._resistanceBits[element] |= bit
+        # _attackAtLeast[v] contains all enemies with attack value >= v (likewise for armor)
+        self._attackAtLeast = self._thresholdBits(self.attackValue)
+        self._armorAtLeast = self._thresholdBits(self.armor)
+        self.allBits = (1 << len(self.ids)) - 1
+        
+        self._enemies = []
+        for i in range(len(self.ids)):
+            enemy = object.__new__(Enemy)
+            enemy.index = i
+            self._enemies.append(enemy)
+        self._tokens = {category: tuple(enemy for enemy in self.enemies(self._categoryBits[category])
+                                        for _ in range(self.count[enemy.index]))
+                        for category in EnemyCategory}
+        
+    @staticmethod
+    def _thresholdBits(column):
+        result = [0] * (max(column) + 2)
+        for i, value in enumerate(column):
+            result[value] |= 1 << i
+        for value in reversed(range(len(result)-1)):
+            result[value] |= result[value+1]
+        return result
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __getitem__(self, index):
+        """Return the (flyweight) Enemy with the given index."""
+        return self._enemies[index]
+    
+    def enemy(self, id):
+        """Return the (flyweight) Enemy with the given id."""
+        try:
+            return self._enemies[self.index[id]]
+        except KeyError:
+            raise ValueError("There is no enemy with id '{}'.".format(id))
+    
+    def tokens(self, category):
+        """Return a tuple containing all tokens of *category*. Enemies are contained multiple times
+        according to their count."""
+        return self._tokens[category]
+        
+    def bits(self, category=None, element=None, minAttack=None, minArmor=None, abilities=(),
+             resistances=()):
+        """Return the bitset of all enemies matching all given criteria: *category*, attack *element*,
+        attack value at least *minAttack*, armor at least *minArmor*, all of the *abilities*
+        (EnemyAbilities) and all of the *resistances* (Elements)."""
+        bits = self.allBits
+        if category is not None:
+            bits &= self._categoryBits[category]
+        if element is not None:
+            bits &= self._elementBits[element]
+        if minAttack is not None:
+            bits &= self._attackAtLeast[minAttack] if minAttack < len(self._attackAtLeast) else 0
+        if minArmor is not None:
+            bits &= self._armorAtLeast[minArmor] if minArmor < len(self._armorAtLeast) else 0
+        for ability in abilities:
+            bits &= self._abilityBits[ability]
+        for element in resistances:
+            bits &= self._resistanceBits[element]
+        return bits
+    
+    def enemies(self, bits):
+        """Return the enemies in the bitset *bits* (ordered by index)."""
+        result = []
+        while bits:
+            low = bits & -bits
+            result.append(self._enemies[low.bit_length()-1])
+            bits ^= low
+        return result
+    
+    def select(self, **criteria):
+        """Return a list of all enemies matching the given criteria. See bits for the possible
+        arguments."""
+        return self.enemies(self.bits(**criteria))
+    
+
+TABLE = EnemyTable(Enemy._enemyData)
+    
 
 def get(id):
-    for category, aDict in Enemy._enemyData.items():
-        if id in aDict:
-            return Enemy(category, id)
-    else: raise ValueError("There is no enemy with id '{}'.".format(id))
+    return TABLE.enemy(id)
     
 
 class UnknownEnemy:
@@ -88,6 +88,11 @@ class TilePileState(enum.Enum):
     empty = 4
     
     
+# Position of a hex within its tile by its coordinates relative to the tile center (see Tile._fieldIndex)
+_FIELD_INDEXES = {(0, 0): 0}
+_FIELD_INDEXES.update({n: i+1 for i, n in enumerate(hexcoords.HexCoords._neighbors)})
+
+
 class Tile:
     """One of the tiles shipped with Mage Knight. Tiles are identified by an id: 'A' or 'B' for the start
     tiles, '1' etc. for countryside tiles and 'c1' etc. for core tiles, including cities.
@@ -177,9 +182,7 @@ class Tile:
     def _fieldIndex(self, coords):
         """Return the position of the hex *coords* within its tile: 0 indicates the center, 1-6 are the 
         neighbors, starting with the top-right one and continuing in clockwise order."""
-        if coords.x == 0 and coords.y == 0:
-            return 0
-        else: return 1 + hexcoords.HexCoords(0, 0).neighbors().index(coords)
+        return _FIELD_INDEXES[coords.x, coords.y]
     
     def terrainAt(self, coords):
         """Return the terrain at the given coords, assuming this tile sits at (0,0)."""
@@ -54,7 +54,7 @@ class Hero(enum.Enum):
             ids[ids.index('determination')] = 'cold_toughness'
         elif self is Hero.Arythea:
             ids[ids.index('rage')] = 'battle_versatility'
-        elif self is Hero.Goldy:
+        elif self is Hero.Goldyx:
             ids[ids.index('concentration')] = 'will_focus'
             
         from mageknight.core import assets
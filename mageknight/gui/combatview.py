@@ -67,7 +67,9 @@ class CombatScene(QtWidgets.QGraphicsScene):
         self.okButton.clicked.connect(lambda: self.match.combatNext()) # does not work without lambda!
         self.skipButton = QtWidgets.QPushButton(self.tr("Skip"))
         self.skipButton.clicked.connect(lambda: self.match.combatSkip()) # same
-        for button in self.okButton, self.skipButton:
+        self.planButton = QtWidgets.QPushButton(self.tr("Assign optimally"))
+        self.planButton.clicked.connect(lambda: self.match.assignDamagePlan(self.combat.planDamage()))
+        for button in self.okButton, self.skipButton, self.planButton:
             proxy = QtWidgets.QGraphicsProxyWidget()
             proxy.setWidget(button)
             layout.addItem(proxy)
@@ -150,6 +152,7 @@ class CombatScene(QtWidgets.QGraphicsScene):
                 
     def _updateButtons(self):
         state = self.match.state
+        self.planButton.setVisible(state is State.assignDamage)
         if not state.inCombat:
             self.okButton.setVisible(False)
             self.skipButton.setVisible(False)
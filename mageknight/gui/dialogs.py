@@ -27,6 +27,7 @@ translate = QtCore.QCoreApplication.translate
 
 from mageknight.gui import mainwindow
 from mageknight.data import * # @UnusedWildImport
+from mageknight.core import decisions
 
 
 class ChooseDialog(QtWidgets.QDialog):
@@ -62,57 +63,46 @@ class ChooseDialog(QtWidgets.QDialog):
         else: return self.default
         
         
+class DialogDecisionProvider(decisions.DecisionProvider):
+    """Decision provider that asks the user using modal dialogs."""
+    def choose(self, options, labelFunc=str, title=translate('ChooseDialog', "Choose one"),
+               text=None, default=None):
+        dialog = ChooseDialog(options, labelFunc=labelFunc, title=title, text=text, default=default)
+        dialog.exec_()
+        if dialog.chosenOption is not None:
+            return dialog.chosenOption
+        else: raise CancelAction()
+        
+    def chooseIndex(self, options, **kwargs):
+        dialog = ChooseDialog(options, **kwargs)
+        dialog.exec_()
+        if dialog.index is not None:
+            return dialog.index
+        else: raise CancelAction()
+        
+    def ask(self, question, title=''):
+        button = QtWidgets.QMessageBox.question(mainwindow.mainWindow, title, question)
+        return button == QtWidgets.QMessageBox.Yes
+    
+    
+_provider = DialogDecisionProvider()
+        
+        
 def choose(options, **kwargs):
-    dialog = ChooseDialog(options, **kwargs)
-    dialog.exec_()
-    if dialog.chosenOption is not None:
-        return dialog.chosenOption
-    else: raise CancelAction()
+    return _provider.choose(options, **kwargs)
     
     
 def chooseIndex(options, **kwargs):
-    dialog = ChooseDialog(options, **kwargs)
-    dialog.exec_()
-    if dialog.index is not None:
-        return dialog.index
-    else: raise CancelAction()
+    return _provider.chooseIndex(options, **kwargs)
 
 
 def chooseManaColor(match=None, available=False, basic=True, fromList=None, default=None):
-    if fromList is not None:
-        colors = fromList
-    else:
-        if available:
-            assert match is not None
-            colors = [color for color in Mana if match.hasMana(color)]
-            if len(colors) == 0:
-                raise InvalidAction("You don't have mana")
-        else:
-            colors = Mana.basicColors() if basic else list(Mana)
-        
-    # remove duplicates
-    colorOptions = []
-    for color in colors:
-        if color not in colorOptions:
-            colorOptions.append(color)
-    return choose(colorOptions, default=default) # TODO: implement a nicer dialog, using crystal icons
+    return _provider.chooseManaColor(match, available, basic, fromList, default)
 
 
 def chooseCard(player, type=None, allowWounds=False):
-    from mageknight.core import assets
-    cards = []
-    for card in player.handCards:
-        if type is not None and not isinstance(card, type):
-            continue
-        if isinstance(card, assets.Wound) and not allowWounds:
-            continue
-        cards.append(card)
-    if len(cards) > 0:
-        return choose(cards)
-    else: raise InvalidAction("You don't have a suitable card")
+    return _provider.chooseCard(player, type, allowWounds)
     
 
 def ask(question, title=''):
-    button = QtWidgets.QMessageBox.question(mainwindow.mainWindow, title, question)
-    return button == QtWidgets.QMessageBox.Yes    
-
+    return _provider.ask(question, title)
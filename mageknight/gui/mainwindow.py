@@ -37,7 +37,8 @@ class MainWindow(QtWidgets.QWidget):
         
         from mageknight import core, client
         from mageknight.data import Hero
-        players = [core.PlayerData('Nameless Player', Hero.Norowas)]
+        from mageknight.gui import dialogs
+        players = [core.PlayerData('Nameless Player', Hero.Norowas, dialogs.DialogDecisionProvider())]
         self.match = core.Match(players)
         self.client = client.LocalMatchClient(self.match, self.match.players[0])
         
@@ -50,12 +50,14 @@ class MapModel(QtWidgets.QGraphicsScene):
         super().__init__(parent) # parent is necessary or segfaults occur
         self.match = match
         self.map = match.map
+        self._tileItems = {}
         self._personItems = {}
         self._siteItems = {}
         self._exploreItems = []
         
         self.match.stateChanged.connect(self._stateChanged)
         self.map.tileAdded.connect(self._tileAdded)
+        self.map.tileRemoved.connect(self._tileRemoved)
         self.map.siteChanged.connect(self._siteChanged)
         self.map.personChanged.connect(self._personChanged)
         
@@ -69,8 +71,12 @@ class MapModel(QtWidgets.QGraphicsScene):
 
     def _tileAdded(self, coords):
         tileItem = TileItem(self.map.tiles[coords], coords)
+        self._tileItems[coords] = tileItem
         self.addItem(tileItem)
         
+    def _tileRemoved(self, coords):
+        self.removeItem(self._tileItems.pop(coords))
+        
     def _siteChanged(self, coords):
         if coords not in self._siteItems:
             # Site added
@@ -79,7 +79,7 @@ class PlayerAreaScene(QtWidgets.QGraphicsScene):
         self._updateUnits()
         
     def _updateHandCards(self):
-        self.cards.sync(CardItem, self.player.handCards)
+        self.cards.sync(CardItem, list(self.player.handCards))
                 
     def _updateUnits(self):
         unitItemCount = sum(1 for item in self.units.items() if isinstance(item, UnitItem))
@@ -207,11 +207,8 @@ class UnitItem(stock.GraphicsPixmapObject):
         event.accept()
         
     def mouseReleaseEvent(self, event):
-        for ability in reversed(self.unit.abilities):
-            if event.pos().y() >= ability.pos * self.scaleFactor():
-                self.scene().unitClicked(self.unit, ability)
-                break
-        else: self.scene().unitClicked(self.unit, None)
+        ability = self.unit.abilityAt(event.pos().y() / self.scaleFactor())
+        self.scene().unitClicked(self.unit, ability)
         event.accept()
 
 
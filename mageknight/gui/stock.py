@@ -170,16 +170,23 @@ class Stock(QtWidgets.QGraphicsObject):
         # we cannot simply clear the stock and re-add everything
         if end is None:
             end = len(self.items())
+        # Objects may occur several times (e.g. cards, see core.deck): keep one item per occurrence
+        remaining = list(objects)
         for item in self.items()[:end]: # in particular this creates a copy
-            if item.object not in objects:
+            if item.object not in remaining:
                 self.removeItem(item)
                 end -= 1
-            else: item.update() # repaint items that were not added/removed
+            else:
+                remaining.remove(item.object)
+                item.update() # repaint items that were not added/removed
         for i, object in enumerate(objects):
             if i >= end or object != self.items()[i].object:
                 item = itemClass(object, self.objectSize)
                 self.insertItem(i, item)
                 end += 1
+        # Items of objects that changed their order have been inserted again: remove the old items
+        for item in self.items()[len(objects):end]:
+            self.removeItem(item)
 
 
 class Row(Stock): # TODO: Create an abstract super class and make Row and Stock siblings
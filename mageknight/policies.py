@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Policies play the turns of a player without user interaction, e.g. in batch runs (see mageknight.batch).
+Each step a policy performs one action using the public action methods of the match. During actions,
+questions are answered by the policy's decision provider (see core.decisions).
+"""
+
+import multiprocessing, random
+
+from mageknight.data import * # @UnusedWildImport
+from mageknight.core import assets, decisions, search, simulation, sites
+
+
+class Policy:
+    """Abstract base class for policies. *rng* is the random number generator used by the policy
+    (defaults to the random module)."""
+    name = None
+    
+    def __init__(self, rng=None):
+        self.rng = rng if rng is not None else random
+        
+    def decisionProvider(self):
+        """Return a new DecisionProvider for the player controlled by this policy."""
+        return decisions.BotDecisionProvider()
+    
+    def act(self, match, player):
+        """Perform one action for *player*, who must be the current player. Return whether the action was
+        performed successfully."""
+        raise NotImplementedError()
+    
+    def candidates(self, match, player):
+        """Return a list of actions that are possible in the current state (see Match.legalActions). Each
+        action is a function without arguments which performs the action and returns whether it succeeded.
+        """
+        return [action for action in match.legalActions(player)
+                # the explore state can only be left by exploring
+                if not (action.func == match.activateAction and action.args[1] == 'explore'
+                        and match.effects.movePoints < 2)]
+    
+    
+class PassivePolicy(Policy):
+    """Do as little as possible: Play one card sideways each turn (so that the round ends eventually) or
+    rest if there are wounds in the hand, fight only when forced to and end the turn. This policy always
+    makes progress, so it is also used to finish turns that other policies could not finish."""
+    name = 'pass'
+    
+    def act(self, match, player):
+        state = match.state
+        if state is State.movement:
+            if player.handCards.countWounds() > 0 and not match.hasActed:
+                return match.rest(player)
+            cards = [card for card in player.handCards if not card.isWound]
+            if match.effects.movePoints == 0 and len(cards) > 0:
+                return match.playSideways(player, cards[0], 0)
+        if state is State.explore:
+            return match.explore(player, match.map.getExplorableTiles(match.map.persons[player])[0])
+        if state is State.provokeMarauders:
+            if not match.combat.hasSelectedEnemy():
+                return match.setEnemySelected(player, match.combat.enemies[0], True)
+            return match.combatNext(player)
+        if state in (State.rangeAttack, State.block, State.attack):
+            return match.combatSkip(player)
+        if state is State.assignDamage:
+            return match.assignDamagePlan(player, match.combat.planDamage())
+        if state is State.combatRewards and len(match.combat.rewards) > 0:
+            if match.combat.currentReward is None:
+                return match.chooseRewardType(player, match.combat.rewards[0])
+            reward = match.combat.currentReward
+            return match.chooseRewardItem(player, reward, reward.items[0])
+        if match.actions.find('endturn') is not None:
+            return match.activateAction(player, 'endturn')
+        return False
+    
+    
+class RandomPolicy(Policy):
+    """Perform uniformly random actions (from Policy.candidates) and make random decisions."""
+    name = 'random'
+    
+    def decisionProvider(self):
+        return decisions.RandomDecisionProvider(self.rng)
+    
+    def act(self, match, player):
+        candidates = self.candidates(match, player)
+        if len(candidates) == 0:
+            return False
+        return self.rng.choice(candidates)()
+    
+    
+class GreedyPolicy(PassivePolicy):
+    """A simple greedy policy: Explore and move as far as possible using the strong effects of cards,
+    fight whenever enemies are met (attacking with everything available) and end the turn when nothing
+    else is possible. Adventure sites are only entered and fortified sites only assaulted if the combat
+    simulator predicts a win with probability at least *minWinProbability*."""
+    name = 'greedy'
+    minWinProbability = 0.5
+    simulationSamples = 200
+    
+    def __init__(self, rng=None):
+        super().__init__(rng)
+        self._simulations = {} # coords -> whether to fight there (for the turn self._simulationTurn)
+        self._simulationTurn = None
+    
+    def act(self, match, player):
+        state = match.state
+        if state is State.movement:
+            for action in ('enter', 'marauding', 'explore'):
+                if match.actions.find(action) is not None \
+                        and (action != 'explore' or match.effects.movePoints >= 2) \
+                        and (action != 'enter'
+                             or self._shouldFight(match, player, match.map.persons[player])):
+                    if match.activateAction(player, action):
+                        return True
+            moves = [c for c in self.candidates(match, player) if c.func == match.movePlayer
+                     and (not isinstance(match.map.siteAt(c.args[1]), sites.FortifiedSite)
+                          or match.map.siteAt(c.args[1]).owner is not None
+                          or self._shouldFight(match, player, c.args[1]))]
+            if len(moves) > 0:
+                return self.rng.choice(moves)()
+            if self._playCard(match, player):
+                return True
+        elif state is State.attack:
+            # Ranged attacks and blocks are skipped, all cards are saved for the attack phase
+            active = [e for e in match.combat.enemies if match.combat.isEnemyActive(e)]
+            if not match.combat.hasSelectedEnemy() and len(active) > 0:
+                return match.setEnemySelected(player, active[0], True)
+            if self._playCard(match, player):
+                return True
+            selected = match.combat.selectedEnemies()
+            if len(selected) > 0 and match.combatNext(player):
+                if any(e in match.combat.enemies for e in selected):
+                    # Not enough attack points: Give up
+                    return match.combatSkip(player)
+                return True
+        elif state is State.explore:
+            return self.rng.choice(self.candidates(match, player))()
+        return super().act(match, player)
+    
+    def _shouldFight(self, match, player, coords):
+        """Return whether the player should fight at the site at *coords*. Results are cached during a
+        turn."""
+        if self._simulationTurn != match.turnNumber:
+            self._simulations = {}
+            self._simulationTurn = match.turnNumber
+        if coords not in self._simulations:
+            site = match.map.siteAt(coords)
+            result = simulation.simulateSite(match, player, site, self.simulationSamples, rng=self.rng)
+            self._simulations[coords] = result.winProbability >= self.minWinProbability
+        return self._simulations[coords]
+    
+    def _playCard(self, match, player):
+        """Try to play a card: strong effect if possible, otherwise basic, otherwise sideways."""
+        for card in player.handCards:
+            if card.isWound:
+                continue
+            if isinstance(card, assets.ActionCard):
+                if match.hasMana(card.color) and match.playCard(player, card, 1):
+                    return True
+                if match.playCard(player, card, 0):
+                    return True
+            for i in range(len(match.sidewaysEffects())):
+                if match.playSideways(player, card, i):
+                    return True
+        return False
+    
+    
+class MctsPolicy(PassivePolicy):
+    """Choose each action by a Monte Carlo tree search over the current turn (see core.search). The budget
+    per action is *iterations* and/or *seconds*; with *workers* > 1 the search runs root-parallel in a
+    pool of processes (which is not possible inside the daemonic workers of mageknight.tournament). The
+    SearchResult of the last search is stored in lastResult."""
+    name = 'mcts'
+    
+    def __init__(self, rng=None, iterations=100, seconds=None, workers=1):
+        super().__init__(rng)
+        self.iterations = iterations
+        self.seconds = seconds
+        self.workers = workers
+        self.lastResult = None
+        self._pool = None
+        
+    def act(self, match, player):
+        available = search.moves(match, player)
+        if len(available) == 1:
+            return available[0][1]()
+        if len(available) > 1:
+            if self.workers > 1 and self._pool is None:
+                self._pool = multiprocessing.Pool(self.workers)
+            self.lastResult = search.search(match, player, self.iterations, self.seconds, self.workers,
+                                            seed=self.rng.getrandbits(64), pool=self._pool)
+            action = self.lastResult.bestAction(match, player)
+            if action is not None and action():
+                return True
+        return super().act(match, player)
+    
+    def close(self):
+        """Terminate the process pool of a root-parallel search."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+    
+    
+POLICIES = {policy.name: policy for policy in (PassivePolicy, RandomPolicy, GreedyPolicy, MctsPolicy)}
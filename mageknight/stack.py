@@ -22,7 +22,7 @@
 
 """Improved QUndoStack. This is a simplified version of the stack used in Maestro."""
 
-from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5 import QtCore
   
 
 class UndoStackError(RuntimeError):
@@ -49,8 +49,8 @@ class UndoStack(QtCore.QObject):
         self._index = 0            # Position before the command that will be executed on redo
         self._activeMacros = []    # list of nested macros that are being built (first is outermost)
         self._inUndoRedo = False   # True during undo and redo
-        self._undoAction = UndoRedoAction(self, redo=False)
-        self._redoAction = UndoRedoAction(self, redo=True)
+        self._undoAction = None    # QActions, created on demand (see createUndoAction)
+        self._redoAction = None
     
     def index(self):
         """Return the current position of the stack. stack.command(stack.index()) is the command that will
@@ -61,6 +61,10 @@ class UndoStack(QtCore.QObject):
         """Return whether a macro is currently being built."""
         return len(self._activeMacros) > 0
     
+    def isBuilding(self, macro):
+        """Return whether *macro* (as returned by beginMacro) is still being built."""
+        return macro in self._activeMacros
+    
     def count(self):
         """Return the number of commands on the stack."""
         return len(self._commands)
@@ -122,17 +126,24 @@ class UndoStack(QtCore.QObject):
             self._emitSignals()
             self._activeMacros = []
             
-    def abortMacro(self):
+    def abortMacro(self, macro=None):
         """Abort the current macro: Undo all commands that have been added to it and delete the macro. This
-        is better than endMacro+undo because it doesn't leave an unfinished macro on the stack."""
+        is better than endMacro+undo because it doesn't leave an unfinished macro on the stack. If macros
+        are nested, only the innermost macro is aborted, so that e.g. a failed action does not undo the
+        enclosing macro (see core.search). If *macro* (as returned by beginMacro) is given, all macros up
+        to and including *macro* are aborted."""
         if len(self._activeMacros) == 0:
             raise UndoStackError("Cannot abort macro, because no macro is being built.")
         if self._inUndoRedo:
             raise UndoStackError("Cannot end a macro during undo/redo.")
+        if macro is not None and macro not in self._activeMacros:
+            raise UndoStackError("Cannot abort a macro which is not being built.")
         
-        for macro in reversed(self._activeMacros):
-            macro.abort()
-        self._activeMacros = []
+        while True:
+            aborted = self._activeMacros.pop()
+            aborted.abort()
+            if macro is None or aborted is macro:
+                break
         # No need to change the stack because active macros have not been added to the stack.
         
     def clear(self):
@@ -160,11 +171,15 @@ class UndoStack(QtCore.QObject):
     def createRedoAction(self):
         """Return a QAction that will trigger the redo-method and changes its state (enabled, name...)
         according to the stack's index."""
+        if self._redoAction is None:
+            self._redoAction = _createUndoRedoAction(self, redo=True)
         return self._redoAction
     
     def createUndoAction(self):
         """Return a QAction that will trigger the undo-method and changes its state (enabled, name...)
         according to the stack's index."""
+        if self._undoAction is None:
+            self._undoAction = _createUndoRedoAction(self, redo=False)
         return self._undoAction
 
     def undo(self):
@@ -266,19 +281,21 @@ class Macro:
         return all(isinstance(command, Macro) and command.isEmpty() for command in self.commands)
         
                
-class UndoRedoAction(QtWidgets.QAction):
-    """QAction that is returned by the methods createUndoAction and createRedoAction."""
-    def __init__(self, stack, redo):
-        super().__init__(stack)
-        self.setText('')
-        self.setEnabled(stack.canRedo() if redo else stack.canUndo())
-        if redo:
-            self.setShortcut(self.tr('Ctrl+Y'))
-            self.setIcon(QtGui.QIcon.fromTheme('edit-redo'))
-            stack.canRedoChanged.connect(self.setEnabled)
-            self.triggered.connect(stack.redo)
-        else:
-            self.setShortcut(self.tr('Ctrl+Z'))
-            self.setIcon(QtGui.QIcon.fromTheme('edit-undo'))
-            stack.canUndoChanged.connect(self.setEnabled)
-            self.triggered.connect(stack.undo)
+def _createUndoRedoAction(stack, redo):
+    """Create the QAction that is returned by the methods createUndoAction and createRedoAction. QtWidgets
+    is only imported here, so that the engine does not depend on it."""
+    from PyQt5 import QtGui, QtWidgets
+    action = QtWidgets.QAction(stack)
+    action.setText('')
+    action.setEnabled(stack.canRedo() if redo else stack.canUndo())
+    if redo:
+        action.setShortcut(action.tr('Ctrl+Y'))
+        action.setIcon(QtGui.QIcon.fromTheme('edit-redo'))
+        stack.canRedoChanged.connect(action.setEnabled)
+        action.triggered.connect(stack.redo)
+    else:
+        action.setShortcut(action.tr('Ctrl+Z'))
+        action.setIcon(QtGui.QIcon.fromTheme('edit-undo'))
+        stack.canUndoChanged.connect(action.setEnabled)
+        action.triggered.connect(stack.undo)
+    return action
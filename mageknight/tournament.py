@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of the Mage Knight implementation at
+# https://github.com/MartinAltmayer/mageknight.
+#
+# Copyright 2015 Martin Altmayer, Stefan Altmayer
+# The Mage Knight board game was created by Vlaada Chvátil.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""Self-play tournaments: Run many seeded headless matches (see mageknight.batch) in a pool of worker
+processes and aggregate win rates and fame per hero and per policy:
+
+    python3 -m mageknight.tournament --players 3 --matches 200 --policy greedy,random,pass --workers 4
+
+Heroes are rotated between the seats from match to match, so that each policy plays each hero. The winner
+of a match is the player with the most fame (ties are split). Results are identical for any number of
+workers, because match *i* always uses the seed *seed*+i. With --archive the workers encode the action
+logs of their matches and the main process appends them to an archive (see mageknight.archive).
+"""
+
+import argparse, collections, json, multiprocessing, os, sys, time
+
+from mageknight import archive as archiveModule, batch
+
+
+# The BatchRunner of a worker process, created by _initWorker
+_runner = None
+
+
+def _initWorker(playerCount, policyNames, seed, turnLimit, archive=False):
+    """Initialize a worker process: Fill the asset registry and build the enemy table once, so that
+    matches do not pay for this, and silence the engine's logging."""
+    global _runner
+    from mageknight.core import assets
+    from mageknight.data import enemies
+    assets.loadAll()
+    len(enemies.TABLE)
+    sys.stdout = open(os.devnull, 'w') # the engine logs using print
+    _runner = batch.BatchRunner(playerCount, policyNames, seed, turnLimit)
+    if archive:
+        _runner.archive = archiveModule.GameBuffer()
+
+
+def _runMatch(index):
+    """Run match *index* in a worker process. Return the result dict of BatchRunner.runMatch, the CPU
+    time used by the match, the phase timings of this match and the list of encoded games for the archive
+    (empty unless the tournament is archived)."""
+    _runner.timer = batch.PhaseTimer()
+    start = time.process_time()
+    result = _runner.runMatch(index, heroes=rotatedHeroes(index))
+    cpuSeconds = time.process_time() - start
+    games = _runner.archive.take() if _runner.archive is not None else []
+    return result, cpuSeconds, dict(_runner.timer.counts), dict(_runner.timer.seconds), games
+
+
+def rotatedHeroes(index):
+    """Return the heroes in seat order for match *index*."""
+    shift = index % len(batch.HEROES)
+    return batch.HEROES[shift:] + batch.HEROES[:shift]
+
+
+class Standing:
+    """Aggregated results of a hero or a policy."""
+    __slots__ = ('games', 'wins', 'fame', 'level')
+
+    def __init__(self):
+        self.games = 0
+        self.wins = 0.
+        self.fame = 0
+        self.level = 0
+
+
+class TournamentStats:
+    """Aggregate the results of matches (as returned by BatchRunner.runMatch) per hero and per policy."""
+    def __init__(self):
+        self.matches = 0
+        self.completed = 0
+        self.stuck = 0
+        self.actions = 0
+        self.cpuSeconds = 0.
+        self.heroes = collections.defaultdict(Standing)
+        self.policies = collections.defaultdict(Standing)
+        self.timer = batch.PhaseTimer()
+
+    def add(self, result):
+        self.matches += 1
+        self.completed += result['completed']
+        self.stuck += result['stuck']
+        self.actions += result['actions']
+        players = result['players']
+        bestFame = max(p['fame'] for p in players)
+        winners = [p for p in players if p['fame'] == bestFame]
+        for p in players:
+            win = 1 / len(winners) if p in winners else 0
+            for standing in (self.heroes[p['hero']], self.policies[p['policy']]):
+                standing.games += 1
+                standing.wins += win
+                standing.fame += p['fame']
+                standing.level += p['level']
+
+    def report(self, file=sys.stdout):
+        for title, standings in (('hero', self.heroes), ('policy', self.policies)):
+            print("{:<10} {:>7} {:>8} {:>8} {:>8}".format(title, 'games', 'win%', 'fame', 'level'),
+                  file=file)
+            for name, s in sorted(standings.items(), key=lambda item: -item[1].wins / item[1].games):
+                print("{:<10} {:>7} {:>7.1f}% {:>8.2f} {:>8.2f}"
+                      .format(name, s.games, 100 * s.wins / s.games, s.fame / s.games, s.level / s.games),
+                      file=file)
+            print(file=file)
+
+
+def run(playerCount, policyNames, matches, seed=0, turnLimit=500, workers=None, chunksize=1, archive=False):
+    """Run a tournament of *matches* matches in *workers* processes (default: number of CPUs). Yield
+    (result, cpuSeconds, phaseCounts, phaseSeconds, games)-tuples in the order in which matches finish.
+    If *archive* is true, *games* contains the encoded game for ArchiveWriter.extend."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Fail early on invalid arguments (and not in every worker)
+    batch.BatchRunner(playerCount, policyNames, seed, turnLimit)
+    with multiprocessing.Pool(workers, initializer=_initWorker,
+                              initargs=(playerCount, policyNames, seed, turnLimit, archive)) as pool:
+        yield from pool.imap_unordered(_runMatch, range(matches), chunksize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='mageknight.tournament',
+                                     description="Run a self-play tournament in several processes.")
+    parser.add_argument('--players', type=int, default=2, help="number of players (default: 2)")
+    parser.add_argument('--matches', type=int, default=100, help="number of matches (default: 100)")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first match (default: 0)")
+    parser.add_argument('--policy', default='greedy',
+                        help="policy or comma-separated list of policies per player (default: greedy)")
+    parser.add_argument('--turn-limit', type=int, default=500, dest='turnLimit',
+                        help="maximum number of turns per match (default: 500)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--output', help="write per-match results (JSON lines) to this file")
+    parser.add_argument('--archive', help="append the action logs of all matches to this archive "
+                                          "(see mageknight.archive)")
+    args = parser.parse_args(argv)
+
+    stats = TournamentStats()
+    output = open(args.output, 'w') if args.output is not None else None
+    writer = archiveModule.ArchiveWriter(args.archive) if args.archive is not None else None
+    start = time.perf_counter()
+    try:
+        for result, cpuSeconds, counts, seconds, games in run(args.players, args.policy.split(','),
+                                                              args.matches, args.seed, args.turnLimit,
+                                                              args.workers, archive=writer is not None):
+            stats.add(result)
+            if writer is not None:
+                writer.extend(games)
+            stats.cpuSeconds += cpuSeconds
+            stats.timer.counts.update(counts)
+            stats.timer.seconds.update(seconds)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+    finally:
+        if output is not None:
+            output.close()
+        if writer is not None:
+            writer.close()
+    elapsed = time.perf_counter() - start
+
+    # The speedup compares with running all matches one after another in a single process
+    workers = args.workers or os.cpu_count() or 1
+    speedup = stats.cpuSeconds / elapsed
+    print("{} matches ({} completed, {} stuck) in {:.2f}s with {} workers: {:.2f} matches/s, "
+          "{:.0f} actions/s, speedup {:.2f} (parallel efficiency {:.0f}%)"
+          .format(stats.matches, stats.completed, stats.stuck, elapsed, workers, stats.matches / elapsed,
+                  stats.actions / elapsed, speedup, 100 * speedup / workers))
+    print()
+    stats.report()
+    stats.timer.report()
+
+
+if __name__ == "__main__":
+    main()
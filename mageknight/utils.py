@@ -22,13 +22,35 @@
 
 import os
 
-from PyQt5 import QtCore, QtGui
+from PyQt5 import QtCore
 from PyQt5.QtCore import Qt 
 
+# QtGui is imported in the functions that need it, so that the engine (which uses this module to load
+# pixmaps on demand) can be imported without it.
+
+
+class translated:
+    """Descriptor for class attributes which must be translated, e.g. the titles of cards:
+    
+        class March(BasicAction):
+            title = translated('cards', 'March')
+            
+    The text is translated whenever the attribute is read, and not when the class is defined (which would
+    happen before a translator is installed and costs time when the module is imported)."""
+    __slots__ = ('context', 'text')
+    
+    def __init__(self, context, text):
+        self.context = context
+        self.text = text
+        
+    def __get__(self, instance, owner):
+        return QtCore.QCoreApplication.translate(self.context, self.text)
+    
 
 def getPixmap(path, size=None):
     """Return a QPixmap from a path within the images-folder, e.g. 'tiles/tile-1.png'. If *size* is given,
     the pixmap will be scaled to fit into *size* (keeping aspect ratio)."""
+    from PyQt5 import QtGui
     pixmap = QtGui.QPixmap(os.path.join("images", *path.split('/'))) # use platform-specific separators
     if size is None:
         return pixmap
@@ -56,5 +78,6 @@ def scalePixmap(pixmap, sizeOrX, y=None):
 
 def color(str):
     """Return a QColor from a hex string like "80ce9a"."""
+    from PyQt5 import QtGui
     hexes = [int(s, base=16) for s in (str[0:2], str[2:4], str[4:6])]
     return QtGui.QColor(*hexes)